@@ -0,0 +1,98 @@
+"""
+Measures range filters and aggregates of PYRMemoryRepo scanning the documents dicts
+and in columnar mode, with the numeric and boolean properties in NumPy arrays.
+The aggregate is compared with a scan of the documents too, as done without columnar mode,
+and with the same aggregate declared in the schema, maintained on writes.
+
+Usage: python benchmarks/columnar_repo.py [number of documents]
+"""
+import asyncio
+import sys
+import time
+
+from py_easy_rest.repos import PYRMemoryRepo
+
+
+schema = {
+    "name": "Order",
+    "slug": "order",
+    "properties": {
+        "customer": {"type": "string"},
+        "total": {"type": "number"},
+        "items": {"type": "integer"},
+        "paid": {"type": "boolean"},
+    },
+}
+
+filters = [("total", "gte", 100.0), ("total", "lt", 110.0), ("paid", "eq", True)]
+
+
+def build_initial_data(documents_count):
+    return {
+        "order": {
+            f"id-{i}": {
+                "id": f"id-{i}",
+                "customer": f"customer {i % 1000}",
+                "total": (i * 7919) % 100000 / 100,
+                "items": i % 10,
+                "paid": i % 3 != 0,
+            } for i in range(documents_count)
+        },
+    }
+
+
+async def timed(function, repeat=5):
+    durations = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await function()
+        durations.append(time.perf_counter() - start)
+
+    return min(durations) * 1000, result
+
+
+async def scan_aggregate(repo):
+    """
+    Sums the totals by paid reading every document, like without columnar mode.
+    """
+    sums = {}
+    page = await repo.list("order", 0, 10 ** 9, count=False)
+
+    for doc in page["result"]:
+        sums[doc["paid"]] = sums.get(doc["paid"], 0) + doc["total"]
+
+    return sums
+
+
+async def run(documents_count):
+    print(f"{documents_count} documents, filter {filters}, sum of total by paid")
+
+    repo = PYRMemoryRepo(
+        initial_data=build_initial_data(documents_count),
+        schemas=[{**schema, "aggregates": {"paid": ["sum:total"]}}],
+    )
+    filter_ms, result = await timed(lambda: repo.list("order", 0, 30, filters=filters))
+    scan_ms, _ = await timed(lambda: scan_aggregate(repo), repeat=1)
+    declared_ms, _ = await timed(lambda: repo.aggregate("order", "paid", "sum:total"))
+
+    print(f"{'dict scan':>10}: filter {filter_ms:.2f}ms, {result['totalCount']} matches, aggregate {scan_ms:.2f}ms")
+    print(f"{'declared':>10}: aggregate {declared_ms:.3f}ms")
+
+    del repo
+
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        print("numpy is not installed, skipping columnar mode")
+        return
+
+    repo = PYRMemoryRepo(initial_data=build_initial_data(documents_count), schemas=[schema], columnar=True)
+    filter_ms, result = await timed(lambda: repo.list("order", 0, 30, filters=filters))
+    aggregate_ms, _ = await timed(lambda: repo.aggregate("order", "paid", "sum:total"))
+
+    print(f"{'columnar':>10}: filter {filter_ms:.2f}ms, {result['totalCount']} matches, aggregate {aggregate_ms:.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000))
@@ -0,0 +1,42 @@
+"""
+Measures the import time of the repos, caches and service without the web stack,
+and of PYRSanicAppBuilder with it, each in a fresh interpreter.
+
+Usage: python benchmarks/imports.py [repetitions]
+"""
+import subprocess
+import sys
+
+
+STATEMENTS = {
+    "repos, caches and service": (
+        "import py_easy_rest.repos, py_easy_rest.caches, py_easy_rest.service\n"
+        "from py_easy_rest.service import PYRService\n"
+        "PYRService({'name': 'mock', 'schemas': []})"
+    ),
+    "PYRSanicAppBuilder": "from py_easy_rest import PYRSanicAppBuilder",
+}
+
+
+def import_time(statement):
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True).stdout
+
+    return float(output)
+
+
+def run(repetitions):
+    for name, statement in STATEMENTS.items():
+        elapsed = min(import_time(statement) for _ in range(repetitions))
+
+        print(f"{name:>25}: {elapsed * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,120 @@
+"""
+Measures the latency of small gets while large list pages are being served,
+with the pages serialized at once on the event loop and streamed in chunks.
+The app runs in a server process, and the requests are sent by this one.
+
+Usage: python benchmarks/list_serialization.py [page size]
+"""
+import asyncio
+import multiprocessing
+import statistics
+import sys
+import time
+
+import httpx
+
+from py_easy_rest import PYRSanicAppBuilder
+from py_easy_rest.repos import PYRMemoryRepo
+from py_easy_rest.service import PYRService
+
+
+api_config = {
+    "name": "Benchmark",
+    "schemas": [{
+        "name": "Item",
+        "slug": "item",
+        "properties": {
+            "name": {"type": "string"},
+            "description": {"type": "string"},
+            "tags": {"type": "array", "items": {"type": "string"}},
+        },
+        # pages are not cached, so only the response serialization is measured
+        "cache": {"enabled": False},
+    }],
+}
+
+
+def build_repo(documents_count):
+    return PYRMemoryRepo(initial_data={
+        "item": {
+            str(i): {
+                "id": str(i),
+                "name": f"item {i}",
+                "description": "description " * 20,
+                "tags": [f"tag-{tag}" for tag in range(10)],
+            } for i in range(documents_count)
+        },
+    })
+
+
+async def list_large_pages(client, count, start, page_size, interval=0.5):
+    for i in range(count):
+        await asyncio.sleep(max(0, start + i * interval - time.perf_counter()))
+        await client.get(f"/item?size={page_size}")
+
+
+async def get_small_documents(client, count, start, interval=0.01):
+    """
+    Issues small gets at a fixed rate. Latency is measured from the time each
+    get was scheduled, so event loop stalls are counted too.
+    """
+    latencies = []
+
+    async def get(scheduled):
+        await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+        await client.get("/item/1")
+        latencies.append(time.perf_counter() - scheduled)
+
+    await asyncio.gather(*(get(start + i * interval) for i in range(count)))
+
+    return latencies
+
+
+def serve(page_size, stream_list_min_bytes, port):
+    service = PYRService(api_config, repo=build_repo(page_size))
+    app = PYRSanicAppBuilder.build(api_config, service, stream_list_min_bytes=stream_list_min_bytes)
+    app.run(port=port, access_log=False)
+
+
+async def wait_until_serving(client):
+    while True:
+        try:
+            await client.get("/item/1")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+
+
+async def run(page_size, stream_list_min_bytes, port=8765):
+    server = multiprocessing.Process(target=serve, args=(page_size, stream_list_min_bytes, port), daemon=True)
+    server.start()
+
+    client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=httpx.Limits(max_connections=None))
+    await wait_until_serving(client)
+
+    start = time.perf_counter()
+
+    _, latencies = await asyncio.gather(
+        list_large_pages(client, 8, start, page_size),
+        get_small_documents(client, 400, start),
+    )
+
+    await client.aclose()
+    server.terminate()
+    server.join()
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    p99 = latencies_ms[int(len(latencies_ms) * 0.99) - 1]
+
+    mode = "at once" if stream_list_min_bytes is None else "streamed"
+    print(
+        f"{mode:>8}: small get p50={statistics.median(latencies_ms):.2f}ms "
+        f"p99={p99:.2f}ms max={latencies_ms[-1]:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    asyncio.run(run(page_size, None))
+    asyncio.run(run(page_size, 64 * 1024))
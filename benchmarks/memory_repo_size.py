@@ -0,0 +1,72 @@
+"""
+Measures the memory used per document by PYRMemoryRepo, storing documents as dicts
+and in compact mode, with and without key interning.
+
+Usage: python benchmarks/memory_repo_size.py [number of documents]
+"""
+import asyncio
+import sys
+import tracemalloc
+
+from py_easy_rest.repos import PYRMemoryRepo
+
+
+schemas = [{
+    "name": "Person",
+    "slug": "person",
+    "properties": {
+        "first_name": {"type": "string"},
+        "last_name": {"type": "string"},
+        "email": {"type": "string"},
+        "age": {"type": "integer"},
+        "active": {"type": "boolean"},
+        "score": {"type": "number"},
+    },
+}]
+
+
+def build_document(i):
+    return {
+        "first_name": f"First {i}",
+        "last_name": f"Last {i}",
+        "email": f"person-{i}@example.com",
+        "age": i % 90,
+        "active": i % 2 == 0,
+        "score": i / 7,
+    }
+
+
+async def measure(name, repo, documents_count):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    for i in range(documents_count):
+        await repo.create("person", build_document(i), f"id-{i}")
+
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"{name:>28}: {used / documents_count:.0f} bytes per document")
+
+
+async def run(documents_count):
+    await measure("dict", PYRMemoryRepo(), documents_count)
+    await measure("compact json", PYRMemoryRepo(compact=True), documents_count)
+    await measure("compact json, interned keys", PYRMemoryRepo(compact=True, schemas=schemas), documents_count)
+
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        print("msgpack is not installed, skipping it")
+        return
+
+    await measure("compact msgpack", PYRMemoryRepo(compact=True, encoding="msgpack"), documents_count)
+    await measure(
+        "msgpack, interned keys",
+        PYRMemoryRepo(compact=True, encoding="msgpack", schemas=schemas),
+        documents_count,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,23 @@
+"""
+Runs the standardized benchmarks of py_easy_rest.benchmarking against the repos and caches of the package,
+as a baseline for third party implementations.
+
+Usage: python benchmarks/repos_and_caches.py [requests per operation]
+"""
+import asyncio
+import sys
+
+from py_easy_rest.benchmarking import benchmark_cache, benchmark_repo, format_results
+from py_easy_rest.caches import PYRDummyCache
+from py_easy_rest.repos import PYRMemoryRepo
+
+
+async def run(requests):
+    for name, repo in [("PYRMemoryRepo", PYRMemoryRepo()), ("PYRMemoryRepo compact", PYRMemoryRepo(compact=True))]:
+        print(f"{name}\n{format_results(await benchmark_repo(repo, requests=requests))}\n")
+
+    print(f"PYRDummyCache\n{format_results(await benchmark_cache(PYRDummyCache(), requests=requests))}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
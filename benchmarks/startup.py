@@ -0,0 +1,48 @@
+"""
+Measures the app build and router finalization time of a config with hundreds of schemas,
+with a route set per schema and with generic routes.
+
+Usage: python benchmarks/startup.py [number of schemas]
+"""
+import sys
+import time
+
+from sanic import Sanic
+
+from py_easy_rest import PYRSanicAppBuilder
+from py_easy_rest.service import PYRService
+
+
+def build_api_config(schemas_count):
+    return {
+        "name": "Benchmark",
+        "schemas": [{
+            "name": f"Schema {i}",
+            "slug": f"schema-{i}",
+            "properties": {"name": {"type": "string"}},
+        } for i in range(schemas_count)],
+    }
+
+
+def run(api_config, generic_routes):
+    Sanic._app_registry.clear()
+    service = PYRService(api_config)
+
+    start = time.perf_counter()
+    app = PYRSanicAppBuilder.build(api_config, service, generic_routes=generic_routes)
+    built = time.perf_counter()
+    app.router.finalize()
+    finalized = time.perf_counter()
+
+    mode = "generic routes" if generic_routes else "routes per schema"
+    print(
+        f"{mode:>17}: build={(built - start) * 1000:.1f}ms "
+        f"finalize={(finalized - built) * 1000:.1f}ms routes={len(app.router.routes)}"
+    )
+
+
+if __name__ == "__main__":
+    api_config = build_api_config(int(sys.argv[1]) if len(sys.argv) > 1 else 400)
+
+    run(api_config, generic_routes=False)
+    run(api_config, generic_routes=True)
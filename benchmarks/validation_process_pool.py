@@ -0,0 +1,89 @@
+"""
+Measures the latency of small creates while large payloads are being validated,
+with validation inline on the event loop and offloaded to a process pool.
+
+Usage: python benchmarks/validation_process_pool.py
+"""
+import asyncio
+import statistics
+import time
+
+from py_easy_rest.repos import PYRMemoryRepo
+from py_easy_rest.service import PYRService
+
+
+api_config = {
+    "name": "Benchmark",
+    "schemas": [{
+        "name": "Item",
+        "slug": "item",
+        "properties": {
+            "name": {"type": "string"},
+            "tags": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "key": {"type": "string"},
+                        "value": {"type": "integer"},
+                    },
+                },
+            },
+        },
+        "required": ["name"],
+    }],
+}
+
+LARGE_PAYLOAD = {"name": "large", "tags": [{"key": f"key-{i}", "value": i} for i in range(100000)]}
+SMALL_PAYLOAD = {"name": "small", "tags": [{"key": "key", "value": 1}]}
+
+
+async def create_large_payloads(service, count, start, interval=0.5):
+    for i in range(count):
+        await asyncio.sleep(max(0, start + i * interval - time.perf_counter()))
+        await service.create("item", dict(LARGE_PAYLOAD))
+
+
+async def create_small_payloads(service, count, start, interval=0.005):
+    """
+    Issues small creates at a fixed rate. Latency is measured from the time each
+    create was scheduled, so event loop stalls are counted too.
+    """
+    latencies = []
+
+    for i in range(count):
+        scheduled = start + i * interval
+        await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+        await service.create("item", dict(SMALL_PAYLOAD))
+        latencies.append(time.perf_counter() - scheduled)
+
+    return latencies
+
+
+async def run(validation_process_pool_min_bytes):
+    service = PYRService(
+        api_config,
+        repo=PYRMemoryRepo(),
+        validation_process_pool_min_bytes=validation_process_pool_min_bytes,
+    )
+
+    # warm up the process pool, so worker startup is not measured
+    await service.create("item", dict(LARGE_PAYLOAD))
+
+    start = time.perf_counter()
+
+    _, latencies = await asyncio.gather(
+        create_large_payloads(service, 5, start),
+        create_small_payloads(service, 500, start),
+    )
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    p99 = latencies_ms[int(len(latencies_ms) * 0.99) - 1]
+
+    mode = "inline" if validation_process_pool_min_bytes is None else "process pool"
+    print(f"{mode:>12}: small create p50={statistics.median(latencies_ms):.2f}ms p99={p99:.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(None))
+    asyncio.run(run(64 * 1024))
@@ -0,0 +1,140 @@
+"""
+Module with admission control to limit concurrent operations per slug.
+"""
+import asyncio
+
+from collections import deque
+
+from py_easy_rest.deadlines import within_deadline
+from py_easy_rest.dictionary_utils import get_by_slug_and_operation
+from py_easy_rest.exceptions import PYRServiceUnavailableError
+
+
+class PYRAdmissionControl():
+    """
+    Limits the concurrent operations per slug and operation.
+    Operations over the limit wait in a bounded queue, and operations
+    that do not fit in the queue are shed raising <PYRServiceUnavailableError>.
+
+    <limits> is a dictionary by slug and operation, like:
+    {"mock": {"list": {"max_concurrency": 10, "max_queue": 20}}}
+    Both slug and operation accept "*" to declare a default limit.
+    Each slug and operation has its own counters, even when using a default limit.
+    """
+
+    def __init__(self, limits=None, retry_after_seconds=1):
+        self._limits = limits or {}
+        self._retry_after_seconds = retry_after_seconds
+        self._gates = {}
+
+    def admit(self, slug, operation):
+        """
+        Returns an async context manager holding a slot for <operation> on <slug>.
+        """
+        gate = self._gates.get((slug, operation))
+
+        if gate is None:
+            gate = self._build_gate(slug, operation)
+            self._gates[(slug, operation)] = gate
+
+        return gate
+
+    def metrics(self):
+        """
+        Returns the counters by slug and operation of the limited operations.
+        """
+        result = {}
+
+        for (slug, operation), gate in self._gates.items():
+            if isinstance(gate, _AdmissionGate):
+                result.setdefault(slug, {})[operation] = gate.metrics()
+
+        return result
+
+    def _build_gate(self, slug, operation):
+        limit = get_by_slug_and_operation(self._limits, slug, operation)
+
+        if limit is None:
+            return _UNLIMITED_GATE
+
+        return _AdmissionGate(
+            f"{slug} {operation}",
+            limit["max_concurrency"],
+            limit.get("max_queue", 0),
+            self._retry_after_seconds,
+        )
+
+
+class _UnlimitedGate():
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        return None
+
+
+_UNLIMITED_GATE = _UnlimitedGate()
+
+
+class _AdmissionGate():
+
+    def __init__(self, name, max_concurrency, max_queue, retry_after_seconds):
+        self._name = name
+        self._max_concurrency = max_concurrency
+        self._max_queue = max_queue
+        self._retry_after_seconds = retry_after_seconds
+        self._in_flight = 0
+        self._waiters = deque()
+        self._admitted = 0
+        self._queued = 0
+        self._shed = 0
+
+    async def __aenter__(self):
+        if self._in_flight < self._max_concurrency and not self._waiters:
+            self._in_flight += 1
+        elif len(self._waiters) < self._max_queue:
+            await self._wait()
+        else:
+            self._shed += 1
+            raise PYRServiceUnavailableError(f"{self._name} is overloaded", self._retry_after_seconds)
+
+        self._admitted += 1
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self._release()
+
+    def metrics(self):
+        return {
+            "in_flight": self._in_flight,
+            "queue_size": len(self._waiters),
+            "admitted": self._admitted,
+            "queued": self._queued,
+            "shed": self._shed,
+        }
+
+    async def _wait(self):
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queued += 1
+
+        try:
+            await within_deadline(waiter)
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over before the cancellation
+                self._release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+
+            if not waiter.done():
+                # hand the slot over to the next waiter
+                waiter.set_result(None)
+                return
+
+        self._in_flight -= 1
@@ -0,0 +1,125 @@
+"""
+Module with standardized benchmarks of repositories and caches, measuring the throughput
+and latency of each operation at several concurrencies, to compare implementations.
+"""
+import asyncio
+import time
+
+
+def _default_document(i):
+    return {"name": f"document {i}", "description": "description " * 10, "value": i}
+
+
+async def benchmark_repo(
+    repo,
+    slug="benchmark",
+    requests=1000,
+    concurrencies=(1, 8, 64),
+    page_size=30,
+    document_factory=_default_document,
+):
+    """
+    Benchmarks the create, get, list, replace and delete of <repo> at each of <concurrencies>,
+    sending <requests> of each operation, with the documents built by <document_factory>.
+    The documents created are deleted by the delete benchmark.
+    Returns a list with the results of each operation and concurrency.
+    """
+    results = []
+
+    for concurrency in concurrencies:
+        ids = [f"benchmark-{concurrency}-{i}" for i in range(requests)]
+        pages = max(1, requests // page_size)
+
+        operations = {
+            "create": lambda i: repo.create(slug, document_factory(i), ids[i]),
+            "get": lambda i: repo.get(slug, ids[i]),
+            "list": lambda i: repo.list(slug, i % pages, page_size),
+            "replace": lambda i: repo.replace(slug, ids[i], document_factory(i)),
+            "delete": lambda i: repo.delete(slug, ids[i]),
+        }
+
+        for operation, call in operations.items():
+            results.append(await _measure(operation, call, concurrency, requests))
+
+    return results
+
+
+async def benchmark_cache(cache, requests=1000, concurrencies=(1, 8, 64), value_bytes=1024, batch_size=10):
+    """
+    Benchmarks the set, get, set_many, get_many and delete of <cache> at each of <concurrencies>,
+    sending <requests> of each operation, with values of <value_bytes> and batches of <batch_size> keys.
+    Returns a list with the results of each operation and concurrency.
+    """
+    value = "x" * value_bytes
+    results = []
+
+    for concurrency in concurrencies:
+        keys = [f"benchmark.{concurrency}.{i}" for i in range(requests)]
+
+        def batch(i):
+            return [keys[(i + offset) % requests] for offset in range(batch_size)]
+
+        operations = {
+            "set": lambda i: cache.set(keys[i], value, ttl=60),
+            "get": lambda i: cache.get(keys[i]),
+            "set_many": lambda i: cache.set_many({key: value for key in batch(i)}, ttl=60),
+            "get_many": lambda i: cache.get_many(batch(i)),
+            "delete": lambda i: cache.delete(keys[i]),
+        }
+
+        for operation, call in operations.items():
+            results.append(await _measure(operation, call, concurrency, requests))
+
+    return results
+
+
+def format_results(results):
+    """
+    Returns the <results> of a benchmark as a text table.
+    """
+    lines = [f"{'operation':>10} {'concurrency':>11} {'ops/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"]
+
+    for result in results:
+        lines.append(
+            f"{result['operation']:>10} {result['concurrency']:>11} {result['throughput_per_second']:>10.0f} "
+            f"{result['p50_ms']:>8.3f} {result['p99_ms']:>8.3f} {result['max_ms']:>8.3f}"
+        )
+
+    return "\n".join(lines)
+
+
+async def _measure(operation, call, concurrency, requests):
+    """
+    Sends <requests> calls from <concurrency> concurrent workers, each one waiting its call before the next.
+    """
+    indexes = iter(range(requests))
+    latencies = []
+
+    async def work():
+        for i in indexes:
+            started = time.perf_counter()
+            await call(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(work() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+
+    return {
+        "operation": operation,
+        "concurrency": concurrency,
+        "requests": requests,
+        "throughput_per_second": requests / elapsed if elapsed else float("inf"),
+        "p50_ms": _percentile(latencies_ms, 0.5),
+        "p99_ms": _percentile(latencies_ms, 0.99),
+        "max_ms": latencies_ms[-1] if latencies_ms else 0,
+    }
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
@@ -0,0 +1,79 @@
+"""
+Module with the cache policies declared per schema in the api config.
+"""
+
+
+class PYRCachePolicy():
+    """
+    Cache policy of a slug, declared in the "cache" property of its schema, like:
+    {"enabled": True, "get_seconds_ttl": 60, "list_seconds_ttl": 10, "negative_seconds_ttl": 5, "max_list_size": 100,
+    "write_through": True, "count_seconds_ttl": 60, "normalized_lists": True, "aggregate_seconds_ttl": 10}
+    Properties not declared fall back to the service defaults.
+    """
+
+    def __init__(
+        self,
+        enabled=True,
+        get_seconds_ttl=60 * 30,  # thirty minutes
+        list_seconds_ttl=10,
+        negative_seconds_ttl=None,
+        max_list_size=None,
+        write_through=False,
+        count_seconds_ttl=None,
+        normalized_lists=False,
+        aggregate_seconds_ttl=10,
+    ):
+        self.enabled = enabled
+        self.get_seconds_ttl = get_seconds_ttl
+        self.list_seconds_ttl = list_seconds_ttl
+        self.negative_seconds_ttl = negative_seconds_ttl
+        self.max_list_size = max_list_size
+        self.write_through = write_through
+        self.count_seconds_ttl = count_seconds_ttl
+        self.normalized_lists = normalized_lists
+        self.aggregate_seconds_ttl = aggregate_seconds_ttl
+
+    def seconds_ttl(self, operation, result):
+        """
+        Returns the ttl to cache the <result> of <operation>, or None if it must not be cached.
+        Not found results of get are cached with the negative ttl.
+        """
+        if operation == "list":
+            if self.max_list_size is not None and len(result["result"]) > self.max_list_size:
+                return None
+
+            return self.list_seconds_ttl
+
+        if operation == "count":
+            return self.count_seconds_ttl
+
+        if operation == "aggregate":
+            return self.aggregate_seconds_ttl
+
+        if result:
+            return self.get_seconds_ttl
+
+        return self.negative_seconds_ttl
+
+    def merge(self, config):
+        """
+        Returns a new policy with the properties of <config> over this one.
+        """
+        return PYRCachePolicy(
+            enabled=config.get("enabled", self.enabled),
+            get_seconds_ttl=config.get("get_seconds_ttl", self.get_seconds_ttl),
+            list_seconds_ttl=config.get("list_seconds_ttl", self.list_seconds_ttl),
+            negative_seconds_ttl=config.get("negative_seconds_ttl", self.negative_seconds_ttl),
+            max_list_size=config.get("max_list_size", self.max_list_size),
+            write_through=config.get("write_through", self.write_through),
+            count_seconds_ttl=config.get("count_seconds_ttl", self.count_seconds_ttl),
+            normalized_lists=config.get("normalized_lists", self.normalized_lists),
+            aggregate_seconds_ttl=config.get("aggregate_seconds_ttl", self.aggregate_seconds_ttl),
+        )
+
+
+def build_cache_policies(schemas, default_policy):
+    """
+    Resolves the cache policy of each schema into a lookup table by slug.
+    """
+    return {schema["slug"]: default_policy.merge(schema.get("cache", {})) for schema in schemas}
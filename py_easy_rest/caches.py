@@ -30,12 +30,35 @@ class Cache():
         """
         raise NotImplementedError
 
+    async def get_many(self, keys):
+        """
+        Receives a list of <keys> and return a list with the results in the same order.
+        Keys not found are returned as None.
+        Caches able to get many keys in one round trip should override it.
+        """
+        return [await self.get(key) for key in keys]
+
+    async def set_many(self, values, ttl=None):
+        """
+        Receives a dictionary of <values> by key and set them into cache.
+        If it receives a <ttl>, the values are set with it.
+        Caches able to set many keys in one round trip should override it.
+        """
+        for key, value in values.items():
+            await self.set(key, value, ttl=ttl)
+
 
 class PYRDummyCache(Cache):
 
     async def get(self, key):
         return None
 
+    async def get_many(self, keys):
+        return [None] * len(keys)
+
+    async def set_many(self, values, ttl=None):
+        return None
+
     async def delete(self, key):
         return None
 
@@ -0,0 +1,145 @@
+"""
+Module with the in-process feed of the entity changes.
+"""
+import asyncio
+import copy
+import itertools
+
+from collections import deque
+
+
+class PYRChangeFeed():
+    """
+    Broadcasts the changes published by the service to the subscribers of each slug.
+
+    Each change has a sequence number, and the last <history_size> changes are retained,
+    so subscribers can resume after the last sequence they received.
+    Each subscriber buffers up to <buffer_size> changes not consumed yet. Subscribers
+    falling behind it are closed after consuming their buffer, and must resume.
+    """
+
+    def __init__(self, buffer_size=100, history_size=1000):
+        self._buffer_size = buffer_size
+        self._history = deque(maxlen=history_size)
+        self._sequence = itertools.count(1)
+        self._last_sequence = 0
+        self._subscriptions = {}
+
+    def publish(self, slug, operation, id, data=None):
+        """
+        Publishes the <operation> over the document <id> of <slug>, with the written <data>.
+        """
+        self._last_sequence = next(self._sequence)
+
+        # the retained changes must not share the written document with the repo
+        change = {
+            "sequence": self._last_sequence,
+            "slug": slug,
+            "operation": operation,
+            "id": id,
+            "data": copy.deepcopy(data),
+        }
+
+        self._history.append(change)
+
+        for subscription in list(self._subscriptions.get(slug, ())):
+            subscription.push(change)
+
+        return change
+
+    def subscribe(self, slug, since=None):
+        """
+        Returns an async iterator over the changes of <slug>, starting with the retained
+        changes after the sequence <since>.
+        When the changes after <since> are not retained anymore, it starts with a "reset" change,
+        meaning the documents must be fetched again.
+        """
+        changes = []
+
+        if since is not None:
+            oldest_sequence = self._history[0]["sequence"] if self._history else self._last_sequence + 1
+
+            if since + 1 < oldest_sequence or since > self._last_sequence:
+                changes.append({
+                    "sequence": self._last_sequence,
+                    "slug": slug,
+                    "operation": "reset",
+                    "id": None,
+                    "data": None,
+                })
+            else:
+                changes.extend(
+                    change for change in self._history
+                    if change["sequence"] > since and change["slug"] == slug
+                )
+
+        subscription = _ChangeSubscription(self, slug, self._buffer_size, changes)
+        self._subscriptions.setdefault(slug, set()).add(subscription)
+
+        return subscription
+
+    def close(self):
+        """
+        Closes all subscriptions, ending their iteration after the buffered changes.
+        """
+        for subscriptions in list(self._subscriptions.values()):
+            for subscription in list(subscriptions):
+                subscription.close()
+
+    def metrics(self):
+        """
+        Returns the last sequence and the number of subscribers by slug.
+        """
+        return {
+            "last_sequence": self._last_sequence,
+            "subscribers": {slug: len(subscriptions) for slug, subscriptions in self._subscriptions.items()},
+        }
+
+    def _unsubscribe(self, subscription):
+        subscriptions = self._subscriptions.get(subscription.slug, set())
+        subscriptions.discard(subscription)
+
+        if not subscriptions:
+            self._subscriptions.pop(subscription.slug, None)
+
+
+class _ChangeSubscription():
+
+    def __init__(self, feed, slug, buffer_size, changes):
+        self.slug = slug
+        self.overflowed = False
+        self._feed = feed
+        self._buffer_size = buffer_size
+        self._changes = deque(changes)
+        self._ready = asyncio.Event()
+        self._closed = False
+
+    def push(self, change):
+        if self._closed:
+            return
+
+        if len(self._changes) >= self._buffer_size:
+            self.overflowed = True
+            self.close()
+            return
+
+        self._changes.append(change)
+        self._ready.set()
+
+    def close(self):
+        self._closed = True
+        self._feed._unsubscribe(self)
+        self._ready.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._changes:
+            if self._closed:
+                raise StopAsyncIteration
+
+            self._ready.clear()
+            await self._ready.wait()
+
+        return self._changes.popleft()
@@ -0,0 +1,283 @@
+"""
+Module with the contract tests of repositories and caches, to check third party implementations
+behave like the service expects. They are mixed into a <unittest.IsolatedAsyncioTestCase>, like:
+
+    class TestMyRepo(RepoContract, IsolatedAsyncioTestCase):
+
+        async def build_repo(self, schemas):
+            return MyRepo(schemas=schemas)
+
+    class TestMyCache(CacheContract, IsolatedAsyncioTestCase):
+
+        async def build_cache(self):
+            return MyCache()
+"""
+import asyncio
+import uuid
+
+from py_easy_rest.repos import VERSION_PROPERTY
+
+
+def contract_schemas(slug):
+    """
+    Returns the schemas used by the repo contract tests, with searchable properties and declared aggregates.
+    """
+    return [{
+        "name": "Contract",
+        "slug": slug,
+        "properties": {
+            "name": {"type": "string", "searchable": True},
+            "category": {"type": "string"},
+            "price": {"type": "number"},
+        },
+        "aggregates": {"category": ["count", "sum:price"]},
+    }]
+
+
+class RepoContract():
+    """
+    Contract tests of the <Repo> methods. Each test uses its own slug, so the repo does not need to be empty.
+    Optional methods raising NotImplementedError are skipped.
+    """
+
+    async def build_repo(self, schemas):
+        """
+        Returns the repo to be tested, receiving the <schemas> of the contract slug.
+        """
+        raise NotImplementedError
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.slug = f"contract-{uuid.uuid4().hex[:12]}"
+        self.repo = await self.build_repo(contract_schemas(self.slug))
+
+    async def _optional(self, awaitable):
+        try:
+            return await awaitable
+        except NotImplementedError:
+            self.skipTest("Optional method not implemented")
+
+    async def _create_documents(self, count):
+        ids = [f"doc-{i}" for i in range(count)]
+
+        for i, id in enumerate(ids):
+            await self.repo.create(self.slug, {"name": f"document {i}", "category": "even" if i % 2 else "odd"}, id)
+
+        return ids
+
+    async def test_get_returns_None_when_not_found(self):
+        self.assertIsNone(await self.repo.get(self.slug, "not-found"))
+
+    async def test_create_returns_the_id_of_the_document(self):
+        id = await self.repo.create(self.slug, {"name": "Porto"})
+        doc = await self.repo.get(self.slug, id)
+
+        self.assertIsNotNone(id)
+        self.assertEqual(doc["name"], "Porto")
+        self.assertEqual(doc["id"], id)
+
+    async def test_create_with_id_uses_it(self):
+        id = await self.repo.create(self.slug, {"name": "Porto"}, "porto")
+        doc = await self.repo.get(self.slug, "porto")
+
+        self.assertEqual(id, "porto")
+        self.assertEqual(doc["name"], "Porto")
+        self.assertEqual(doc["id"], "porto")
+
+    async def test_get_many_returns_the_documents_found_by_id(self):
+        await self._create_documents(3)
+
+        docs = await self.repo.get_many(self.slug, ["doc-2", "not-found", "doc-0"])
+
+        self.assertEqual(set(docs), {"doc-0", "doc-2"})
+        self.assertEqual(docs["doc-2"]["name"], "document 2")
+
+    async def test_list_pages_through_all_documents(self):
+        ids = await self._create_documents(5)
+        listed_ids = []
+
+        for page in range(3):
+            result = await self.repo.list(self.slug, page, 2)
+
+            self.assertEqual(result["page"], page)
+            self.assertEqual(result["size"], 2)
+            self.assertEqual(result["totalCount"], 5)
+            self.assertEqual(len(result["result"]), 1 if page == 2 else 2)
+
+            listed_ids.extend(doc["id"] for doc in result["result"])
+
+        self.assertEqual(sorted(listed_ids), ids)
+
+        result = await self.repo.list(self.slug, 3, 2)
+
+        self.assertEqual(result["result"], [])
+
+    async def test_list_returns_an_empty_page_of_an_empty_slug(self):
+        result = await self.repo.list(self.slug, 0, 30)
+
+        self.assertEqual(result["result"], [])
+        self.assertEqual(result["totalCount"], 0)
+
+    async def test_list_without_count(self):
+        await self._create_documents(3)
+
+        result = await self.repo.list(self.slug, 0, 2, count=False)
+
+        self.assertEqual(len(result["result"]), 2)
+
+    async def test_count(self):
+        await self._create_documents(3)
+
+        self.assertEqual(await self._optional(self.repo.count(self.slug)), 3)
+        self.assertIsInstance(await self.repo.count(self.slug, estimate=True), int)
+
+    async def test_list_with_filters(self):
+        for i, price in enumerate([5, 10, 20.5, "free"]):
+            await self.repo.create(self.slug, {"name": f"document {i}", "price": price}, f"doc-{i}")
+
+        result = await self._optional(self.repo.list(self.slug, 0, 30, filters=[("price", "gte", 10.0)]))
+
+        self.assertEqual(sorted(doc["id"] for doc in result["result"]), ["doc-1", "doc-2"])
+        self.assertEqual(result["totalCount"], 2)
+
+    async def test_replace_replaces_the_whole_document(self):
+        await self.repo.create(self.slug, {"name": "Porto", "category": "city"}, "porto")
+        await self.repo.replace(self.slug, "porto", {"name": "Porto Alegre"})
+
+        doc = await self.repo.get(self.slug, "porto")
+
+        self.assertEqual(doc["name"], "Porto Alegre")
+        self.assertNotIn("category", doc)
+
+    async def test_delete_removes_the_document(self):
+        await self._create_documents(2)
+        await self.repo.delete(self.slug, "doc-0")
+
+        self.assertIsNone(await self.repo.get(self.slug, "doc-0"))
+        self.assertIsNotNone(await self.repo.get(self.slug, "doc-1"))
+
+        await self.repo.delete(self.slug, "doc-0")
+
+    async def test_compare_and_swap_writes_only_the_expected_version(self):
+        await self.repo.create(self.slug, {"name": "Porto", VERSION_PROPERTY: 1}, "porto")
+
+        swapped = await self._optional(
+            self.repo.compare_and_swap(self.slug, "porto", 1, {"name": "Porto Alegre", VERSION_PROPERTY: 2}),
+        )
+        self.assertTrue(swapped)
+
+        swapped = await self.repo.compare_and_swap(self.slug, "porto", 1, {"name": "Lisboa", VERSION_PROPERTY: 2})
+        self.assertFalse(swapped)
+        self.assertEqual((await self.repo.get(self.slug, "porto"))["name"], "Porto Alegre")
+
+        self.assertFalse(await self.repo.compare_and_swap(self.slug, "not-found", 0, {"name": "Lisboa"}))
+
+        self.assertTrue(await self.repo.compare_and_swap(self.slug, "porto", 2, None))
+        self.assertIsNone(await self.repo.get(self.slug, "porto"))
+
+    async def test_search_ranks_exact_words_before_prefixes(self):
+        await self.repo.create(self.slug, {"name": "Portão"}, "portao")
+        await self.repo.create(self.slug, {"name": "Porto Alegre"}, "porto")
+        await self.repo.create(self.slug, {"name": "Lisboa"}, "lisboa")
+
+        result = await self._optional(self.repo.search(self.slug, "porto", 0, 30))
+
+        self.assertEqual([doc["id"] for doc in result["result"]], ["porto"])
+        self.assertEqual(result["totalCount"], 1)
+
+        result = await self.repo.search(self.slug, "port", 0, 30)
+
+        self.assertEqual(sorted(doc["id"] for doc in result["result"]), ["portao", "porto"])
+
+    async def test_aggregate_the_declared_metrics(self):
+        for i, (category, price) in enumerate([("books", 10), ("books", 30), ("games", 50)]):
+            await self.repo.create(self.slug, {"name": f"document {i}", "category": category, "price": price})
+
+        result = await self._optional(self.repo.aggregate(self.slug, "category", "sum:price"))
+
+        self.assertEqual({group["group"]: group["value"] for group in result["result"]}, {"books": 40, "games": 50})
+
+        result = await self.repo.aggregate(self.slug, "category", "count")
+
+        self.assertEqual({group["group"]: group["value"] for group in result["result"]}, {"books": 2, "games": 1})
+
+
+class CacheContract():
+    """
+    Contract tests of the <Cache> methods. Each test uses its own keys, so the cache does not need to be empty.
+    Caches not storing values, like <PYRDummyCache>, set <stores_values> to False, and are checked to never return them.
+    The expiration is checked waiting <ttl_seconds> plus <ttl_tolerance_seconds>.
+    """
+
+    stores_values = True
+    ttl_seconds = 1
+    ttl_tolerance_seconds = 1
+
+    async def build_cache(self):
+        """
+        Returns the cache to be tested.
+        """
+        raise NotImplementedError
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.prefix = f"contract-{uuid.uuid4().hex[:12]}"
+        self.cache = await self.build_cache()
+
+    def _key(self, name):
+        return f"{self.prefix}.{name}"
+
+    def _stored(self, value):
+        return value if self.stores_values else None
+
+    async def test_get_returns_None_when_not_found(self):
+        self.assertIsNone(await self.cache.get(self._key("not-found")))
+
+    async def test_set_and_get_a_string(self):
+        await self.cache.set(self._key("first"), '{"name": "Porto"}')
+
+        self.assertEqual(await self.cache.get(self._key("first")), self._stored('{"name": "Porto"}'))
+
+    async def test_set_replaces_the_value(self):
+        await self.cache.set(self._key("first"), "1")
+        await self.cache.set(self._key("first"), "2")
+
+        self.assertEqual(await self.cache.get(self._key("first")), self._stored("2"))
+
+    async def test_delete_removes_the_value(self):
+        await self.cache.set(self._key("first"), "1")
+        await self.cache.delete(self._key("first"))
+
+        self.assertIsNone(await self.cache.get(self._key("first")))
+
+        await self.cache.delete(self._key("first"))
+
+    async def test_get_many_returns_the_values_in_order(self):
+        await self.cache.set(self._key("first"), "1")
+        await self.cache.set(self._key("second"), "2")
+
+        values = await self.cache.get_many([self._key("second"), self._key("not-found"), self._key("first")])
+
+        self.assertEqual(values, [self._stored("2"), None, self._stored("1")])
+
+    async def test_set_many_sets_all_values(self):
+        await self.cache.set_many({self._key("first"): "1", self._key("second"): "2"}, ttl=60)
+
+        self.assertEqual(await self.cache.get(self._key("first")), self._stored("1"))
+        self.assertEqual(await self.cache.get(self._key("second")), self._stored("2"))
+
+    async def test_values_expire_after_the_ttl(self):
+        if not self.stores_values:
+            self.skipTest("Cache does not store values")
+
+        await self.cache.set(self._key("expiring"), "1", ttl=self.ttl_seconds)
+        await self.cache.set_many({self._key("expiring-many"): "2"}, ttl=self.ttl_seconds)
+        await self.cache.set(self._key("lasting"), "3")
+
+        self.assertEqual(await self.cache.get(self._key("expiring")), "1")
+
+        await asyncio.sleep(self.ttl_seconds + self.ttl_tolerance_seconds)
+
+        self.assertIsNone(await self.cache.get(self._key("expiring")))
+        self.assertIsNone(await self.cache.get(self._key("expiring-many")))
+        self.assertEqual(await self.cache.get(self._key("lasting")), "3")
@@ -0,0 +1,84 @@
+"""
+Module with per request deadlines, propagated to the awaited operations
+through a context variable.
+"""
+import asyncio
+import contextlib
+import contextvars
+import time
+
+from py_easy_rest.exceptions import PYRDeadlineExceededError
+
+
+_deadline = contextvars.ContextVar("py_easy_rest_deadline", default=None)
+
+
+def set_deadline(seconds):
+    """
+    Sets the deadline of the current task to <seconds> from now.
+    """
+    _deadline.set(time.monotonic() + seconds)
+
+
+def clear_deadline():
+    """
+    Removes the deadline of the current task.
+    """
+    _deadline.set(None)
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """
+    Sets the deadline to <seconds> from now while in the context,
+    unless there is already a deadline or <seconds> is None.
+    """
+    if seconds is None or _deadline.get() is not None:
+        yield
+        return
+
+    token = _deadline.set(time.monotonic() + seconds)
+
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_seconds():
+    """
+    Returns the seconds until the deadline, or None if there is no deadline.
+    """
+    current = _deadline.get()
+
+    if current is None:
+        return None
+
+    return current - time.monotonic()
+
+
+def is_exhausted():
+    remaining = remaining_seconds()
+    return remaining is not None and remaining <= 0
+
+
+async def within_deadline(awaitable):
+    """
+    Awaits <awaitable>, cancelling it and raising <PYRDeadlineExceededError>
+    if it can not finish until the deadline.
+    """
+    remaining = remaining_seconds()
+
+    if remaining is None:
+        return await awaitable
+
+    if remaining <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+
+        raise PYRDeadlineExceededError("Request deadline exceeded")
+
+    try:
+        return await asyncio.wait_for(awaitable, remaining)
+    except asyncio.TimeoutError:
+        raise PYRDeadlineExceededError("Request deadline exceeded")
@@ -9,3 +9,48 @@ def merge(source, destination):
             destination[key] = value
 
     return destination
+
+
+def get_by_slug_and_operation(config, slug, operation, default=None):
+    """
+    Returns the value of a config by slug and operation, like:
+    {"mock": {"list": 10}, "*": {"*": 30}}
+    Both slug and operation accept "*" as a default.
+    """
+    for slug_key in (slug, "*"):
+        operations = config.get(slug_key, {})
+
+        for operation_key in (operation, "*"):
+            if operation_key in operations:
+                return operations[operation_key]
+
+    return default
+
+
+def exceeds_size(data, limit):
+    """
+    Approximates the JSON encoded size of <data>, stopping as soon as it reaches <limit>,
+    so the cost is bounded by <limit> instead of by the payload size.
+    """
+    size = 0
+    stack = [data]
+
+    while stack:
+        value = stack.pop()
+
+        if isinstance(value, dict):
+            size += 2 + 2 * len(value)
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            size += 2 + len(value)
+            stack.extend(value)
+        elif isinstance(value, str):
+            size += 2 + len(value)
+        else:
+            size += 8
+
+        if size >= limit:
+            return True
+
+    return False
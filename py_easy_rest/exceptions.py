@@ -14,3 +14,40 @@ class PYRInputNotValidError(Exception):
 
     def __init__(self, message):
         self.message = message
+
+
+class PYRServiceUnavailableError(Exception):
+    """
+    Exception to raise in case of an operation shed by overload.
+    """
+
+    def __init__(self, message, retry_after_seconds):
+        self.message = message
+        self.retry_after_seconds = retry_after_seconds
+
+
+class PYRDeadlineExceededError(Exception):
+    """
+    Exception to raise in case of an operation not finished until the request deadline.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+class PYRCapacityExceededError(Exception):
+    """
+    Exception to raise in case of a write exceeding the repository capacity.
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+class PYRPreconditionFailedError(Exception):
+    """
+    Exception to raise in case of a write over a document version other than the expected.
+    """
+
+    def __init__(self, message):
+        self.message = message
@@ -0,0 +1,117 @@
+"""
+Module with on demand profiling of the running worker.
+"""
+import asyncio
+import cProfile
+import io
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+
+from collections import Counter
+
+from py_easy_rest.exceptions import PYRServiceUnavailableError
+
+
+PROFILE_FORMATS = ("pstats", "collapsed")
+
+
+class PYRProfiler():
+    """
+    Profiles the event loop thread of the worker for some seconds, one session at a time.
+    The "pstats" format is a cProfile report sorted by cumulative time, and the "collapsed" format
+    has the stacks sampled every <sampling_interval_seconds>, one per line with its count, for flame graphs.
+    Nothing is profiled, and nothing costs, out of a session.
+    """
+
+    def __init__(self, sampling_interval_seconds=0.005):
+        self._sampling_interval_seconds = sampling_interval_seconds
+        self._session_ends_at = None
+
+    async def profile(self, seconds, format="pstats"):
+        """
+        Profiles the current thread for <seconds>, returning the report in <format>.
+        Raises <PYRServiceUnavailableError> when there is a session running.
+        """
+        if format not in PROFILE_FORMATS:
+            raise ValueError(f"Profile format {format} not supported")
+
+        if self._session_ends_at is not None:
+            retry_after_seconds = max(1, math.ceil(self._session_ends_at - time.monotonic()))
+            raise PYRServiceUnavailableError("There is a profiling session running", retry_after_seconds)
+
+        self._session_ends_at = time.monotonic() + seconds
+
+        try:
+            if format == "collapsed":
+                return await self._sample(seconds)
+
+            return await self._profile(seconds)
+        finally:
+            self._session_ends_at = None
+
+    async def _profile(self, seconds):
+        profile = cProfile.Profile()
+        profile.enable()
+
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profile.disable()
+
+        report = io.StringIO()
+        pstats.Stats(profile, stream=report).sort_stats("cumulative").print_stats()
+
+        return report.getvalue()
+
+    async def _sample(self, seconds):
+        sampler = _StackSampler(threading.get_ident(), self._sampling_interval_seconds)
+        sampler.start()
+
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+
+        return "".join(f"{stack} {count}\n" for stack, count in sampler.stacks.most_common())
+
+
+class _StackSampler(threading.Thread):
+
+    def __init__(self, thread_id, interval_seconds):
+        super().__init__(name="py-easy-rest-stack-sampler", daemon=True)
+        self.stacks = Counter()
+        self._thread_id = thread_id
+        self._interval_seconds = interval_seconds
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            frame = sys._current_frames().get(self._thread_id)
+
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+
+            del frame
+            time.sleep(self._interval_seconds)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _collapse(frame):
+    """
+    Returns the stack of <frame> from the root, with the frames separated by semicolons.
+    """
+    names = []
+
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+
+    return ";".join(reversed(names))
@@ -1,9 +1,22 @@
+import bisect
+import json
+import math
+import operator
+import re
+import sys
 import uuid
 
+from collections import OrderedDict
+
+from py_easy_rest.exceptions import PYRCapacityExceededError
+
 """
 Module with repositories to be used connected with api.
 """
 
+# property with the document version, maintained by the service
+VERSION_PROPERTY = "_version"
+
 
 class Repo():
     """
@@ -18,11 +31,38 @@ class Repo():
         """
         raise NotImplementedError
 
-    async def list(self, slug, page=0, size=30):
+    async def get_many(self, slug, ids):
+        """
+        Receives <slug> and a list of <ids> and return a dictionary with the documents found by id.
+        Repos able to get many documents in one round trip should override it.
+        """
+        result = {}
+
+        for id in ids:
+            doc = await self.get(slug, id)
+
+            if doc is not None:
+                result[id] = doc
+
+        return result
+
+    async def list(self, slug, page=0, size=30, count=True, filters=None):
         """
-        Receives <slug>, <page> and <size> and return a object with the result, page and size.
+        Receives <slug>, <page> and <size> and return a object with the result, page, size and totalCount.
         It's possible to put other properties in this result object too.
         If result is empty, return a empty list.
+        If <count> is False, totalCount may be skipped.
+        If <filters> is received, a list of (property, operator, value) with the operator one of
+        <FILTER_OPERATORS> and the value a number or boolean, only the documents having a value of the
+        same type matching all of them are listed. Repos not supporting filters raise NotImplementedError.
+        """
+        raise NotImplementedError
+
+    async def count(self, slug, estimate=False):
+        """
+        Receives <slug> and return the number of documents.
+        If <estimate> is True, a cheaper approximated number can be returned.
+        This method is optional, repos not implementing it return totalCount with the list.
         """
         raise NotImplementedError
 
@@ -47,12 +87,91 @@ class Repo():
         """
         raise NotImplementedError
 
+    async def search(self, slug, query, page=0, size=30):
+        """
+        Receives <slug>, a text <query>, <page> and <size> and return a object with the result ranked by relevance,
+        page, size and totalCount.
+        This method is optional, repos not implementing it do not support search.
+        """
+        raise NotImplementedError
+
+    async def aggregate(self, slug, group_by, metric):
+        """
+        Receives <slug>, the property to <group_by> and a <metric>, "count" or "sum", "min" or "max"
+        of a property, like "sum:price", and return a object with the result, a list with the group
+        and value of each group.
+        This method is optional, repos not implementing it do not support aggregates.
+        """
+        raise NotImplementedError
+
+    async def compare_and_swap(self, slug, id, version, data):
+        """
+        Receives <slug>, <id>, <version> and <data>, and atomically replaces the resource by <data>,
+        or deletes it when <data> is None, only if its <VERSION_PROPERTY> is <version> (0 when missing).
+        Return True if it was replaced or deleted, False otherwise.
+        This method is optional, repos not implementing it are written without checking the version.
+        """
+        raise NotImplementedError
+
 
 class PYRMemoryRepo(Repo):
+    """
+    Repository keeping the documents in memory.
+    With <compact>, documents are stored encoded as bytes with <encoding> ("json" or "msgpack"),
+    and decoded on read. With <schemas> too, the schema property names are stored as short keys.
+
+    The approximate memory used by the documents is accounted per slug and in total.
+    Writes exceeding <max_bytes> or <max_bytes_per_slug> raise <PYRCapacityExceededError>
+    with the "reject" <eviction_policy>, or evict the oldest ("fifo") or least recently
+    read or written ("lru") documents. Documents larger than the capacity are always rejected.
+
+    With <schemas>, the string properties marked as "searchable" are indexed, to search documents
+    by words, with the last word of the query matching as a prefix.
+    The "aggregates" declared by the schemas, like {"category": ["count", "sum:price"]},
+    are maintained on every write, so they are queried without reading the documents.
+
+    With <columnar> and <schemas>, the "number", "integer" and "boolean" properties are kept in NumPy arrays
+    too, so the list filters and the aggregates of these properties are computed vectorized.
+    It requires `pip install py-easy-rest[columnar]`.
+    """
+
+    def __init__(
+        self,
+        initial_data=None,
+        compact=False,
+        encoding="json",
+        schemas=None,
+        max_bytes=None,
+        max_bytes_per_slug=None,
+        eviction_policy="reject",
+        columnar=False,
+    ):
+        if eviction_policy not in EVICTION_POLICIES:
+            raise ValueError(f"Eviction policy {eviction_policy} not supported")
 
-    def __init__(self, initial_data=None):
         self._data = {}
         self._data_index = {}
+        self._codecs = {}
+        self._max_bytes = max_bytes
+        self._max_bytes_per_slug = max_bytes_per_slug
+        self._eviction_policy = eviction_policy
+        self._total_bytes = 0
+        self._slug_bytes = {}
+        self._slug_sizes = {}
+        self._eviction_order = OrderedDict()
+        self._evicted = 0
+        self._search_indexes = _build_search_indexes(schemas or [])
+        self._aggregates = _build_aggregates(schemas or [])
+        self._column_stores = _build_column_stores(schemas or []) if columnar else {}
+
+        if compact:
+            self._codecs = {
+                schema["slug"]: _DocumentCodec(encoding, list(schema.get("properties", {})))
+                for schema in schemas or []
+            }
+            self._default_codec = _DocumentCodec(encoding)
+
+        self._compact = compact
 
         if initial_data is not None:
             self._data = initial_data
@@ -60,11 +179,31 @@ class PYRMemoryRepo(Repo):
             for key, value in initial_data.items():
                 self._data_index[key] = list(self._data[key].keys())
 
+                if compact:
+                    codec = self._get_codec(key)
+                    self._data[key] = {id: codec.encode(doc) for id, doc in value.items()}
+
+                self._ensure_slug_exists(key)
+
+                for id, doc in self._data[key].items():
+                    self._account(key, id, self._sizeof(id, doc))
+
+                for id, doc in value.items():
+                    self._index(key, id, doc)
+
     async def get(self, slug, id):
         self._ensure_slug_exists(slug)
-        return self._data[slug].get(id)
+        doc = self._data[slug].get(id)
+
+        if doc is not None and self._eviction_policy == "lru":
+            self._touch(slug, id)
 
-    async def list(self, slug, page, size):
+        if doc is None or not self._compact:
+            return doc
+
+        return self._get_codec(slug).decode(doc)
+
+    async def list(self, slug, page, size, count=True, filters=None):
         self._ensure_slug_exists(slug)
         page = page or 0
         size = size or 30
@@ -72,15 +211,66 @@ class PYRMemoryRepo(Repo):
         start = page * size
         stop = start + size
 
-        result = self._data_index[slug][start:stop]
+        if filters:
+            result, total_count = self._filter(slug, filters, start, stop)
+        else:
+            result, total_count = self._data_index[slug][start:stop], len(self._data_index[slug])
+
+        docs = [self._data[slug][id] for id in result]
+
+        if self._compact:
+            codec = self._get_codec(slug)
+            docs = [codec.decode(doc) for doc in docs]
+
+        response = {
+            "result": docs,
+            "page": page,
+            "size": size,
+        }
+
+        if count:
+            response["totalCount"] = total_count
+
+        return response
+
+    async def count(self, slug, estimate=False):
+        self._ensure_slug_exists(slug)
+        return len(self._data_index[slug])
+
+    async def search(self, slug, query, page=0, size=30):
+        self._ensure_slug_exists(slug)
+        page = page or 0
+        size = size or 30
+
+        search_index = self._search_indexes.get(slug)
+
+        if search_index is None:
+            raise NotImplementedError
+
+        ids = search_index.search(query)
+        start = page * size
 
         return {
-            "result": [self._data[slug][id] for id in result],
+            "result": [await self.get(slug, id) for id in ids[start:start + size]],
             "page": page,
             "size": size,
-            "totalCount": len(self._data_index[slug])
+            "totalCount": len(ids),
         }
 
+    async def aggregate(self, slug, group_by, metric):
+        aggregate = self._aggregates.get(slug, {}).get(group_by)
+
+        if aggregate is not None and metric in aggregate.metrics:
+            return {"result": aggregate.query(metric)}
+
+        column_store = self._column_stores.get(slug)
+        name = metric.partition(":")[2]
+
+        if column_store is None or group_by not in column_store.kinds or (name and name not in column_store.kinds):
+            raise NotImplementedError
+
+        return {"result": column_store.aggregate(group_by, metric)}
+
     async def create(self, slug, data, id=None):
         self._ensure_slug_exists(slug)
 
@@ -89,29 +279,633 @@ class PYRMemoryRepo(Repo):
 
         data['id'] = id
 
-        if id not in self._data_index[slug]:
-            self._data_index[slug].append(id)
-
-        self._data[slug][id] = data
+        self._store(slug, id, data)
 
         return id
 
     async def replace(self, slug, id, data):
         self._ensure_slug_exists(slug)
-        if id in self._data_index[slug]:
+        if id in self._data[slug]:
             data['id'] = id
-            self._data[slug][id] = data
+            self._store(slug, id, data)
 
     async def delete(self, slug, id):
         self._ensure_slug_exists(slug)
-        self._data[slug].pop(id, None)
 
-        if id in self._data_index[slug]:
-            self._data_index[slug].remove(id)
+        if id in self._data[slug]:
+            self._remove(slug, id)
+
+    async def compare_and_swap(self, slug, id, version, data):
+        existent_doc = await self.get(slug, id)
+
+        if existent_doc is None or existent_doc.get(VERSION_PROPERTY, 0) != version:
+            return False
+
+        if data is None:
+            self._remove(slug, id)
+        else:
+            data['id'] = id
+            self._store(slug, id, data)
+
+        return True
+
+    def memory_usage(self):
+        """
+        Returns the approximate memory used by the documents, in bytes, in total and per slug.
+        """
+        return {
+            "total_bytes": self._total_bytes,
+            "max_bytes": self._max_bytes,
+            "max_bytes_per_slug": self._max_bytes_per_slug,
+            "evicted_documents": self._evicted,
+            "slugs": {
+                slug: {"bytes": slug_bytes, "documents": len(self._slug_sizes[slug])}
+                for slug, slug_bytes in self._slug_bytes.items()
+            },
+        }
+
+    def _store(self, slug, id, data):
+        stored = self._encode(slug, data)
+        size = self._sizeof(id, stored)
+
+        self._make_room(slug, id, size, size - self._slug_sizes[slug].get(id, 0))
+
+        if id not in self._data[slug]:
+            self._data_index[slug].append(id)
+
+        self._data[slug][id] = stored
+        self._account(slug, id, size)
+        self._index(slug, id, data)
+
+    def _remove(self, slug, id):
+        del self._data[slug][id]
+        self._data_index[slug].remove(id)
+
+        size = self._slug_sizes[slug].pop(id)
+        self._slug_bytes[slug] -= size
+        self._total_bytes -= size
+        del self._eviction_order[(slug, id)]
+        self._unindex(slug, id)
+
+    def _filter(self, slug, filters, start, stop):
+        """
+        Returns the ids from <start> to <stop> of the documents matching <filters>, and the number of them.
+        """
+        column_store = self._column_stores.get(slug)
+
+        if column_store is not None and all(name in column_store.kinds for name, _, _ in filters):
+            return column_store.filter(filters, start, stop)
+
+        codec = self._get_codec(slug) if self._compact else None
+        matched = []
+
+        for id in self._data_index[slug]:
+            doc = self._data[slug][id]
+
+            if codec is not None:
+                doc = codec.decode(doc)
+
+            if _matches(doc, filters):
+                matched.append(id)
+
+        return matched[start:stop], len(matched)
+
+    def _index(self, slug, id, doc):
+        if slug in self._search_indexes:
+            self._search_indexes[slug].add(id, doc)
+
+        if slug in self._column_stores:
+            self._column_stores[slug].add(id, doc)
+
+        for aggregate in self._aggregates.get(slug, {}).values():
+            aggregate.add(id, doc)
+
+    def _unindex(self, slug, id):
+        if slug in self._search_indexes:
+            self._search_indexes[slug].remove(id)
+
+        if slug in self._column_stores:
+            self._column_stores[slug].remove(id)
+
+        for aggregate in self._aggregates.get(slug, {}).values():
+            aggregate.remove(id)
+
+    def _account(self, slug, id, size):
+        previous_size = self._slug_sizes[slug].get(id, 0)
+
+        self._slug_sizes[slug][id] = size
+        self._slug_bytes[slug] += size - previous_size
+        self._total_bytes += size - previous_size
+        self._eviction_order[(slug, id)] = None
+
+        if self._eviction_policy == "lru":
+            self._touch(slug, id)
+
+    def _touch(self, slug, id):
+        self._slug_sizes[slug].move_to_end(id)
+        self._eviction_order.move_to_end((slug, id))
+
+    def _make_room(self, slug, id, size, size_increase):
+        if size_increase <= 0:
+            return
+
+        # a document larger than the capacity is rejected before evicting the others for nothing
+        if any(limit is not None and size > limit for limit in (self._max_bytes, self._max_bytes_per_slug)):
+            raise PYRCapacityExceededError(f"{slug} {id} exceeds the repository capacity")
+
+        while self._max_bytes_per_slug is not None \
+                and self._slug_bytes[slug] + size_increase > self._max_bytes_per_slug:
+            self._evict(slug, id, ((slug, candidate) for candidate in self._slug_sizes[slug]))
+
+        while self._max_bytes is not None and self._total_bytes + size_increase > self._max_bytes:
+            self._evict(slug, id, iter(self._eviction_order))
+
+    def _evict(self, slug, id, candidates):
+        """
+        Evicts the first of <candidates> which is not the document being written.
+        """
+        victim = None
+
+        if self._eviction_policy != "reject":
+            victim = next((candidate for candidate in candidates if candidate != (slug, id)), None)
+
+        if victim is None:
+            raise PYRCapacityExceededError(f"{slug} {id} exceeds the repository capacity")
+
+        self._remove(*victim)
+        self._evicted += 1
+
+    def _sizeof(self, id, stored):
+        if self._compact:
+            return _ENTRY_OVERHEAD_BYTES + sys.getsizeof(id) + sys.getsizeof(stored)
+
+        return _ENTRY_OVERHEAD_BYTES + sys.getsizeof(id) + _deep_sizeof(stored)
+
+    def _encode(self, slug, data):
+        if not self._compact:
+            return data
+
+        return self._get_codec(slug).encode(data)
+
+    def _get_codec(self, slug):
+        return self._codecs.get(slug, self._default_codec)
 
     def _ensure_slug_exists(self, slug):
-        if not self._data.get(slug):
-            self._data[slug] = {}
+        self._data.setdefault(slug, {})
+        self._data_index.setdefault(slug, [])
+        self._slug_sizes.setdefault(slug, OrderedDict())
+        self._slug_bytes.setdefault(slug, 0)
+
+
+EVICTION_POLICIES = ("reject", "fifo", "lru")
+
+FILTER_OPERATORS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+# approximated memory used by each entry in the data dictionary and index list
+_ENTRY_OVERHEAD_BYTES = 120
+
+
+def _deep_sizeof(value):
+    size = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(key) + _deep_sizeof(item) for key, item in value.items())
+    elif isinstance(value, list):
+        size += sum(_deep_sizeof(item) for item in value)
+
+    return size
+
+
+class _SearchIndex():
+    """
+    Inverted index from the words of the <properties> to the ids of the documents having them,
+    with the words sorted, so the ones starting with a prefix are found by bisection.
+    """
+
+    def __init__(self, properties):
+        self._properties = properties
+        self._postings = {}
+        self._words = []
+        self._document_words = {}
+
+    def add(self, id, doc):
+        self.remove(id)
+
+        words = set()
+
+        for name in self._properties:
+            value = doc.get(name)
+
+            if isinstance(value, str):
+                words.update(_tokenize(value))
+
+        for word in words:
+            postings = self._postings.get(word)
+
+            if postings is None:
+                postings = self._postings[word] = set()
+                bisect.insort(self._words, word)
+
+            postings.add(id)
+
+        self._document_words[id] = words
+
+    def remove(self, id):
+        for word in self._document_words.pop(id, ()):
+            postings = self._postings[word]
+            postings.discard(id)
+
+            if not postings:
+                del self._postings[word]
+                del self._words[bisect.bisect_left(self._words, word)]
+
+    def search(self, query):
+        """
+        Returns the ids of the documents having all words of <query>, the last one as a prefix,
+        ranked by the number of words matched exactly.
+        """
+        words = _tokenize(query)
+
+        if not words:
+            return []
+
+        scores = None
+
+        for position, word in enumerate(words):
+            word_scores = {id: 2 for id in self._postings.get(word, ())}
+
+            if position == len(words) - 1:
+                for prefixed_word in self._prefixed_words(word):
+                    for id in self._postings[prefixed_word]:
+                        word_scores.setdefault(id, 1)
+
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {id: score + word_scores[id] for id, score in scores.items() if id in word_scores}
+
+        return sorted(scores, key=lambda id: (-scores[id], id))
+
+    def _prefixed_words(self, prefix):
+        for index in range(bisect.bisect_left(self._words, prefix), len(self._words)):
+            word = self._words[index]
+
+            if not word.startswith(prefix):
+                break
+
+            if word != prefix:
+                yield word
+
+
+def _build_search_indexes(schemas):
+    search_indexes = {}
+
+    for schema in schemas:
+        properties = [name for name, property in schema.get("properties", {}).items() if property.get("searchable")]
+
+        if properties:
+            search_indexes[schema["slug"]] = _SearchIndex(properties)
+
+    return search_indexes
+
+
+def _tokenize(text):
+    return _WORD_PATTERN.findall(text.lower())
+
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+class _Aggregate():
+    """
+    Count, and sum, min and max of the numeric <properties> of the <metrics>, by group of documents
+    with the same <group_by> value, updated as the documents are added and removed.
+    The values of each group are kept sorted, so min and max survive removals.
+    """
+
+    def __init__(self, group_by, metrics):
+        self.metrics = set(metrics)
+        self._group_by = group_by
+        self._properties = {metric.partition(":")[2] for metric in metrics} - {""}
+        self._groups = {}
+        self._document_entries = {}
+
+    def add(self, id, doc):
+        self.remove(id)
+
+        group_value = doc.get(self._group_by)
+
+        if not isinstance(group_value, _GROUPABLE_TYPES):
+            return
+
+        # booleans are equal to 1 and 0, but are kept in their own groups
+        group_key = (isinstance(group_value, bool), group_value)
+
+        values = {name: doc[name] for name in self._properties if _is_number(doc.get(name))}
+        group = self._groups.setdefault(group_key, _AggregateGroup())
+        group.count += 1
+
+        for name, value in values.items():
+            group.sums[name] = group.sums.get(name, 0) + value
+            bisect.insort(group.values.setdefault(name, []), value)
+
+        self._document_entries[id] = (group_key, values)
+
+    def remove(self, id):
+        entry = self._document_entries.pop(id, None)
+
+        if entry is None:
+            return
+
+        group_key, values = entry
+        group = self._groups[group_key]
+        group.count -= 1
+
+        if not group.count:
+            del self._groups[group_key]
+            return
+
+        for name, value in values.items():
+            group.sums[name] -= value
+            sorted_values = group.values[name]
+            del sorted_values[bisect.bisect_left(sorted_values, value)]
+
+    def query(self, metric):
+        """
+        Returns the group and the value of <metric> of each group, sorted by group.
+        """
+        function, _, name = metric.partition(":")
+        result = []
+
+        for group_key in sorted(self._groups, key=lambda key: (_group_sort_key(key[1]), key[0])):
+            group = self._groups[group_key]
+            values = group.values.get(name)
+
+            if function == "count":
+                value = group.count
+            elif function == "sum":
+                value = group.sums.get(name, 0)
+            elif function == "min":
+                value = values[0] if values else None
+            else:
+                value = values[-1] if values else None
+
+            result.append({"group": group_key[1], "value": value})
+
+        return result
+
+
+class _AggregateGroup():
+
+    def __init__(self):
+        self.count = 0
+        self.sums = {}
+        self.values = {}
+
+
+_GROUPABLE_TYPES = (str, int, float, bool, type(None))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _group_sort_key(group_key):
+    # numbers first, then strings, then the documents without the property
+    return (group_key is None, isinstance(group_key, str), group_key if group_key is not None else 0)
+
+
+def _build_aggregates(schemas):
+    return {
+        schema["slug"]: {
+            group_by: _Aggregate(group_by, metrics) for group_by, metrics in schema["aggregates"].items()
+        }
+        for schema in schemas
+        if schema.get("aggregates")
+    }
+
+
+def _matches(doc, filters):
+    for name, filter_operator, value in filters:
+        doc_value = _column_value(doc.get(name), isinstance(value, bool))
+
+        if math.isnan(doc_value) or not FILTER_OPERATORS[filter_operator](doc_value, value):
+            return False
+
+    return True
+
+
+def _column_value(value, boolean):
+    """
+    Returns <value> as a float, or NaN when it is not a boolean, with <boolean>, or a number otherwise.
+    """
+    if boolean:
+        return float(value) if isinstance(value, bool) else math.nan
+
+    return float(value) if _is_number(value) else math.nan
+
+
+class _ColumnStore():
+    """
+    Values of the properties of <kinds>, by name, in NumPy float arrays with one row per document
+    in insertion order, and NaN when missing. Removed rows are kept as tombstones until they are
+    more than half of the rows, when the arrays are compacted.
+    Integers beyond 2 ** 53 are approximated.
+    """
+
+    def __init__(self, kinds):
+        import numpy
+
+        self.kinds = kinds
+        self._numpy = numpy
+        self._capacity = 16
+        self._size = 0
+        self._tombstones = 0
+        self._columns = {name: numpy.full(self._capacity, numpy.nan) for name in kinds}
+        self._alive = numpy.zeros(self._capacity, dtype=bool)
+        self._row_ids = []
+        self._rows = {}
+
+    def add(self, id, doc):
+        row = self._rows.get(id)
+
+        if row is None:
+            if self._size == self._capacity:
+                self._grow()
+
+            row = self._size
+            self._size += 1
+            self._rows[id] = row
+            self._row_ids.append(id)
+            self._alive[row] = True
+
+        for name, kind in self.kinds.items():
+            self._columns[name][row] = _column_value(doc.get(name), kind == "boolean")
+
+    def remove(self, id):
+        row = self._rows.pop(id, None)
+
+        if row is None:
+            return
+
+        self._alive[row] = False
+        self._row_ids[row] = None
+        self._tombstones += 1
+
+        if self._tombstones * 2 > self._size:
+            self._compact()
+
+    def filter(self, filters, start, stop):
+        """
+        Returns the ids from <start> to <stop> of the rows matching <filters>, and the number of them.
+        """
+        numpy = self._numpy
+        mask = self._alive[:self._size].copy()
+
+        for name, filter_operator, value in filters:
+            column = self._columns[name][:self._size]
+            mask &= ~numpy.isnan(column)
+            mask &= FILTER_OPERATORS[filter_operator](column, float(value))
+
+        rows = numpy.flatnonzero(mask)
+
+        return [self._row_ids[row] for row in rows[start:stop]], len(rows)
+
+    def aggregate(self, group_by, metric):
+        """
+        Returns the group and the value of <metric> of each group, like <_Aggregate.query>.
+        """
+        numpy = self._numpy
+        function, _, name = metric.partition(":")
+
+        alive = self._alive[:self._size]
+        group_keys, groups = numpy.unique(self._columns[group_by][:self._size][alive], return_inverse=True)
+        groups = groups.reshape(-1)
+
+        if function == "count":
+            values = numpy.bincount(groups, minlength=len(group_keys))
+        else:
+            column = self._columns[name][:self._size][alive]
+            present = ~numpy.isnan(column)
+
+            if function == "sum":
+                values = numpy.bincount(groups[present], weights=column[present], minlength=len(group_keys))
+            else:
+                # fmin and fmax ignore the NaN of the missing values
+                values = numpy.full(len(group_keys), numpy.nan)
+                (numpy.fmin if function == "min" else numpy.fmax).at(values, groups, column)
+
+        return [
+            {
+                "group": self._to_python(group_by, group_key),
+                "value": int(value) if function == "count" else self._to_python(name, value, is_sum=function == "sum"),
+            }
+            for group_key, value in zip(group_keys.tolist(), values.tolist())
+        ]
+
+    def _to_python(self, name, value, is_sum=False):
+        if math.isnan(value):
+            return None
+
+        if self.kinds[name] == "number":
+            return value
+
+        if self.kinds[name] == "boolean" and not is_sum:
+            return bool(value)
+
+        return int(value)
+
+    def _grow(self):
+        numpy = self._numpy
+        self._capacity *= 2
+
+        for name, column in self._columns.items():
+            self._columns[name] = numpy.full(self._capacity, numpy.nan)
+            self._columns[name][:self._size] = column[:self._size]
+
+        alive = self._alive
+        self._alive = numpy.zeros(self._capacity, dtype=bool)
+        self._alive[:self._size] = alive[:self._size]
+
+    def _compact(self):
+        alive = self._alive[:self._size].copy()
+        size = int(alive.sum())
+
+        for column in self._columns.values():
+            column[:size] = column[:self._size][alive]
+            column[size:self._size] = self._numpy.nan
+
+        self._alive[:size] = True
+        self._alive[size:self._size] = False
+        self._row_ids = [id for id in self._row_ids if id is not None]
+        self._rows = {id: row for row, id in enumerate(self._row_ids)}
+        self._size = size
+        self._tombstones = 0
+
+
+def _build_column_stores(schemas):
+    column_stores = {}
+
+    for schema in schemas:
+        kinds = {
+            name: property["type"] for name, property in schema.get("properties", {}).items()
+            if property.get("type") in FILTERABLE_TYPES
+        }
+
+        if kinds:
+            column_stores[schema["slug"]] = _ColumnStore(kinds)
+
+    return column_stores
+
+
+# schema property types which can be filtered, kept in columns by the columnar mode
+FILTERABLE_TYPES = ("number", "integer", "boolean")
+
+
+class _DocumentCodec():
+    """
+    Encodes documents as bytes, replacing the known <keys> by their index.
+    Other keys are prefixed by "~", so they never collide with an index.
+    """
+
+    def __init__(self, encoding, keys=None):
+        keys = keys or []
+
+        self._short_keys = {key: str(index) for index, key in enumerate(keys)}
+        self._long_keys = {str(index): key for index, key in enumerate(keys)}
+
+        if encoding == "msgpack":
+            import msgpack
+
+            self._dumps = msgpack.packb
+            self._loads = msgpack.unpackb
+        elif encoding == "json":
+            self._dumps = _dumps_compact_json
+            self._loads = json.loads
+        else:
+            raise ValueError(f"Encoding {encoding} not supported")
+
+    def encode(self, doc):
+        if self._short_keys:
+            doc = {self._short_keys.get(key) or f"~{key}": value for key, value in doc.items()}
+
+        return self._dumps(doc)
+
+    def decode(self, encoded):
+        doc = self._loads(encoded)
+
+        if self._short_keys:
+            doc = {key[1:] if key[0] == "~" else self._long_keys[key]: value for key, value in doc.items()}
+
+        return doc
+
 
-        if not self._data_index.get(slug):
-            self._data_index[slug] = []
+def _dumps_compact_json(doc):
+    return json.dumps(doc, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,830 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import math
+
+from sanic import Sanic, response
+from sanic_ext import openapi
+from sanic.exceptions import NotFound, SanicException, Unauthorized
+from sanic.handlers import ErrorHandler
+from sanic.log import logger
+
+from py_easy_rest.deadlines import clear_deadline, set_deadline
+from py_easy_rest.dictionary_utils import exceeds_size
+from py_easy_rest.exceptions import (
+    PYRCapacityExceededError,
+    PYRDeadlineExceededError,
+    PYRInputNotValidError,
+    PYRNotFoundError,
+    PYRPreconditionFailedError,
+    PYRServiceUnavailableError,
+)
+from py_easy_rest.profiling import PROFILE_FORMATS, PYRProfiler
+from py_easy_rest.repos import VERSION_PROPERTY
+from py_easy_rest.tracing import current_trace, span, start_trace
+
+
+DEFAULT_ENABLED_HANDLERS = [
+    "list",
+    "create",
+    "get",
+    "replace",
+    "partial_update",
+    "delete",
+]
+
+GENERIC_ROUTES_TAG = "entities"
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+# approximate size of the chunks of streamed list responses
+STREAM_CHUNK_BYTES = 64 * 1024
+
+OPENAPI_DOCUMENTATION = {
+    "schema": lambda: [
+        openapi.summary("Get JSON Schema"),
+        openapi.description("Route to get the api JSON Schema."),
+        openapi.response(200, {"application/json": None}, "Success to get JSON Schema."),
+    ],
+    "list": lambda: [
+        openapi.summary("List entities"),
+        openapi.description(
+            "Route to list entities. "
+            "You can use the parameters page and size. Default values: page=0, size=30. "
+            "The parameter count can be exact (default), estimate or none, to skip the totalCount. "
+            "With the parameter ids, a comma separated list, it gets the entities of these ids. "
+            "The parameter filter, like price:gte:10, repeatable, lists the entities matching all filters "
+            "of number or boolean properties, with the operators eq, ne, gt, gte, lt and lte."
+        ),
+        openapi.response(200, {"application/json": []}, "Success to list entities."),
+        openapi.response(500, {"application/json": None}, "Internal server error."),
+        openapi.parameter("page", int, "query"),
+        openapi.parameter("size", int, "query"),
+        openapi.parameter("count", str, "query"),
+        openapi.parameter("ids", str, "query"),
+        openapi.parameter("filter", str, "query"),
+    ],
+    "search": lambda: [
+        openapi.summary("Search entities"),
+        openapi.description(
+            "Route to search entities by the words of the parameter q, the last one matching as a prefix, "
+            "ranked by relevance. You can use the parameters page and size, like in the list route."
+        ),
+        openapi.response(200, {"application/json": []}, "Success to search entities."),
+        openapi.response(400, {"application/json": None}, "Validation error."),
+        openapi.response(404, {"application/json": None}, "Search not supported."),
+        openapi.parameter("q", str, "query", required=True),
+        openapi.parameter("page", int, "query"),
+        openapi.parameter("size", int, "query"),
+    ],
+    "aggregate": lambda: [
+        openapi.summary("Aggregate entities"),
+        openapi.description(
+            "Route to aggregate entities by group of the same group_by property value. "
+            "The parameter metric can be count (default), or sum, min or max of a property, like sum:price."
+        ),
+        openapi.response(200, {"application/json": []}, "Success to aggregate entities."),
+        openapi.response(400, {"application/json": None}, "Validation error."),
+        openapi.response(404, {"application/json": None}, "Aggregate not supported."),
+        openapi.parameter("group_by", str, "query", required=True),
+        openapi.parameter("metric", str, "query"),
+    ],
+    "create": lambda: [
+        openapi.summary("Create a new entity"),
+        openapi.description(
+            "Route to create a new entity. "
+            "Take a look at the schema route to know what properties you must send. "
+            "Requests repeated with the same Idempotency-Key header return the id of the first one, "
+            "instead of creating the entity again."
+        ),
+        openapi.response(201, {"application/json": None}, "Success to create a new entity."),
+        openapi.response(400, {"application/json": None}, "Validation error."),
+        openapi.response(500, {"application/json": None}, "Internal server error."),
+        openapi.parameter("id", required=False, allowEmptyValue=True, location="path"),
+        openapi.parameter(IDEMPOTENCY_KEY_HEADER, str, "header"),
+        openapi.body({"application/json": {}}),
+    ],
+    "get": lambda: [
+        openapi.summary("Get a entity by id"),
+        openapi.description("Route to get a entity by id, with its version in the ETag header."),
+        openapi.response(200, {"application/json": None}, "Success to get the entity."),
+        openapi.response(404, {"application/json": None}, "Entity not found."),
+        openapi.response(500, {"application/json": None}, "Internal server error."),
+        openapi.parameter("id", location="path"),
+    ],
+    "replace": lambda: [
+        openapi.summary("Replace a entity by id"),
+        openapi.description(
+            "Route to replace a entity. "
+            "Take a look at the schema route to know what properties you must send. "
+            "With the If-Match header, it is replaced only if its ETag matches."
+        ),
+        openapi.response(200, {"application/json": None}, "Success to replace the entity."),
+        openapi.response(400, {"application/json": None}, "Validation error."),
+        openapi.response(412, {"application/json": None}, "Entity version does not match the If-Match header."),
+        openapi.response(500, {"application/json": None}, "Internal server error."),
+        openapi.parameter("id", location="path"),
+        openapi.body({"application/json": {}}),
+    ],
+    "partial_update": lambda: [
+        openapi.summary("Partial update a entity by id"),
+        openapi.description(
+            "Route to partial update a entity. "
+            "Take a look at the schema route to know what properties you must send. "
+            "With the If-Match header, it is updated only if its ETag matches."
+        ),
+        openapi.response(200, {"application/json": None}, "Success to partial update the entity."),
+        openapi.response(400, {"application/json": None}, "Validation error."),
+        openapi.response(412, {"application/json": None}, "Entity version does not match the If-Match header."),
+        openapi.response(500, {"application/json": None}, "Internal server error."),
+        openapi.parameter("id", location="path"),
+        openapi.body({"application/json": {}}),
+    ],
+    "delete": lambda: [
+        openapi.summary("Delete a entity by id"),
+        openapi.description(
+            "Route to delete a entity. "
+            "With the If-Match header, it is deleted only if its ETag matches."
+        ),
+        openapi.response(200, {"application/json": None}, "Success to delete the entity."),
+        openapi.response(412, {"application/json": None}, "Entity version does not match the If-Match header."),
+        openapi.response(500, {"application/json": None}, "Internal server error."),
+        openapi.parameter("id", location="path"),
+    ],
+    "changes": lambda: [
+        openapi.summary("Stream entity changes"),
+        openapi.description(
+            "Route streaming the entity changes as Server-Sent Events, "
+            "with the change sequence as event id and the operation as event type. "
+            "The parameter since, or the Last-Event-ID header, resumes after a sequence. "
+            "A reset event means the changes after it are not retained, and the entities must be fetched again."
+        ),
+        openapi.response(200, {"text/event-stream": None}, "Stream of entity changes."),
+        openapi.response(404, {"application/json": None}, "Change feed not enabled."),
+        openapi.parameter("since", int, "query"),
+    ],
+}
+
+# handlers of the generic routes, by path and method
+GENERIC_ROUTES_HANDLERS = {
+    ("/{slug}/schema", "get"): "schema",
+    ("/{slug}/_changes", "get"): "changes",
+    ("/{slug}/_search", "get"): "search",
+    ("/{slug}/_aggregate", "get"): "aggregate",
+    ("/{slug}", "get"): "list",
+    ("/{slug}", "post"): "create",
+    ("/{slug}/{id}", "post"): "create",
+    ("/{slug}/{id}", "get"): "get",
+    ("/{slug}/{id}", "put"): "replace",
+    ("/{slug}/{id}", "patch"): "partial_update",
+    ("/{slug}/{id}", "delete"): "delete",
+}
+
+
+class PYRSanicAppBuilder():
+
+    @staticmethod
+    def build(
+        api_config,
+        service,
+        documents_cache_seconds_ttl=60 * 60 * 24,  # one day
+        deadline_header="X-Request-Timeout",
+        generic_routes=False,
+        changes_heartbeat_seconds=15,
+        stream_list_min_bytes=None,
+        server_timing=False,
+        span_hooks=None,
+        profiling_token=None,
+        profiling_max_seconds=30,
+        warmup=None,
+    ):
+        schemas = api_config["schemas"]
+
+        app = Sanic(api_config["name"])
+
+        service.set_logger(logger)
+
+        slug_table = None
+
+        if generic_routes:
+            slug_table = PYRSanicAppBuilder._define_generic_routes(
+                schemas, app, service, documents_cache_seconds_ttl, changes_heartbeat_seconds, stream_list_min_bytes
+            )
+        else:
+            for schema in schemas:
+                PYRSanicAppBuilder._define_routes(
+                    schema, app, service, documents_cache_seconds_ttl, changes_heartbeat_seconds, stream_list_min_bytes
+                )
+
+        app.error_handler = CustomErrorHandler()
+
+        if deadline_header is not None:
+            @app.on_request
+            async def _set_request_deadline(request):
+                # the requests of a keep-alive connection share its task, and its context variables
+                clear_deadline()
+                timeout = request.headers.get(deadline_header)
+
+                if timeout is None:
+                    return
+
+                try:
+                    timeout = float(timeout)
+                except ValueError:
+                    timeout = None
+
+                if timeout is None or not 0 < timeout < math.inf:
+                    raise PYRInputNotValidError([f"{deadline_header} must be a positive number of seconds"])
+
+                set_deadline(timeout)
+
+        if server_timing or span_hooks:
+            @app.on_request
+            async def _start_request_trace(request):
+                # replaces the trace of the previous request of the connection
+                start_trace(span_hooks)
+
+        if server_timing:
+            @app.on_response
+            async def _add_server_timing(request, response):
+                trace = current_trace()
+
+                if trace is not None:
+                    response.headers["Server-Timing"] = trace.server_timing()
+
+        if profiling_token is not None:
+            PYRSanicAppBuilder._define_profiling_route(app, profiling_token, profiling_max_seconds)
+
+        if warmup is not None:
+            PYRSanicAppBuilder._define_warmup(app, service, schemas, warmup)
+
+        schemas_document = PrerenderedDocument(schemas, documents_cache_seconds_ttl)
+
+        @app.get("/schemas")
+        @openapi.tag("schemas")
+        @openapi.summary("Get JSON Schemas")
+        @openapi.description("Route to get the api JSON Schemas.")
+        @openapi.response(200, {"application/json": None}, "Success to get JSON Schemas.")
+        async def _get_schema(request):
+            return schemas_document.response(request)
+
+        @app.after_server_start
+        async def _prerender_openapi_document(app, loop):
+            PYRSanicAppBuilder._prerender_openapi_document(app, documents_cache_seconds_ttl, slug_table)
+
+        return app
+
+    @staticmethod
+    def _define_routes(
+        schema, app, service, documents_cache_seconds_ttl, changes_heartbeat_seconds, stream_list_min_bytes
+    ):
+        slug = schema['slug']
+        name = schema['name']
+
+        schema_document = PrerenderedDocument(schema, documents_cache_seconds_ttl)
+
+        enabled_handlers = schema.get('enabled_handlers', DEFAULT_ENABLED_HANDLERS)
+
+        @app.get(f"/{slug}/schema")
+        @PYRSanicAppBuilder._document("schema", name)
+        async def _get_schema(request):
+            return schema_document.response(request)
+
+        if "changes" in enabled_handlers:
+            @app.get(f"/{slug}/_changes")
+            @PYRSanicAppBuilder._document("changes", name)
+            async def _changes(request):
+                return await PYRSanicAppBuilder._handle_changes(service, slug, request, changes_heartbeat_seconds)
+
+        if "search" in enabled_handlers:
+            @app.get(f"/{slug}/_search")
+            @PYRSanicAppBuilder._document("search", name)
+            async def _search(request):
+                return await PYRSanicAppBuilder._handle_search(service, slug, request)
+
+        if "aggregate" in enabled_handlers:
+            @app.get(f"/{slug}/_aggregate")
+            @PYRSanicAppBuilder._document("aggregate", name)
+            async def _aggregate(request):
+                return await PYRSanicAppBuilder._handle_aggregate(service, slug, request)
+
+        if "list" in enabled_handlers:
+            @app.get(f"/{slug}")
+            @PYRSanicAppBuilder._document("list", name)
+            async def _list(request):
+                return await PYRSanicAppBuilder._handle_list(service, slug, request, stream_list_min_bytes)
+
+        if "create" in enabled_handlers:
+            @app.post(f"/{slug}")
+            @app.post(f"/{slug}/<id>")
+            @PYRSanicAppBuilder._document("create", name)
+            async def _post(request, id=None):
+                return await PYRSanicAppBuilder._handle_create(service, slug, request, id)
+
+        if "get" in enabled_handlers:
+            @app.get(f"/{slug}/<id>")
+            @PYRSanicAppBuilder._document("get", name)
+            async def _get(request, id):
+                return await PYRSanicAppBuilder._handle_get(service, slug, request, id)
+
+        if "replace" in enabled_handlers:
+            @app.put(f"/{slug}/<id>")
+            @PYRSanicAppBuilder._document("replace", name)
+            async def _put(request, id):
+                return await PYRSanicAppBuilder._handle_replace(service, slug, request, id)
+
+        if "partial_update" in enabled_handlers:
+            @app.patch(f"/{slug}/<id>")
+            @PYRSanicAppBuilder._document("partial_update", name)
+            async def _patch(request, id):
+                return await PYRSanicAppBuilder._handle_partial_update(service, slug, request, id)
+
+        if "delete" in enabled_handlers:
+            @app.delete(f"/{slug}/<id>")
+            @PYRSanicAppBuilder._document("delete", name)
+            async def _delete(request, id):
+                return await PYRSanicAppBuilder._handle_delete(service, slug, request, id)
+
+    @staticmethod
+    def _define_generic_routes(
+        schemas, app, service, documents_cache_seconds_ttl, changes_heartbeat_seconds, stream_list_min_bytes
+    ):
+        """
+        Defines a fixed set of routes parameterized by slug, dispatching through a slug table,
+        so the build time and router size do not grow with the number of schemas.
+        Returns the slug table.
+        """
+        slug_table = {
+            schema["slug"]: GenericSlugRoutes(schema, documents_cache_seconds_ttl)
+            for schema in schemas
+        }
+
+        def resolve(slug, handler):
+            slug_routes = slug_table.get(slug)
+
+            if slug_routes is None or handler not in slug_routes.enabled_handlers:
+                raise NotFound(f"Requested URL /{slug} not found")
+
+            return slug_routes
+
+        @app.get("/<slug>/schema")
+        @PYRSanicAppBuilder._document("schema", GENERIC_ROUTES_TAG)
+        async def _get_schema(request, slug):
+            return resolve(slug, "schema").schema_document.response(request)
+
+        @app.get("/<slug>/_changes")
+        @PYRSanicAppBuilder._document("changes", GENERIC_ROUTES_TAG)
+        async def _changes(request, slug):
+            resolve(slug, "changes")
+            return await PYRSanicAppBuilder._handle_changes(service, slug, request, changes_heartbeat_seconds)
+
+        @app.get("/<slug>/_search")
+        @PYRSanicAppBuilder._document("search", GENERIC_ROUTES_TAG)
+        async def _search(request, slug):
+            resolve(slug, "search")
+            return await PYRSanicAppBuilder._handle_search(service, slug, request)
+
+        @app.get("/<slug>/_aggregate")
+        @PYRSanicAppBuilder._document("aggregate", GENERIC_ROUTES_TAG)
+        async def _aggregate(request, slug):
+            resolve(slug, "aggregate")
+            return await PYRSanicAppBuilder._handle_aggregate(service, slug, request)
+
+        @app.get("/<slug>")
+        @PYRSanicAppBuilder._document("list", GENERIC_ROUTES_TAG)
+        async def _list(request, slug):
+            resolve(slug, "list")
+            return await PYRSanicAppBuilder._handle_list(service, slug, request, stream_list_min_bytes)
+
+        @app.post("/<slug>")
+        @app.post("/<slug>/<id>")
+        @PYRSanicAppBuilder._document("create", GENERIC_ROUTES_TAG)
+        async def _post(request, slug, id=None):
+            resolve(slug, "create")
+            return await PYRSanicAppBuilder._handle_create(service, slug, request, id)
+
+        @app.get("/<slug>/<id>")
+        @PYRSanicAppBuilder._document("get", GENERIC_ROUTES_TAG)
+        async def _get(request, slug, id):
+            resolve(slug, "get")
+            return await PYRSanicAppBuilder._handle_get(service, slug, request, id)
+
+        @app.put("/<slug>/<id>")
+        @PYRSanicAppBuilder._document("replace", GENERIC_ROUTES_TAG)
+        async def _put(request, slug, id):
+            resolve(slug, "replace")
+            return await PYRSanicAppBuilder._handle_replace(service, slug, request, id)
+
+        @app.patch("/<slug>/<id>")
+        @PYRSanicAppBuilder._document("partial_update", GENERIC_ROUTES_TAG)
+        async def _patch(request, slug, id):
+            resolve(slug, "partial_update")
+            return await PYRSanicAppBuilder._handle_partial_update(service, slug, request, id)
+
+        @app.delete("/<slug>/<id>")
+        @PYRSanicAppBuilder._document("delete", GENERIC_ROUTES_TAG)
+        async def _delete(request, slug, id):
+            resolve(slug, "delete")
+            return await PYRSanicAppBuilder._handle_delete(service, slug, request, id)
+
+        return slug_table
+
+    @staticmethod
+    def _define_warmup(app, service, schemas, warmup):
+        """
+        Runs the <warmup> in background once the worker starts, with a readiness route
+        answering 503 until it is done, and saves its recorded hot ids when the worker stops.
+        """
+        enabled_handlers = {
+            schema["slug"]: schema.get("enabled_handlers", DEFAULT_ENABLED_HANDLERS) for schema in schemas
+        }
+
+        @app.after_server_start
+        async def _start_warmup(app, loop):
+            app.add_task(warmup.run(service, enabled_handlers))
+
+        @app.after_server_stop
+        async def _save_hot_ids(app, loop):
+            warmup.save_hot_ids()
+
+        @app.get("/_ready")
+        @openapi.exclude()
+        async def _ready(request):
+            return response.json({"ready": warmup.ready}, status=200 if warmup.ready else 503)
+
+    @staticmethod
+    def _define_profiling_route(app, profiling_token, profiling_max_seconds):
+        """
+        Defines the admin route profiling the worker, authorized by the <profiling_token> as a bearer token.
+        Sessions are limited to half the response timeout, so the report is sent before it.
+        """
+        profiler = PYRProfiler()
+        profiling_max_seconds = min(profiling_max_seconds, app.config.RESPONSE_TIMEOUT / 2)
+        default_seconds = min(10, profiling_max_seconds)
+        expected_authorization = f"Bearer {profiling_token}".encode("utf-8")
+
+        @app.get("/_admin/profile")
+        @openapi.exclude()
+        async def _profile(request):
+            authorization = request.headers.get("authorization", "").encode("utf-8")
+
+            if not hmac.compare_digest(authorization, expected_authorization):
+                raise Unauthorized("Invalid profiling token", scheme="Bearer")
+
+            seconds = PYRSanicAppBuilder._get_query_string_arg(request.args, "seconds") or default_seconds
+            format = PYRSanicAppBuilder._get_query_string_arg(request.args, "format") or "pstats"
+
+            try:
+                seconds = float(seconds)
+            except (TypeError, ValueError):
+                seconds = None
+
+            if seconds is None or not 0 < seconds <= profiling_max_seconds:
+                raise PYRInputNotValidError([f"seconds must be a number up to {profiling_max_seconds}"])
+
+            if format not in PROFILE_FORMATS:
+                raise PYRInputNotValidError([f"format must be one of {', '.join(PROFILE_FORMATS)}"])
+
+            return response.text(await profiler.profile(seconds, format))
+
+    @staticmethod
+    async def _handle_list(service, slug, request, stream_min_bytes=None):
+        ids = PYRSanicAppBuilder._get_query_string_arg(request.args, "ids")
+
+        if ids is not None:
+            if type(ids) is list:
+                ids = ",".join(ids)
+
+            result = await service.get_many(slug, ids.split(","))
+            return PYRSanicAppBuilder._json_response(result)
+
+        page = PYRSanicAppBuilder._get_query_string_arg(request.args, "page")
+        size = PYRSanicAppBuilder._get_query_string_arg(request.args, "size")
+        count = PYRSanicAppBuilder._get_query_string_arg(request.args, "count")
+        result = await service.list(slug, page, size, count=count, filters=request.args.getlist("filter"))
+
+        if stream_min_bytes is not None and exceeds_size(result, stream_min_bytes):
+            return await PYRSanicAppBuilder._stream_list(request, result)
+
+        return PYRSanicAppBuilder._json_response(result)
+
+    @staticmethod
+    async def _handle_search(service, slug, request):
+        query = PYRSanicAppBuilder._get_query_string_arg(request.args, "q")
+        page = PYRSanicAppBuilder._get_query_string_arg(request.args, "page")
+        size = PYRSanicAppBuilder._get_query_string_arg(request.args, "size")
+
+        if type(query) is list:
+            query = " ".join(query)
+
+        result = await service.search(slug, query, page, size)
+
+        return PYRSanicAppBuilder._json_response(result)
+
+    @staticmethod
+    async def _handle_aggregate(service, slug, request):
+        group_by = PYRSanicAppBuilder._get_query_string_arg(request.args, "group_by")
+        metric = PYRSanicAppBuilder._get_query_string_arg(request.args, "metric")
+
+        result = await service.aggregate(slug, group_by, metric)
+
+        return PYRSanicAppBuilder._json_response(result)
+
+    @staticmethod
+    def _json_response(body, **kwargs):
+        with span("serialization"):
+            return response.json(body, **kwargs)
+
+    @staticmethod
+    async def _stream_list(request, result):
+        """
+        Streams the list <result> serialized in chunks, yielding to the event loop between them,
+        so large pages do not block other requests while serialized.
+        """
+        stream = await request.respond(content_type="application/json")
+
+        await stream.send('{"result":[')
+
+        chunk = []
+        chunk_bytes = 0
+        separator = ""
+
+        for doc in result["result"]:
+            encoded = json.dumps(doc, separators=(",", ":"))
+            chunk.append(encoded)
+            chunk_bytes += len(encoded)
+
+            if chunk_bytes >= STREAM_CHUNK_BYTES:
+                await stream.send(separator + ",".join(chunk))
+                await asyncio.sleep(0)
+
+                chunk = []
+                chunk_bytes = 0
+                separator = ","
+
+        if chunk:
+            await stream.send(separator + ",".join(chunk))
+
+        page = {key: value for key, value in result.items() if key != "result"}
+        await stream.send("]" + "".join(f",{json.dumps(key)}:{json.dumps(value)}" for key, value in page.items()) + "}")
+
+        await stream.eof()
+
+    @staticmethod
+    async def _handle_create(service, slug, request, id):
+        idempotency_key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+
+        if idempotency_key is None:
+            resource_id = await service.create(slug, request.json, id)
+        else:
+            resource_id = await service.create(slug, request.json, id, idempotency_key=idempotency_key)
+
+        return response.json({"id": resource_id}, status=201)
+
+    @staticmethod
+    async def _handle_get(service, slug, request, id):
+        result = await service.get(slug, id)
+        return PYRSanicAppBuilder._json_response(result, headers={"ETag": f'"{result.get(VERSION_PROPERTY, 0)}"'})
+
+    @staticmethod
+    async def _handle_replace(service, slug, request, id):
+        version = await service.replace(slug, request.json, id, **PYRSanicAppBuilder._get_expected_versions(request))
+        return response.json({}, headers={"ETag": f'"{version}"'})
+
+    @staticmethod
+    async def _handle_partial_update(service, slug, request, id):
+        version = await service.partial_update(
+            slug, request.json, id, **PYRSanicAppBuilder._get_expected_versions(request)
+        )
+        return response.json({}, headers={"ETag": f'"{version}"'})
+
+    @staticmethod
+    async def _handle_delete(service, slug, request, id):
+        await service.delete(slug, id, **PYRSanicAppBuilder._get_expected_versions(request))
+        return response.json({})
+
+    @staticmethod
+    def _get_expected_versions(request):
+        """
+        Returns the keyword arguments with the versions of the If-Match header, if it is present and not "*".
+        Weak ETags and ETags which are not versions never match.
+        """
+        if_match = request.headers.get("if-match")
+
+        if if_match is None or if_match.strip() == "*":
+            return {}
+
+        expected_versions = set()
+
+        for tag in if_match.split(","):
+            tag = tag.strip()
+
+            if not (len(tag) > 2 and tag[0] == tag[-1] == '"'):
+                continue
+
+            try:
+                expected_versions.add(int(tag[1:-1]))
+            except ValueError:
+                pass
+
+        return {"expected_versions": expected_versions}
+
+    @staticmethod
+    async def _handle_changes(service, slug, request, heartbeat_seconds):
+        """
+        Streams the changes of <slug> as Server-Sent Events, sending a comment
+        every <heartbeat_seconds> without changes to keep the connection alive.
+        """
+        since = request.headers.get("last-event-id") or PYRSanicAppBuilder._get_query_string_arg(request.args, "since")
+
+        try:
+            since = int(since) if since is not None else None
+        except (TypeError, ValueError):
+            raise PYRInputNotValidError(["since must be a sequence number"])
+
+        subscription = service.subscribe_changes(slug, since)
+
+        try:
+            stream = await request.respond(
+                content_type="text/event-stream",
+                headers={"Cache-Control": "no-cache"},
+            )
+
+            changes = subscription.__aiter__()
+
+            while True:
+                try:
+                    change = await asyncio.wait_for(changes.__anext__(), heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    await stream.send(": heartbeat\n\n")
+                    continue
+                except StopAsyncIteration:
+                    break
+
+                await stream.send(
+                    f"id: {change['sequence']}\n"
+                    f"event: {change['operation']}\n"
+                    f"data: {json.dumps(change, separators=(',', ':'))}\n\n"
+                )
+
+            await stream.eof()
+        finally:
+            subscription.close()
+
+    @staticmethod
+    def _document(handler, tag):
+        """
+        Returns a decorator documenting the route of <handler> in OpenAPI, tagged with <tag>.
+        """
+        decorators = [openapi.tag(tag)] + OPENAPI_DOCUMENTATION[handler]()
+
+        def decorator(route_handler):
+            for openapi_decorator in reversed(decorators):
+                route_handler = openapi_decorator(route_handler)
+
+            return route_handler
+
+        return decorator
+
+    @staticmethod
+    def _prerender_openapi_document(app, documents_cache_seconds_ttl, slug_table=None):
+        """
+        Replaces the sanic-ext OpenAPI route handler, which rebuilds the
+        specification on every request, by one serving it pre-rendered.
+        With generic routes, the specification is expanded by slug lazily, on the first request.
+        It does nothing if the OpenAPI extension is not enabled.
+        """
+        route = next((route for route in app.router.routes if route.name.endswith(".openapi.spec")), None)
+
+        if route is None:
+            return
+
+        from sanic_ext.extensions.openapi.builders import SpecificationBuilder
+
+        def render():
+            specification = SpecificationBuilder().build(app).serialize()
+
+            if slug_table is not None:
+                PYRSanicAppBuilder._expand_generic_paths(specification, slug_table)
+
+            return PrerenderedDocument(specification, documents_cache_seconds_ttl)
+
+        documents = [] if slug_table is not None else [render()]
+
+        async def _get_openapi_document(request):
+            if not documents:
+                documents.append(render())
+
+            return documents[0].response(request)
+
+        route.handler = _get_openapi_document
+        app.router.get.cache_clear()
+
+    @staticmethod
+    def _expand_generic_paths(specification, slug_table):
+        """
+        Replaces the generic paths of <specification> by the paths of each slug,
+        with the handlers enabled for it.
+        """
+        paths = specification["paths"]
+        generic_paths = {path: paths.pop(path) for path in list(paths) if path.startswith("/{slug}")}
+
+        for slug, slug_routes in slug_table.items():
+            for path, operations in generic_paths.items():
+                slug_path = path.replace("{slug}", slug, 1)
+
+                for method, operation in operations.items():
+                    handler = GENERIC_ROUTES_HANDLERS.get((path, method))
+
+                    if handler not in slug_routes.enabled_handlers:
+                        continue
+
+                    slug_operation = json.loads(json.dumps(operation))
+                    slug_operation["tags"] = [slug_routes.name]
+                    slug_operation["operationId"] = f"{method}~{slug_path}"
+                    slug_operation["parameters"] = [
+                        parameter for parameter in slug_operation.get("parameters", [])
+                        if parameter.get("name") != "slug"
+                    ]
+
+                    paths.setdefault(slug_path, {})[method] = slug_operation
+
+    @staticmethod
+    def _get_query_string_arg(query_string, arg_name):
+        arg = query_string.get(arg_name, [])
+
+        if type(arg) is not list:
+            return arg
+
+        if len(arg) == 1:
+            return arg[0]
+
+        if len(arg) > 1:
+            return arg
+
+
+class PrerenderedDocument():
+    """
+    Static JSON document rendered to bytes once, served with an ETag
+    and long-lived cache headers.
+    """
+
+    def __init__(self, document, cache_seconds_ttl):
+        self.body = json.dumps(document, separators=(",", ":")).encode("utf-8")
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()}"'
+        self.headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={cache_seconds_ttl}",
+        }
+
+    def response(self, request):
+        if_none_match = request.headers.get("if-none-match")
+
+        if if_none_match and self.etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return response.empty(status=304, headers=self.headers)
+
+        return response.raw(self.body, headers=self.headers, content_type="application/json")
+
+
+class GenericSlugRoutes():
+    """
+    Entry of the slug table used by the generic routes.
+    """
+
+    def __init__(self, schema, documents_cache_seconds_ttl):
+        self.name = schema["name"]
+        self.enabled_handlers = frozenset(schema.get("enabled_handlers", DEFAULT_ENABLED_HANDLERS)) | {"schema"}
+        self.schema_document = PrerenderedDocument(schema, documents_cache_seconds_ttl)
+
+
+class CustomErrorHandler(ErrorHandler):
+
+    def default(self, request, exception):
+
+        if isinstance(exception, PYRInputNotValidError):
+            return response.json({"message": exception.message}, status=400)
+
+        if isinstance(exception, PYRNotFoundError):
+            return response.json({"message": exception.message}, status=404)
+
+        if isinstance(exception, PYRPreconditionFailedError):
+            return response.json({"message": exception.message}, status=412)
+
+        if isinstance(exception, PYRCapacityExceededError):
+            return response.json({"message": exception.message}, status=507)
+
+        if isinstance(exception, PYRDeadlineExceededError):
+            return response.json({"message": exception.message}, status=504)
+
+        if isinstance(exception, PYRServiceUnavailableError):
+            return response.json(
+                {"message": exception.message},
+                status=503,
+                headers={"Retry-After": str(exception.retry_after_seconds)},
+            )
+
+        if not isinstance(exception, SanicException):
+            return response.json({"message": "Internal Server Error"}, status=500)
+
+        return super().default(request, exception)
@@ -1,12 +1,97 @@
+import asyncio
+import copy
+import functools
+import hashlib
+import inspect
+import itertools
 import json
 import logging
-
-from py_easy_rest.exceptions import PYRInputNotValidError, PYRNotFoundError
+import time
+
+from py_easy_rest.admission import PYRAdmissionControl
+from py_easy_rest.deadlines import clear_deadline, deadline, is_exhausted, within_deadline
+from py_easy_rest.exceptions import (
+    PYRDeadlineExceededError,
+    PYRInputNotValidError,
+    PYRNotFoundError,
+    PYRPreconditionFailedError,
+)
+from py_easy_rest.cache_policies import PYRCachePolicy, build_cache_policies
 from py_easy_rest.caches import PYRDummyCache
-from py_easy_rest.repos import PYRMemoryRepo
-from py_easy_rest.dictionary_utils import merge
+from py_easy_rest.repos import FILTERABLE_TYPES, FILTER_OPERATORS, VERSION_PROPERTY, PYRMemoryRepo
+from py_easy_rest.tracing import clear_trace, span
+from py_easy_rest.dictionary_utils import exceeds_size, get_by_slug_and_operation, merge
+
+
+LIST_COUNT_MODES = ("exact", "estimate", "none")
+
+AGGREGATE_FUNCTIONS = ("count", "sum", "min", "max")
+
+# the page size of the repos when the list size is not given
+DEFAULT_PAGE_SIZE = 30
+
+# writes retried when the document is changed between its read and its compare and swap
+WRITE_MAX_ATTEMPTS = 10
+
+_worker_validators = {}
+
+
+def _build_validators(schemas):
+    from jsonschema import Draft7Validator
+
+    return {schema["slug"]: Draft7Validator(schema) for schema in schemas}
+
+
+def _collect_errors(validator, data):
+    errors = [error.message for error in validator.iter_errors(data)]
+
+    if len(errors) > 0:
+        return errors
+
+    return None
+
+
+def _init_validation_worker(schemas):
+    global _worker_validators
+    _worker_validators = _build_validators(schemas)
+
+
+def _validate_in_worker(slug, data):
+    return _collect_errors(_worker_validators[slug], data)
+
+
+def _accepts_keyword(function, name):
+    """
+    Returns whether <function> accepts the keyword argument <name>,
+    as repos written before it was added to the <Repo> interface do not.
+    """
+    try:
+        parameters = inspect.signature(function).parameters.values()
+    except (TypeError, ValueError):
+        return True
+
+    return any(parameter.name == name or parameter.kind is inspect.Parameter.VAR_KEYWORD for parameter in parameters)
+
 
-from jsonschema import Draft7Validator
+def _is_cache_envelope(entry):
+    return isinstance(entry, dict) and entry.keys() == {"result", "expires_at"}
+
+
+def _operation(operation):
+    """
+    Decorates a service method to run it within the operation deadline,
+    holding an admission slot for its slug.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, slug, *args, **kwargs):
+            with deadline(get_by_slug_and_operation(self._deadlines_seconds, slug, operation)):
+                async with self._admission_control.admit(slug, operation):
+                    return await method(self, slug, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
 
 
 class PYRService():
@@ -18,133 +103,808 @@ class PYRService():
         cache=PYRDummyCache(),
         cache_list_seconds_ttl=10,
         cache_get_seconds_ttl=60 * 30,  # thirty minutes
+        cache_write_through=False,
+        cache_count_seconds_ttl=None,
+        cache_aggregate_seconds_ttl=10,
+        validation_process_pool_min_bytes=None,
+        validation_process_pool_workers=None,
+        admission_control=None,
+        deadlines_seconds=None,
+        stale_while_revalidate_seconds=None,
+        stale_if_error_seconds=None,
+        get_many_max_ids=100,
+        change_feed=None,
+        idempotency_seconds_ttl=60 * 60 * 24,  # one day
+        max_page_size=None,
+        hot_ids=None,
     ):
         self._repo = repo
+        self._repo_list_accepts_count = _accepts_keyword(repo.list, "count")
+        self._repo_list_accepts_filters = _accepts_keyword(repo.list, "filters")
         self._api_config = api_config
         self._cache = cache
-        self._cache_list_seconds_ttl = cache_list_seconds_ttl
-        self._cache_get_seconds_ttl = cache_get_seconds_ttl
+        self._default_cache_policy = PYRCachePolicy(
+            get_seconds_ttl=cache_get_seconds_ttl,
+            list_seconds_ttl=cache_list_seconds_ttl,
+            write_through=cache_write_through,
+            count_seconds_ttl=cache_count_seconds_ttl,
+            aggregate_seconds_ttl=cache_aggregate_seconds_ttl,
+        )
+        self._validation_process_pool_min_bytes = validation_process_pool_min_bytes
+        self._validation_process_pool_workers = validation_process_pool_workers
+        self._validation_process_pool = None
+        self._admission_control = admission_control or PYRAdmissionControl()
+        self._deadlines_seconds = deadlines_seconds or {}
+        self._stale_while_revalidate_seconds = stale_while_revalidate_seconds
+        self._stale_if_error_seconds = stale_if_error_seconds
+        self._max_stale_seconds = max(stale_while_revalidate_seconds or 0, stale_if_error_seconds or 0)
+        self._revalidations = {}
+        self._get_many_max_ids = get_many_max_ids
+        self._write_sequence = itertools.count()
+        self._latest_writes = {}
+        self._change_feed = change_feed
+        self._idempotency_seconds_ttl = idempotency_seconds_ttl
+        self._idempotent_creates = {}
+        self._warned_idempotency_without_cache = False
+        self._hot_ids = hot_ids
         self._logger = logging.getLogger(__name__)
 
         self._schemas = self._api_config["schemas"]
+        self._validators = None
+        self._cache_policies = build_cache_policies(self._schemas, self._default_cache_policy)
+        self._max_page_sizes = {schema["slug"]: schema.get("max_page_size", max_page_size) for schema in self._schemas}
+        self._filterable_properties = {
+            schema["slug"]: {
+                name: property["type"] for name, property in schema.get("properties", {}).items()
+                if property.get("type") in FILTERABLE_TYPES
+            }
+            for schema in self._schemas
+        }
+
+    @_operation("list")
+    async def list(self, slug, page, size, count=None, filters=None):
+        """
+        Lists a page of the documents.
+        With <filters>, a list like ["price:gte:10", "active:eq:true"], only the documents matching all of them.
+        """
+        page, size = self._parse_page(slug, page, size)
+
+        count = count or "exact"
+
+        if count not in LIST_COUNT_MODES:
+            raise PYRInputNotValidError([f"count must be one of {', '.join(LIST_COUNT_MODES)}"])
+
+        if isinstance(filters, str):
+            filters = [filters]
+
+        cache_key = f"{slug}.list.page-{page}.size-{size}"
+
+        if count != "exact":
+            cache_key = f"{cache_key}.count-{count}"
+
+        if filters:
+            cache_key = f"{cache_key}.filter-{','.join(filters)}"
+            filters = self._parse_filters(slug, filters)
+
+        policy = self._cache_policies.get(slug, self._default_cache_policy)
+
+        if policy.enabled and policy.normalized_lists:
+            return await self._list_normalized(slug, page, size, count, cache_key, filters)
+
+        return await self._get_through_cache(
+            slug,
+            "list",
+            cache_key,
+            lambda: self._list_with_count(slug, page, size, count, filters),
+        )
+
+    @_operation("search")
+    async def search(self, slug, query, page=None, size=None):
+        """
+        Returns the documents matching the text <query> ranked by relevance, paged like list.
+        Raises <PYRNotFoundError> when the repo can not search the slug.
+        """
+        page, size = self._parse_page(slug, page, size)
+
+        if not query or not query.strip():
+            raise PYRInputNotValidError(["q must not be empty"])
+
+        try:
+            return await self._call_repo(self._repo.search(slug, query, page, size))
+        except NotImplementedError:
+            raise PYRNotFoundError(f"Search of {slug} not supported")
+
+    @_operation("aggregate")
+    async def aggregate(self, slug, group_by, metric):
+        """
+        Returns the <metric> of each group of documents with the same <group_by> property value.
+        The <metric> is "count", or "sum", "min" or "max" of a property, like "sum:price".
+        Raises <PYRNotFoundError> when the repo can not aggregate it.
+        """
+        if not group_by or not isinstance(group_by, str):
+            raise PYRInputNotValidError(["group_by must be a property"])
+
+        metric = metric or "count"
+        function, _, name = metric.partition(":") if isinstance(metric, str) else (None, None, None)
+
+        if function not in AGGREGATE_FUNCTIONS or (function == "count") == bool(name):
+            raise PYRInputNotValidError(["metric must be count, or sum, min or max of a property, like sum:price"])
+
+        cache_key = f"{slug}.aggregate.group_by-{group_by}.metric-{metric}"
+
+        try:
+            return await self._get_through_cache(
+                slug,
+                "aggregate",
+                cache_key,
+                lambda: self._call_repo(self._repo.aggregate(slug, group_by, metric)),
+            )
+        except NotImplementedError:
+            raise PYRNotFoundError(f"Aggregate {metric} of {slug} by {group_by} not supported")
+
+    @_operation("get")
+    async def get(self, slug, id, record_hot_id=True):
+        """
+        Returns the document, recording its id as read unless <record_hot_id> is False, like when warming up.
+        """
+        if self._hot_ids is not None and record_hot_id:
+            self._hot_ids.record(slug, id)
+
+        cache_key = f"{slug}.get.id-{id}"
+
+        result = await self._get_through_cache(
+            slug,
+            "get",
+            cache_key,
+            lambda: self._call_repo(self._repo.get(slug, id)),
+        )
+
+        if result:
+            return result
+
+        raise PYRNotFoundError(f"{slug} {id} not found")
+
+    @_operation("get_many")
+    async def get_many(self, slug, ids):
+        """
+        Returns the documents of <ids> in the requested order, and the ids not found.
+        Documents are fetched with one multi-key cache lookup, and only the misses from the repo.
+        """
+        if len(ids) > self._get_many_max_ids:
+            raise PYRInputNotValidError([f"It is not possible to get more than {self._get_many_max_ids} ids"])
+
+        ids = list(dict.fromkeys(ids))
+        docs = await self._get_many_docs(slug, ids)
+
+        return {
+            "result": [docs[id] for id in ids if docs.get(id)],
+            "missing": [id for id in ids if not docs.get(id)],
+        }
+
+    @_operation("create")
+    async def create(self, slug, data, id=None, idempotency_key=None):
+        """
+        Creates the document, returning its id.
+        With <idempotency_key>, repeated creates with the same key return the id of the first one,
+        and concurrent repeats wait for it, instead of creating the document again.
+        """
+        if idempotency_key is not None:
+            return await self._create_once(slug, data, id, idempotency_key)
+
+        return await self._create(slug, data, id)
+
+    async def _create(self, slug, data, id):
+        data.pop(VERSION_PROPERTY, None)
+        errors = await self._validate(data, slug)
+
+        if errors:
+            raise PYRInputNotValidError(errors)
+
+        data[VERSION_PROPERTY] = 1
+        sequence = self._start_write(slug, id)
+
+        resource_id = await self._call_repo(self._repo.create(slug, data, id))
+
+        await self._update_cache_after_write(slug, resource_id, data, sequence)
+        await self._delete_cached_count(slug)
+        self._publish_change(slug, "create", resource_id, data)
+
+        return resource_id
+
+    @_operation("replace")
+    async def replace(self, slug, data, id, expected_versions=None):
+        """
+        Replaces the document, returning its new version.
+        With <expected_versions>, raises <PYRPreconditionFailedError> when the document version is not one of them.
+        """
+        data.pop(VERSION_PROPERTY, None)
+        validated = False
+
+        for _ in range(WRITE_MAX_ATTEMPTS):
+            version = await self._get_version_for_write(slug, id, expected_versions)
+
+            if not validated:
+                errors = await self._validate(data, slug)
+
+                if errors:
+                    raise PYRInputNotValidError(errors)
+
+                validated = True
+
+            data[VERSION_PROPERTY] = version + 1
+            sequence = self._start_write(slug, id)
+
+            if await self._compare_and_swap(slug, id, version, data, expected_versions):
+                break
+        else:
+            self._raise_write_conflict(slug, id)
+
+        await self._update_cache_after_write(slug, id, data, sequence)
+        self._publish_change(slug, "replace", id, data)
+
+        return data[VERSION_PROPERTY]
+
+    @_operation("partial_update")
+    async def partial_update(self, slug, data, id, expected_versions=None):
+        """
+        Merges <data> into the document, returning its new version.
+        With <expected_versions>, raises <PYRPreconditionFailedError> when the document version is not one of them.
+        """
+        for _ in range(WRITE_MAX_ATTEMPTS):
+            existent_doc = await self._call_repo(self._repo.get(slug, id))
+
+            if not existent_doc:
+                raise PYRNotFoundError(f"{slug} {id} not found")
+
+            version = self._check_version(slug, id, existent_doc, expected_versions)
+
+            # the repo may return its stored document, which must not change before the compare and swap
+            doc = merge(data, copy.deepcopy(existent_doc))
+            doc.pop("_id", None)
+            doc.pop(VERSION_PROPERTY, None)
+
+            errors = await self._validate(doc, slug)
+
+            if errors:
+                raise PYRInputNotValidError(errors)
+
+            doc[VERSION_PROPERTY] = version + 1
+            sequence = self._start_write(slug, id)
+
+            if await self._compare_and_swap(slug, id, version, doc, expected_versions):
+                break
+        else:
+            self._raise_write_conflict(slug, id)
+
+        await self._update_cache_after_write(slug, id, doc, sequence)
+        self._publish_change(slug, "partial_update", id, doc)
+
+        return doc[VERSION_PROPERTY]
+
+    @_operation("delete")
+    async def delete(self, slug, id, expected_versions=None):
+        """
+        Deletes the document.
+        With <expected_versions>, raises <PYRPreconditionFailedError> when the document version is not one of them.
+        """
+        for _ in range(WRITE_MAX_ATTEMPTS):
+            version = await self._get_version_for_write(slug, id, expected_versions)
+            sequence = self._start_write(slug, id)
+
+            if await self._compare_and_swap(slug, id, version, None, expected_versions):
+                break
+        else:
+            self._raise_write_conflict(slug, id)
+
+        await self._update_cache_after_write(slug, id, None, sequence)
+        await self._delete_cached_count(slug)
+        self._publish_change(slug, "delete", id)
+
+    def is_cached(self, slug):
+        """
+        Returns whether the results of <slug> are cached, according to its cache policy.
+        """
+        return self._cache_policies.get(slug, self._default_cache_policy).enabled
+
+    def subscribe_changes(self, slug, since=None):
+        """
+        Returns an async iterator over the changes of <slug> after the sequence <since>.
+        Raises <PYRNotFoundError> when the service has no change feed.
+        """
+        if self._change_feed is None:
+            raise PYRNotFoundError(f"Changes of {slug} not enabled")
+
+        return self._change_feed.subscribe(slug, since)
+
+    async def _get_version_for_write(self, slug, id, expected_versions):
+        existent_doc = await self._call_repo(self._repo.get(slug, id))
+
+        if not existent_doc:
+            raise PYRNotFoundError(f"{slug} {id} not found")
+
+        return self._check_version(slug, id, existent_doc, expected_versions)
+
+    def _check_version(self, slug, id, existent_doc, expected_versions):
+        version = existent_doc.get(VERSION_PROPERTY, 0)
+
+        if expected_versions is not None and version not in expected_versions:
+            raise PYRPreconditionFailedError(f"{slug} {id} version {version} does not match")
+
+        return version
+
+    @staticmethod
+    def _raise_write_conflict(slug, id):
+        raise PYRPreconditionFailedError(f"{slug} {id} was changed by concurrent writes {WRITE_MAX_ATTEMPTS} times")
+
+    async def _compare_and_swap(self, slug, id, version, data, expected_versions):
+        """
+        Writes <data>, or deletes the document when it is None, if its version is still <version>.
+        Returns False when it was changed meanwhile, to read it again, unless the write expected versions.
+        Repos without compare and swap are written without checking the version.
+        """
+        try:
+            swapped = await self._call_repo(self._repo.compare_and_swap(slug, id, version, data))
+        except NotImplementedError:
+            if data is None:
+                await self._call_repo(self._repo.delete(slug, id))
+            else:
+                await self._call_repo(self._repo.replace(slug, id, data))
+
+            return True
+
+        if not swapped and expected_versions is not None:
+            raise PYRPreconditionFailedError(f"{slug} {id} was changed by a concurrent write")
+
+        return swapped
+
+    def _publish_change(self, slug, operation, id, data=None):
+        if self._change_feed is not None:
+            self._change_feed.publish(slug, operation, id, data)
+
+    async def _create_once(self, slug, data, id, idempotency_key):
+        cache_key = f"{slug}.create.idempotency-{idempotency_key}"
+        fingerprint = hashlib.sha1(json.dumps([data, id], sort_keys=True).encode("utf-8")).hexdigest()
+
+        if isinstance(self._cache, PYRDummyCache) and not self._warned_idempotency_without_cache:
+            self._warned_idempotency_without_cache = True
+            self._logger.warning(
+                "Idempotency keys are only remembered while their create is in progress without a cache"
+            )
 
-    async def list(self, slug, page, size):
+        created = None
+
+        if cache_key not in self._idempotent_creates:
+            cached = await self._call_cache(self._cache.get(cache_key))
+
+            if cached is not None:
+                self._logger.info(f"Found cache result with key {cache_key}")
+                created = json.loads(cached)
+
+        if created is None:
+            in_flight = self._idempotent_creates.get(cache_key)
+
+            if in_flight is None:
+                in_flight = asyncio.ensure_future(self._create_and_remember(slug, data, id, cache_key, fingerprint))
+                self._idempotent_creates[cache_key] = in_flight
+                in_flight.add_done_callback(lambda _: self._idempotent_creates.pop(cache_key, None))
+
+            # the create goes on when the request is cancelled, so repeats get its result
+            created = await within_deadline(asyncio.shield(in_flight))
+
+        if created["fingerprint"] != fingerprint:
+            raise PYRInputNotValidError([f"Idempotency key {idempotency_key} was used by a different request"])
+
+        return created["id"]
+
+    async def _create_and_remember(self, slug, data, id, cache_key, fingerprint):
+        # the task copied the deadline of the request which started it, and outlives its cancellation
+        clear_deadline()
+
+        with deadline(get_by_slug_and_operation(self._deadlines_seconds, slug, "create")):
+            created = {"id": await within_deadline(self._create(slug, data, id)), "fingerprint": fingerprint}
+
+        await self._set_cache(cache_key, json.dumps(created), self._idempotency_seconds_ttl)
+
+        return created
+
+    def _parse_page(self, slug, page, size):
         if page is not None:
             page = int(page)
 
+        max_page_size = self._max_page_sizes.get(slug)
+
         if size is not None:
             size = int(size)
 
-        cache_key = f"{slug}.list.page-{page}.size-{size}"
+            if max_page_size is not None and size > max_page_size:
+                raise PYRInputNotValidError([f"size must be at most {max_page_size}"])
+        elif max_page_size is not None:
+            size = min(DEFAULT_PAGE_SIZE, max_page_size)
 
-        cached = await self._cache.get(cache_key)
+        return page, size
+
+    def _parse_filters(self, slug, filters):
+        """
+        Parses <filters> like "price:gte:10" into (property, operator, value),
+        with the value converted to the type of the schema property.
+        """
+        properties = self._filterable_properties.get(slug, {})
+        parsed = []
+
+        for expression in filters:
+            name, filter_operator, value = (expression.split(":", 2) + [None, None])[:3]
+            property_type = properties.get(name)
+
+            if property_type is None or filter_operator not in FILTER_OPERATORS:
+                raise PYRInputNotValidError([
+                    f"filter {expression} must be like price:gte:10, with a number or boolean property "
+                    f"and one of {', '.join(FILTER_OPERATORS)}"
+                ])
+
+            try:
+                value = {"true": True, "false": False}[value] if property_type == "boolean" else float(value)
+            except (KeyError, TypeError, ValueError):
+                raise PYRInputNotValidError([f"filter {expression} value must be a {property_type}"])
+
+            parsed.append((name, filter_operator, value))
+
+        return parsed
+
+    async def _list_normalized(self, slug, page, size, count, cache_key, filters=None):
+        """
+        Lists caching the page with the ids of its documents instead of the documents,
+        which are cached by the get cache and assembled with a multi-key lookup,
+        so updates of the documents are reflected by the cached pages.
+        """
+        policy = self._cache_policies.get(slug, self._default_cache_policy)
+        listed_docs = {}
+
+        async def list_ids():
+            result = await self._list_with_count(slug, page, size, count, filters)
+            listed_docs.update((doc["id"], doc) for doc in result["result"])
+
+            await self._set_many_cache_entries(slug, listed_docs, policy)
+
+            return {**result, "result": list(listed_docs)}
+
+        page_entry = await self._get_through_cache(slug, "list", cache_key, list_ids)
+        ids = page_entry["result"]
+
+        docs = await self._get_many_docs(slug, [id for id in ids if id not in listed_docs])
+        docs.update(listed_docs)
+
+        return {**page_entry, "result": [docs[id] for id in ids if docs.get(id)]}
+
+    async def _get_many_docs(self, slug, ids):
+        """
+        Returns the documents of <ids> found by id, fetching the cache misses from the repo.
+        """
+        policy = self._cache_policies.get(slug, self._default_cache_policy)
+
+        docs = {}
+        misses = ids
+
+        if not ids:
+            return docs
+
+        if policy.enabled:
+            docs, misses = await self._get_many_from_cache(slug, ids)
+
+        if misses:
+            found = await self._call_repo(self._repo.get_many(slug, misses))
+            docs.update(found)
+
+            if policy.enabled:
+                await self._set_many_cache_entries(slug, {id: found.get(id) for id in misses}, policy)
+
+        return docs
+
+    async def _get_many_from_cache(self, slug, ids):
+        """
+        Returns the fresh cached documents by id, and the ids missed.
+        """
+        cached_values = await self._call_cache(self._cache.get_many([f"{slug}.get.id-{id}" for id in ids]))
+
+        docs = {}
+        misses = []
+
+        for id, cached in zip(ids, cached_values):
+            if cached is not None:
+                doc, stale_seconds = self._load_cache_entry(cached)
+
+                if stale_seconds is None:
+                    docs[id] = doc
+                    continue
+
+            misses.append(id)
+
+        self._logger.info(f"Found {len(docs)} of {len(ids)} cache results of {slug}")
+
+        return docs, misses
+
+    async def _set_many_cache_entries(self, slug, docs, policy):
+        values_by_ttl = {}
+
+        for id, doc in docs.items():
+            ttl = policy.seconds_ttl("get", doc)
+
+            if ttl is not None:
+                values_by_ttl.setdefault(ttl, {})[f"{slug}.get.id-{id}"] = self._dump_cache_entry(doc, ttl)
+
+        for ttl, values in values_by_ttl.items():
+            if is_exhausted():
+                self._logger.info(f"Skipping cache set of {len(values)} keys, deadline exhausted")
+                return
+
+            try:
+                await self._call_cache(self._cache.set_many(values, ttl=ttl + self._max_stale_seconds))
+            except PYRDeadlineExceededError:
+                self._logger.info(f"Skipping cache set of {len(values)} keys, deadline exceeded")
+
+    async def _list_with_count(self, slug, page, size, count, filters=None):
+        """
+        Lists a page with the total count required by <count>.
+        Unless it is exact and not cached, the page is listed without count,
+        and the count is taken from the count cache or <Repo.count>.
+        Filtered pages are always counted by the repo with the list.
+        """
+        policy = self._cache_policies.get(slug, self._default_cache_policy)
+
+        if filters:
+            try:
+                if not self._repo_list_accepts_filters:
+                    raise NotImplementedError
+
+                result = await self._call_repo(self._repo.list(slug, page, size, filters=filters))
+            except NotImplementedError:
+                raise PYRInputNotValidError([f"Filters of {slug} not supported"])
+
+            if count == "none":
+                result.pop("totalCount", None)
 
-        if cached is not None:
-            self._logger.info(f"Found cache result with key {cache_key}")
-            result = json.loads(cached)
             return result
 
-        self._logger.info(f"Not found cache result with key {cache_key}")
+        if count == "exact" and (not policy.enabled or policy.count_seconds_ttl is None):
+            return await self._call_repo(self._repo.list(slug, page, size))
 
-        result = await self._repo.list(slug, page, size)
+        result = await self._list_without_count(slug, page, size)
 
-        await self._cache.set(cache_key, json.dumps(result), ttl=self._cache_list_seconds_ttl)
+        if count == "none":
+            result.pop("totalCount", None)
+        else:
+            result["totalCount"] = await self._count(slug, count == "estimate", policy)
 
         return result
 
-    async def get(self, slug, id):
-        cache_key = f"{slug}.get.id-{id}"
+    async def _list_without_count(self, slug, page, size):
+        if not self._repo_list_accepts_count:
+            # the count is dropped by the caller
+            return await self._call_repo(self._repo.list(slug, page, size))
 
-        cached = await self._cache.get(cache_key)
+        return await self._call_repo(self._repo.list(slug, page, size, count=False))
 
-        if cached is not None:
-            self._logger.info(f"Found cache result with key {cache_key}")
-            result = json.loads(cached)
-            return result
+    async def _count(self, slug, estimate, policy):
+        if not policy.enabled or policy.count_seconds_ttl is None:
+            return await self._count_from_repo(slug, estimate)
 
-        self._logger.info(f"Not found cache result with key {cache_key}")
+        cache_key = f"{slug}.count.estimate" if estimate else f"{slug}.count"
 
-        result = await self._repo.get(slug, id)
+        return await self._get_through_cache(
+            slug,
+            "count",
+            cache_key,
+            lambda: self._count_from_repo(slug, estimate),
+        )
 
-        if result:
-            await self._cache.set(cache_key, json.dumps(result), ttl=self._cache_get_seconds_ttl)
-            return result
+    async def _count_from_repo(self, slug, estimate):
+        try:
+            return await self._call_repo(self._repo.count(slug, estimate=estimate))
+        except NotImplementedError:
+            # repos without count still return it with the list
+            result = await self._call_repo(self._repo.list(slug, 0, 1))
+            return result["totalCount"]
 
-        raise PYRNotFoundError(f"{slug} {id} not found")
+    async def _delete_cached_count(self, slug):
+        policy = self._cache_policies.get(slug, self._default_cache_policy)
 
-    async def create(self, slug, data, id=None):
-        errors = self._validate(data, slug)
+        if policy.enabled and policy.count_seconds_ttl is not None:
+            await self._invalidate_cache(self._cache.delete(f"{slug}.count"))
+            await self._invalidate_cache(self._cache.delete(f"{slug}.count.estimate"))
 
-        if errors:
-            raise PYRInputNotValidError(errors)
+    async def _get_through_cache(self, slug, operation, cache_key, fetch):
+        """
+        Returns the cached result of <cache_key>, or fetches it with <fetch> caching it
+        according to the slug cache policy.
+        Expired results are served while revalidated in background, or when <fetch> raises,
+        within the configured max staleness.
+        """
+        policy = self._cache_policies.get(slug, self._default_cache_policy)
 
-        resource_id = await self._repo.create(slug, data, id)
+        if not policy.enabled:
+            return await within_deadline(fetch())
 
-        cache_key = f"{slug}.get.id-{resource_id}"
-        await self._cache.delete(cache_key)
+        cached = await self._call_cache(self._cache.get(cache_key))
+        stale_seconds = None
 
-        return resource_id
+        if cached is not None:
+            self._logger.info(f"Found cache result with key {cache_key}")
+            cached_result, stale_seconds = self._load_cache_entry(cached)
 
-    async def replace(self, slug, data, id):
-        existent_doc = await self._repo.get(slug, id)
+            if stale_seconds is None:
+                return cached_result
 
-        if not existent_doc:
-            raise PYRNotFoundError(f"{slug} {id} not found")
+            if self._is_within(stale_seconds, self._stale_while_revalidate_seconds):
+                self._revalidate_in_background(slug, operation, cache_key, fetch, policy)
+                return cached_result
+        else:
+            self._logger.info(f"Not found cache result with key {cache_key}")
 
-        errors = self._validate(data, slug)
+        try:
+            result = await within_deadline(fetch())
+        except Exception:
+            if stale_seconds is not None and self._is_within(stale_seconds, self._stale_if_error_seconds):
+                self._logger.exception(f"Serving stale cache result with key {cache_key}")
+                return cached_result
 
-        if errors:
-            raise PYRInputNotValidError(errors)
+            raise
+
+        await self._set_cache_entry(cache_key, result, policy.seconds_ttl(operation, result))
 
-        await self._repo.replace(slug, id, data)
+        return result
 
+    def _revalidate_in_background(self, slug, operation, cache_key, fetch, policy):
+        if cache_key in self._revalidations:
+            return
+
+        self._revalidations[cache_key] = asyncio.ensure_future(
+            self._revalidate(slug, operation, cache_key, fetch, policy),
+        )
+
+    async def _revalidate(self, slug, operation, cache_key, fetch, policy):
+        # the task copied the deadline and trace of the request which scheduled it
+        clear_deadline()
+        clear_trace()
+
+        try:
+            with deadline(get_by_slug_and_operation(self._deadlines_seconds, slug, operation)):
+                result = await within_deadline(fetch())
+                await self._set_cache_entry(cache_key, result, policy.seconds_ttl(operation, result))
+        except Exception:
+            self._logger.exception(f"Failed to revalidate cache result with key {cache_key}")
+        finally:
+            self._revalidations.pop(cache_key, None)
+
+    async def _set_cache_entry(self, cache_key, result, ttl):
+        if ttl is None:
+            return
+
+        await self._set_cache(cache_key, self._dump_cache_entry(result, ttl), ttl + self._max_stale_seconds)
+
+    def _start_write(self, slug, id):
+        """
+        Registers a write on <id>, returning its sequence to detect if it was overtaken.
+        """
+        if id is None:
+            return None
+
+        sequence = next(self._write_sequence)
+        self._latest_writes[f"{slug}.get.id-{id}"] = sequence
+
+        return sequence
+
+    async def _update_cache_after_write(self, slug, id, doc, sequence):
+        """
+        Sets <doc> into the cache when the slug policy is write through, otherwise deletes it.
+        A write overtaken by a newer one on the same id deletes it too, so the cache never keeps
+        an older document set by this worker. Workers sharing a cache may still set an older one last.
+        """
+        policy = self._cache_policies.get(slug, self._default_cache_policy)
         cache_key = f"{slug}.get.id-{id}"
-        await self._cache.delete(cache_key)
 
-    async def partial_update(self, slug, data, id):
-        existent_doc = await self._repo.get(slug, id)
+        is_latest_write = sequence is None or self._latest_writes.get(cache_key) == sequence
 
-        if not existent_doc:
-            raise PYRNotFoundError(f"{slug} {id} not found")
+        if is_latest_write:
+            self._latest_writes.pop(cache_key, None)
 
-        doc = merge(data, existent_doc)
-        doc.pop("_id", None)
+        if not policy.enabled:
+            return
 
-        errors = self._validate(doc, slug)
+        ttl = None
 
-        if errors:
-            raise PYRInputNotValidError(errors)
+        if policy.write_through and doc is not None and is_latest_write:
+            ttl = policy.seconds_ttl("get", doc)
 
-        await self._repo.replace(slug, id, doc)
+        if ttl is not None:
+            await self._invalidate_cache(
+                self._cache.set(cache_key, self._dump_cache_entry(doc, ttl), ttl=ttl + self._max_stale_seconds),
+            )
+        else:
+            await self._invalidate_cache(self._cache.delete(cache_key))
 
-        cache_key = f"{slug}.get.id-{id}"
-        await self._cache.delete(cache_key)
+    def _load_cache_entry(self, cached):
+        """
+        Returns the cached result and for how many seconds it is expired, or None if it is fresh.
+        Workers with and without staleness share caches, e.g. during deploys, so entries with
+        an expiration are read by all of them, and plain results are always fresh.
+        """
+        entry = json.loads(cached)
 
-    async def delete(self, slug, id):
-        existent_doc = await self._repo.get(slug, id)
+        if not _is_cache_envelope(entry):
+            return entry, None
 
-        if not existent_doc:
-            raise PYRNotFoundError(f"{slug} {id} not found")
+        stale_seconds = time.time() - entry["expires_at"]
 
-        await self._repo.delete(slug, id)
+        return entry["result"], stale_seconds if stale_seconds > 0 else None
 
-        cache_key = f"{slug}.get.id-{id}"
-        await self._cache.delete(cache_key)
+    def _dump_cache_entry(self, result, ttl):
+        if not self._max_stale_seconds:
+            return json.dumps(result)
+
+        return json.dumps({"result": result, "expires_at": time.time() + ttl})
+
+    @staticmethod
+    def _is_within(stale_seconds, max_stale_seconds):
+        return max_stale_seconds is not None and stale_seconds <= max_stale_seconds
+
+    async def _set_cache(self, key, value, ttl):
+        """
+        Caches are optional writes, so they are skipped when the deadline is exhausted.
+        """
+        if is_exhausted():
+            self._logger.info(f"Skipping cache set with key {key}, deadline exhausted")
+            return
+
+        try:
+            await self._call_cache(self._cache.set(key, value, ttl=ttl))
+        except PYRDeadlineExceededError:
+            self._logger.info(f"Skipping cache set with key {key}, deadline exceeded")
 
     def set_logger(self, logger):
         self._logger = logger
 
-    def _validate(self, data, slug):
-        schema = next(schema for schema in self._schemas if schema["slug"] == slug)
+    async def _validate(self, data, slug):
+        with span("validation"):
+            if self._should_validate_in_process_pool(data):
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._get_validation_process_pool(), _validate_in_worker, slug, data)
+
+            if self._validators is None:
+                # compiled on the first validation, so jsonschema is imported only when needed
+                self._validators = _build_validators(self._schemas)
+
+            return _collect_errors(self._validators[slug], data)
+
+    async def _call_repo(self, awaitable):
+        with span("repo"):
+            return await within_deadline(awaitable)
+
+    async def _call_cache(self, awaitable):
+        with span("cache"):
+            return await within_deadline(awaitable)
+
+    async def _invalidate_cache(self, awaitable):
+        """
+        Awaits a cache write replacing or deleting what a repo write made outdated.
+        Unlike the optional cache sets, it runs to the end even when the deadline is exceeded
+        or the request is cancelled, as the repo write is already done.
+        """
+        with span("cache"):
+            return await asyncio.shield(awaitable)
 
-        validator = Draft7Validator(schema)
+    def _should_validate_in_process_pool(self, data):
+        if self._validation_process_pool_min_bytes is None:
+            return False
 
-        errors = []
+        return exceeds_size(data, self._validation_process_pool_min_bytes)
 
-        for error in validator.iter_errors(data):
-            errors.append(error.message)
+    def _get_validation_process_pool(self):
+        if self._validation_process_pool is None:
+            from concurrent.futures import ProcessPoolExecutor
 
-        if len(errors) > 0:
-            return errors
+            self._validation_process_pool = ProcessPoolExecutor(
+                max_workers=self._validation_process_pool_workers,
+                initializer=_init_validation_worker,
+                initargs=(self._schemas,),
+            )
 
-        return None
+        return self._validation_process_pool
@@ -0,0 +1,101 @@
+"""
+Module with the timing of the phases of each request, like cache, repo, validation
+and serialization, propagated to the awaited operations through a context variable.
+"""
+import contextlib
+import contextvars
+import time
+
+
+_trace = contextvars.ContextVar("py_easy_rest_trace", default=None)
+
+
+class SpanHook():
+    """
+    Interface to receive the spans of the traced requests, to forward them to a tracer.
+    """
+
+    def start_span(self, name):
+        """
+        Receives the <name> of a starting span, and returns an object passed to <end_span>.
+        """
+        return None
+
+    def end_span(self, span, duration_seconds):
+        """
+        Receives the object returned by <start_span> and the span duration.
+        """
+        return None
+
+
+class Trace():
+    """
+    Timings by phase of a request, reported to the <hooks> too.
+    """
+
+    def __init__(self, hooks=None):
+        self.hooks = hooks or []
+        self.started = time.perf_counter()
+        self._durations = {}
+
+    def add(self, name, duration_seconds):
+        self._durations[name] = self._durations.get(name, 0) + duration_seconds
+
+    def durations(self):
+        """
+        Returns the total seconds by phase.
+        """
+        return dict(self._durations)
+
+    def server_timing(self):
+        """
+        Returns the timings as a Server-Timing header value, with the durations in milliseconds.
+        """
+        timings = [*self._durations.items(), ("total", time.perf_counter() - self.started)]
+
+        return ", ".join(f"{name};dur={duration * 1000:.2f}" for name, duration in timings)
+
+
+def start_trace(hooks=None):
+    """
+    Starts the trace of the current task, returning it.
+    """
+    trace = Trace(hooks)
+    _trace.set(trace)
+
+    return trace
+
+
+def clear_trace():
+    """
+    Removes the trace of the current task.
+    """
+    _trace.set(None)
+
+
+def current_trace():
+    return _trace.get()
+
+
+@contextlib.contextmanager
+def span(name):
+    """
+    Times the phase <name> while in the context, when the current task is traced.
+    """
+    trace = _trace.get()
+
+    if trace is None:
+        yield
+        return
+
+    spans = [hook.start_span(name) for hook in trace.hooks]
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        trace.add(name, duration)
+
+        for hook, hook_span in zip(trace.hooks, spans):
+            hook.end_span(hook_span, duration)
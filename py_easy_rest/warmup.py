@@ -0,0 +1,145 @@
+"""
+Module with the warmup of the cache of a starting worker, before it is ready.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from collections import Counter
+
+from py_easy_rest.exceptions import PYRNotFoundError
+
+
+class PYRHotIds():
+    """
+    Ids of the most read documents by slug, recorded from the service gets,
+    saved to and loaded from the JSON file <path>, like {"country": ["br", "us"]}.
+    Up to <max_ids_per_slug> ids are kept per slug.
+    """
+
+    def __init__(self, path=None, max_ids_per_slug=1000):
+        self._path = path
+        self._max_ids_per_slug = max_ids_per_slug
+        self._counts = {}
+
+    def record(self, slug, id):
+        counts = self._counts.setdefault(slug, Counter())
+        counts[id] += 1
+
+        # the least read ids are dropped, so the counts do not grow with every id ever read
+        if len(counts) > self._max_ids_per_slug * 10:
+            self._counts[slug] = Counter(dict(counts.most_common(self._max_ids_per_slug)))
+
+    def most_common(self):
+        """
+        Returns the most read ids by slug.
+        """
+        return {
+            slug: [id for id, _ in counts.most_common(self._max_ids_per_slug)]
+            for slug, counts in self._counts.items()
+        }
+
+    def load(self):
+        """
+        Returns the ids by slug saved in the file, or an empty dictionary when there is no file.
+        """
+        if self._path is None:
+            return {}
+
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def save(self):
+        """
+        Saves the most read ids, replacing the file at once, so it is never read partially written.
+        """
+        if self._path is None:
+            return
+
+        temporary_path = f"{self._path}.{os.getpid()}.tmp"
+
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(self.most_common(), file)
+
+        os.replace(temporary_path, self._path)
+
+
+class PYRWarmup():
+    """
+    Preloads the cache with the first <list_pages> pages of each slug, of <list_size>,
+    and the <hot_ids> by slug, a dictionary or a <PYRHotIds> loading them from its file,
+    running up to <concurrency> operations at once. The worker is <ready> when it is done.
+    Failed operations are logged, and do not stop the warmup.
+    """
+
+    def __init__(self, list_pages=1, list_size=None, hot_ids=None, concurrency=8):
+        self.ready = False
+        self.hot_ids = hot_ids
+        self._list_pages = list_pages
+        self._list_size = list_size
+        self._concurrency = concurrency
+        self._logger = logging.getLogger(__name__)
+
+    async def run(self, service, enabled_handlers):
+        """
+        Warms the cache of <service> for the slugs of <enabled_handlers>, a dictionary with the handlers
+        enabled by slug, and marks the worker as ready.
+        """
+        started = time.monotonic()
+        operations = []
+
+        try:
+            hot_ids = self.hot_ids.load() if isinstance(self.hot_ids, PYRHotIds) else self.hot_ids or {}
+        except Exception:
+            self._logger.exception("Failed to load the hot ids, warming up without them")
+            hot_ids = {}
+
+        for slug, handlers in enabled_handlers.items():
+            if not service.is_cached(slug):
+                continue
+
+            if "list" in handlers:
+                # the first page is warmed without page, like it is requested by default
+                operations.extend(
+                    self._list_operation(service, slug, page or None) for page in range(self._list_pages)
+                )
+
+            if "get" in handlers:
+                operations.extend(self._get_operation(service, slug, id) for id in hot_ids.get(slug, []))
+
+        semaphore = asyncio.Semaphore(self._concurrency)
+        succeeded = await asyncio.gather(*(self._warm(semaphore, operation) for operation in operations))
+
+        self.ready = True
+        self._logger.info(
+            f"Warmed up {sum(succeeded)} of {len(operations)} cache entries in {time.monotonic() - started:.2f}s"
+        )
+
+    def save_hot_ids(self):
+        if isinstance(self.hot_ids, PYRHotIds):
+            self.hot_ids.save()
+
+    def _list_operation(self, service, slug, page):
+        return lambda: service.list(slug, page, self._list_size)
+
+    def _get_operation(self, service, slug, id):
+        # the warmed ids are not read by clients, so they are not recorded as hot again
+        return lambda: service.get(slug, id, record_hot_id=False)
+
+    async def _warm(self, semaphore, operation):
+        async with semaphore:
+            try:
+                await operation()
+            except PYRNotFoundError:
+                # hot ids deleted since they were recorded are not found
+                pass
+            except Exception:
+                self._logger.exception("Failed to warm up cache entry")
+                return False
+
+        return True
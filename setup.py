@@ -27,6 +27,12 @@ setuptools.setup(
         "sanic-ext==22.3.1",
     ],
     extras_require={
+        'msgpack': [
+            "msgpack>=1.0.0",
+        ],
+        'columnar': [
+            "numpy>=1.21.0",
+        ],
         'tests': [
             "sanic-testing==22.3.0",
             "pytest==7.1.2",
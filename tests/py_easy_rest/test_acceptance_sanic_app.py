@@ -1,11 +1,25 @@
+import asyncio
 import pytest
 
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 from aiounittest import AsyncTestCase
+from sanic_ext import Extend
 
 from py_easy_rest import PYRSanicAppBuilder
-from py_easy_rest.exceptions import PYRInputNotValidError, PYRNotFoundError
+from py_easy_rest.changes import PYRChangeFeed
+from py_easy_rest.deadlines import remaining_seconds
+from py_easy_rest.exceptions import (
+    PYRCapacityExceededError,
+    PYRDeadlineExceededError,
+    PYRInputNotValidError,
+    PYRNotFoundError,
+    PYRPreconditionFailedError,
+    PYRServiceUnavailableError,
+)
+from py_easy_rest.repos import PYRMemoryRepo
 from py_easy_rest.service import PYRService
+from py_easy_rest.tracing import SpanHook
+from py_easy_rest.warmup import PYRWarmup
 
 
 api_config_mock = {
@@ -23,20 +37,27 @@ api_config_mock = {
         "slug": "second",
         "properties": {"name": {"type": "string"}},
         "enabled_handlers": ["get"]
+    }, {
+        "name": "Feed",
+        "slug": "feed",
+        "properties": {"name": {"type": "string"}},
+        "enabled_handlers": ["get", "changes", "search", "aggregate"]
     }]
 }
 
 
 class TestAcceptanceSanicApp(AsyncTestCase):
 
+    generic_routes = False
+
     def setUp(self):
         self._service = Mock(PYRService)
-        self._sanic_app = PYRSanicAppBuilder.build(api_config_mock, self._service)
+        self._sanic_app = PYRSanicAppBuilder.build(api_config_mock, self._service, generic_routes=self.generic_routes)
 
-    async def request_api(self, path, method="GET", json=None):
+    async def request_api(self, path, method="GET", json=None, headers=None):
         client = self._sanic_app.asgi_client
 
-        request, response = await client.request(method, path, json=json)
+        request, response = await client.request(method, path, json=json, headers=headers)
 
         await client.aclose()
 
@@ -65,6 +86,51 @@ class TestAcceptanceSanicApp(AsyncTestCase):
         assert response.status == 200
         assert response.json == expected_schema
 
+    @pytest.mark.asyncio
+    async def test_should_get_schema_returns_etag_and_cache_headers(self):
+        request, response = await self.request_api("/mock/schema")
+
+        assert response.headers["etag"]
+        assert response.headers["cache-control"] == "public, max-age=86400"
+
+    @pytest.mark.asyncio
+    async def test_should_get_schemas_returns_304_when_etag_matches(self):
+        client = self._sanic_app.asgi_client
+
+        request, response = await client.get("/schemas")
+
+        assert response.status == 200
+        assert response.json == api_config_mock["schemas"]
+
+        etag = response.headers["etag"]
+
+        request, response = await client.get("/schemas", headers={"If-None-Match": etag})
+
+        await client.aclose()
+
+        assert response.status == 304
+        assert response.headers["etag"] == etag
+
+    @pytest.mark.asyncio
+    async def test_should_openapi_document_be_prerendered(self):
+        Extend(self._sanic_app)
+
+        client = self._sanic_app.asgi_client
+
+        request, response = await client.get("/docs/openapi.json")
+
+        assert response.status == 200
+        assert "/mock/{id}" in response.json["paths"]
+
+        request, response = await client.get(
+            "/docs/openapi.json",
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+
+        await client.aclose()
+
+        assert response.status == 304
+
     @pytest.mark.asyncio
     async def test_should_works_with_multiple_schemas_correctly(self):
         expected_schema = {
@@ -93,7 +159,7 @@ class TestAcceptanceSanicApp(AsyncTestCase):
         assert response.status == 200
         assert response.json == expected_list_of_resources
 
-        self._service.list.assert_called_once_with("mock", None, None)
+        self._service.list.assert_called_once_with("mock", None, None, count=None, filters=None)
 
     @pytest.mark.asyncio
     async def test_should_list_with_pagination_returns_200_and_the_list_of_resources(self):
@@ -108,7 +174,31 @@ class TestAcceptanceSanicApp(AsyncTestCase):
         assert response.status == 200
         assert response.json == expected_list_of_resources
 
-        self._service.list.assert_called_once_with("mock", expected_page, expected_size)
+        self._service.list.assert_called_once_with("mock", expected_page, expected_size, count=None, filters=None)
+
+    @pytest.mark.asyncio
+    async def test_should_list_with_ids_returns_200_and_the_resources_of_the_ids(self):
+        expected_result = {"result": [{"name": "Jean Pinzon"}], "missing": ["2"]}
+
+        self._service.get_many.return_value = expected_result
+
+        request, response = await self.request_api("/mock?ids=1,2")
+
+        assert response.status == 200
+        assert response.json == expected_result
+
+        self._service.get_many.assert_called_once_with("mock", ["1", "2"])
+        self._service.list.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_list_pass_the_count_mode_to_the_service(self):
+        self._service.list.return_value = {"result": []}
+
+        request, response = await self.request_api("/mock?count=none")
+
+        assert response.status == 200
+
+        self._service.list.assert_called_once_with("mock", None, None, count="none", filters=None)
 
     @pytest.mark.asyncio
     async def test_should_get_returns_200_and_the_correct_resource(self):
@@ -181,6 +271,24 @@ class TestAcceptanceSanicApp(AsyncTestCase):
 
         self._service.create.assert_called_once_with("mock", resource, resource_id)
 
+    @pytest.mark.asyncio
+    async def test_should_post_with_idempotency_key_pass_it_to_the_service(self):
+        resource = {"name": "karl"}
+
+        self._service.create.return_value = "mock-id"
+
+        request, response = await self.request_api(
+            path="/mock",
+            method="POST",
+            json=resource,
+            headers={"Idempotency-Key": "retry-1"},
+        )
+
+        assert response.status == 201
+        assert response.json == {"id": "mock-id"}
+
+        self._service.create.assert_called_once_with("mock", resource, None, idempotency_key="retry-1")
+
     @pytest.mark.asyncio
     async def test_should_put_returns_200(self):
         resource = {"name": "karl"}
@@ -318,8 +426,425 @@ class TestAcceptanceSanicApp(AsyncTestCase):
 
         self._service.list.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_should_request_returns_503_and_retry_after_when_it_is_shed(self):
+        self._service.list.side_effect = PYRServiceUnavailableError("mock list is overloaded", 2)
+
+        request, response = await self.request_api("/mock")
+
+        assert response.status == 503
+        assert response.headers["retry-after"] == "2"
+        assert response.json == {"message": "mock list is overloaded"}
+
+    @pytest.mark.asyncio
+    async def test_should_post_returns_507_when_repo_capacity_is_exceeded(self):
+        self._service.create.side_effect = PYRCapacityExceededError("mock 1 exceeds the repository capacity")
+
+        request, response = await self.request_api(path="/mock", method="POST", json={"name": "karl"})
+
+        assert response.status == 507
+        assert response.json == {"message": "mock 1 exceeds the repository capacity"}
+
+    @pytest.mark.asyncio
+    async def test_should_request_returns_504_when_deadline_is_exceeded(self):
+        self._service.get.side_effect = PYRDeadlineExceededError("Request deadline exceeded")
+
+        request, response = await self.request_api("/mock/1")
+
+        assert response.status == 504
+        assert response.json == {"message": "Request deadline exceeded"}
+
+    @pytest.mark.asyncio
+    async def test_should_request_timeout_header_set_the_deadline(self):
+        remaining = []
+
+        async def get(slug, id):
+            remaining.append(remaining_seconds())
+            return {}
+
+        self._service.get.side_effect = get
+
+        request, response = await self.request_api("/mock/1", headers={"X-Request-Timeout": "2.5"})
+
+        assert response.status == 200
+        assert 0 < remaining[0] <= 2.5
+
+    @pytest.mark.asyncio
+    async def test_should_request_timeout_header_set_the_deadline_only_of_its_request(self):
+        remaining = []
+
+        async def get(slug, id):
+            remaining.append(remaining_seconds())
+            return {}
+
+        self._service.get.side_effect = get
+        client = self._sanic_app.asgi_client
+
+        # the asgi client handles the requests in the task of the test, like a keep-alive connection
+        await client.request("GET", "/mock/1", headers={"X-Request-Timeout": "2.5"})
+        request, response = await client.request("GET", "/mock/1")
+
+        await client.aclose()
+
+        assert response.status == 200
+        assert remaining[1] is None
+
+    @pytest.mark.asyncio
+    async def test_should_invalid_request_timeout_header_returns_400(self):
+        client = self._sanic_app.asgi_client
+
+        for timeout in ["soon", "nan", "inf", "-1", "0"]:
+            request, response = await client.request("GET", "/mock/1", headers={"X-Request-Timeout": timeout})
+
+            assert response.status == 400
+            assert response.json == {"message": ["X-Request-Timeout must be a positive number of seconds"]}
+
+        await client.aclose()
+
+        self._service.get.assert_not_called()
+
     @pytest.mark.asyncio
     async def test_should_disabled_handlers_return_404(self):
         request, response = await self.request_api("/second/1", method="DELETE")
 
         assert response.status == 404
+
+    @pytest.mark.asyncio
+    async def test_should_list_stream_large_pages_in_chunks(self):
+        expected_list_of_resources = {
+            "result": [{"name": f"name-{i}", "text": "a" * 1024} for i in range(200)],
+            "page": 0,
+            "size": 200,
+            "totalCount": 1000,
+        }
+
+        self._service.list.return_value = expected_list_of_resources
+        self._sanic_app = PYRSanicAppBuilder.build(
+            api_config_mock, self._service, generic_routes=self.generic_routes, stream_list_min_bytes=64 * 1024
+        )
+
+        with patch.object(PYRSanicAppBuilder, "_stream_list", wraps=PYRSanicAppBuilder._stream_list) as stream_list:
+            request, response = await self.request_api("/mock?size=200")
+
+        assert response.status == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json == expected_list_of_resources
+
+        stream_list.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_should_list_not_stream_small_pages(self):
+        self._service.list.return_value = {"result": [{"name": "karl"}], "page": 0, "size": 30}
+        self._sanic_app = PYRSanicAppBuilder.build(
+            api_config_mock, self._service, generic_routes=self.generic_routes, stream_list_min_bytes=64 * 1024
+        )
+
+        with patch.object(PYRSanicAppBuilder, "_stream_list") as stream_list:
+            request, response = await self.request_api("/mock")
+
+        assert response.status == 200
+        assert response.json == {"result": [{"name": "karl"}], "page": 0, "size": 30}
+
+        stream_list.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_server_timing_header_break_down_the_request_phases(self):
+        ended_spans = []
+
+        class RecordingSpanHook(SpanHook):
+            def end_span(self, span, duration_seconds):
+                ended_spans.append(span)
+
+            def start_span(self, name):
+                return name
+
+        service = PYRService(api_config_mock, repo=PYRMemoryRepo({"mock": {"1": {"name": "karl", "id": "1"}}}))
+        self._sanic_app = PYRSanicAppBuilder.build(
+            api_config_mock,
+            service,
+            generic_routes=self.generic_routes,
+            server_timing=True,
+            span_hooks=[RecordingSpanHook()],
+        )
+
+        request, response = await self.request_api("/mock/1")
+
+        assert response.status == 200
+
+        phases = [timing.split(";")[0] for timing in response.headers["server-timing"].split(", ")]
+
+        assert phases == ["cache", "repo", "serialization", "total"]
+        assert ended_spans == ["cache", "repo", "cache", "serialization"]
+
+    @pytest.mark.asyncio
+    async def test_should_trace_only_the_phases_of_each_request_of_a_connection(self):
+        service = PYRService(api_config_mock, repo=PYRMemoryRepo({"mock": {"1": {"name": "karl", "id": "1"}}}))
+        self._sanic_app = PYRSanicAppBuilder.build(
+            api_config_mock, service, generic_routes=self.generic_routes, server_timing=True
+        )
+        client = self._sanic_app.asgi_client
+
+        await client.request("GET", "/mock/1")
+        request, response = await client.request("GET", "/mock/2")
+
+        await client.aclose()
+
+        phases = [timing.split(";")[0] for timing in response.headers["server-timing"].split(", ")]
+
+        assert response.status == 404
+        assert "serialization" not in phases
+
+    @pytest.mark.asyncio
+    async def test_should_not_add_server_timing_header_by_default(self):
+        self._service.get.return_value = {"name": "karl"}
+
+        request, response = await self.request_api("/mock/1")
+
+        assert "server-timing" not in response.headers
+
+    @pytest.mark.asyncio
+    async def test_should_profile_the_worker_with_the_profiling_token(self):
+        self._sanic_app = PYRSanicAppBuilder.build(
+            api_config_mock, self._service, generic_routes=self.generic_routes, profiling_token="secret"
+        )
+
+        request, response = await self.request_api(
+            "/_admin/profile?seconds=0.05&format=collapsed", headers={"Authorization": "Bearer secret"}
+        )
+
+        assert response.status == 200
+        assert response.headers["content-type"].startswith("text/plain")
+
+    @pytest.mark.asyncio
+    async def test_should_profile_returns_401_without_the_profiling_token(self):
+        self._sanic_app = PYRSanicAppBuilder.build(
+            api_config_mock, self._service, generic_routes=self.generic_routes, profiling_token="secret"
+        )
+
+        request, response = await self.request_api("/_admin/profile", headers={"Authorization": "Bearer other"})
+
+        assert response.status == 401
+
+    @pytest.mark.asyncio
+    async def test_should_profile_returns_400_when_seconds_exceed_the_max(self):
+        self._sanic_app = PYRSanicAppBuilder.build(
+            api_config_mock, self._service, generic_routes=self.generic_routes, profiling_token="secret"
+        )
+
+        request, response = await self.request_api(
+            "/_admin/profile?seconds=31", headers={"Authorization": "Bearer secret"}
+        )
+
+        assert response.status == 400
+
+    @pytest.mark.asyncio
+    async def test_should_profile_limit_the_seconds_to_half_the_response_timeout(self):
+        with patch.dict("os.environ", {"SANIC_RESPONSE_TIMEOUT": "2"}):
+            self._sanic_app = PYRSanicAppBuilder.build(
+                api_config_mock, self._service, generic_routes=self.generic_routes, profiling_token="secret"
+            )
+
+        request, response = await self.request_api(
+            "/_admin/profile?seconds=1.5", headers={"Authorization": "Bearer secret"}
+        )
+
+        assert response.status == 400
+        assert response.json == {"message": ["seconds must be a number up to 1.0"]}
+
+    @pytest.mark.asyncio
+    async def test_should_not_define_the_profile_route_by_default(self):
+        request, response = await self.request_api("/_admin/profile", headers={"Authorization": "Bearer secret"})
+
+        assert response.status == 404
+
+    @pytest.mark.asyncio
+    async def test_should_run_the_warmup_once_the_worker_starts(self):
+        self._service.is_cached.return_value = True
+        warmup = PYRWarmup(hot_ids={"mock": ["1"]})
+
+        self._sanic_app = PYRSanicAppBuilder.build(
+            api_config_mock, self._service, generic_routes=self.generic_routes, warmup=warmup
+        )
+
+        await self.request_api("/_ready")
+        await asyncio.sleep(0.05)
+
+        assert warmup.ready
+
+        self._service.list.assert_called_once_with("mock", None, None)
+        self._service.get.assert_called_once_with("mock", "1", record_hot_id=False)
+
+    @pytest.mark.asyncio
+    async def test_should_be_ready_when_the_warmup_is_done(self):
+        warmup = Mock(PYRWarmup)
+        warmup.ready = True
+
+        self._sanic_app = PYRSanicAppBuilder.build(
+            api_config_mock, self._service, generic_routes=self.generic_routes, warmup=warmup
+        )
+
+        request, response = await self.request_api("/_ready")
+
+        assert response.status == 200
+        assert response.json == {"ready": True}
+
+    @pytest.mark.asyncio
+    async def test_should_not_be_ready_while_warming_up(self):
+        warmup = Mock(PYRWarmup)
+        warmup.ready = False
+
+        self._sanic_app = PYRSanicAppBuilder.build(
+            api_config_mock, self._service, generic_routes=self.generic_routes, warmup=warmup
+        )
+
+        request, response = await self.request_api("/_ready")
+
+        assert response.status == 503
+        assert response.json == {"ready": False}
+
+    @pytest.mark.asyncio
+    async def test_should_search_returns_200_and_the_ranked_results(self):
+        expected_result = {"result": [{"name": "Karl"}], "page": 1, "size": 10, "totalCount": 11}
+
+        self._service.search.return_value = expected_result
+
+        request, response = await self.request_api("/feed/_search?q=ka&page=1&size=10")
+
+        assert response.status == 200
+        assert response.json == expected_result
+
+        self._service.search.assert_called_once_with("feed", "ka", "1", "10")
+        self._service.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_list_with_filters(self):
+        self._service.list.return_value = {"result": [], "page": 0, "size": 30, "totalCount": 0}
+
+        request, response = await self.request_api("/mock?filter=age:gte:18&filter=age:lt:65")
+
+        assert response.status == 200
+
+        self._service.list.assert_called_once_with("mock", None, None, count=None, filters=["age:gte:18", "age:lt:65"])
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_returns_200_and_the_groups(self):
+        expected_result = {"result": [{"group": "books", "value": 40}]}
+
+        self._service.aggregate.return_value = expected_result
+
+        request, response = await self.request_api("/feed/_aggregate?group_by=category&metric=sum:price")
+
+        assert response.status == 200
+        assert response.json == expected_result
+
+        self._service.aggregate.assert_called_once_with("feed", "category", "sum:price")
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_returns_404_when_not_enabled(self):
+        request, response = await self.request_api("/unknown/_aggregate?group_by=category")
+
+        assert response.status == 404
+
+        self._service.aggregate.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_get_returns_the_version_as_etag(self):
+        self._service.get.return_value = {"name": "karl", "_version": 3}
+
+        request, response = await self.request_api("/mock/1")
+
+        assert response.status == 200
+        assert response.headers["etag"] == '"3"'
+
+    @pytest.mark.asyncio
+    async def test_should_put_with_if_match_pass_the_expected_versions(self):
+        self._service.replace.return_value = 4
+
+        request, response = await self.request_api(
+            "/mock/1", method="PUT", json={"name": "karl"}, headers={"If-Match": '"3", W/"5", "other"'}
+        )
+
+        assert response.status == 200
+        assert response.headers["etag"] == '"4"'
+
+        self._service.replace.assert_called_once_with("mock", {"name": "karl"}, "1", expected_versions={3})
+
+    @pytest.mark.asyncio
+    async def test_should_delete_with_any_if_match_not_pass_expected_versions(self):
+        request, response = await self.request_api("/mock/1", method="DELETE", headers={"If-Match": "*"})
+
+        assert response.status == 200
+
+        self._service.delete.assert_called_once_with("mock", "1")
+
+    @pytest.mark.asyncio
+    async def test_should_patch_returns_412_when_version_does_not_match(self):
+        self._service.partial_update.side_effect = PYRPreconditionFailedError("Mock 1 version 4 does not match")
+
+        request, response = await self.request_api(
+            "/mock/1", method="PATCH", json={"name": "karl"}, headers={"If-Match": '"3"'}
+        )
+
+        assert response.status == 412
+        assert response.json == {"message": "Mock 1 version 4 does not match"}
+
+    @pytest.mark.asyncio
+    async def test_should_changes_stream_server_sent_events_after_the_last_event_id(self):
+        change_feed = PYRChangeFeed()
+        change_feed.publish("feed", "create", "1", {"name": "Jean", "id": "1"})
+        change_feed.publish("feed", "delete", "1")
+        change_feed.publish("feed", "create", "2", {"name": "Karl", "id": "2"})
+
+        self._service.subscribe_changes.side_effect = change_feed.subscribe
+        asyncio.get_running_loop().call_later(0.1, change_feed.close)
+
+        request, response = await self.request_api("/feed/_changes", headers={"Last-Event-ID": "1"})
+
+        assert response.status == 200
+        assert response.headers["content-type"] == "text/event-stream"
+        assert response.text == (
+            'id: 2\nevent: delete\n'
+            'data: {"sequence":2,"slug":"feed","operation":"delete","id":"1","data":null}\n\n'
+            'id: 3\nevent: create\n'
+            'data: {"sequence":3,"slug":"feed","operation":"create","id":"2","data":{"name":"Karl","id":"2"}}\n\n'
+        )
+
+        self._service.subscribe_changes.assert_called_once_with("feed", 1)
+        self._service.get.assert_not_called()
+        assert change_feed.metrics()["subscribers"] == {}
+
+    @pytest.mark.asyncio
+    async def test_should_changes_with_invalid_since_returns_400(self):
+        request, response = await self.request_api("/feed/_changes?since=yesterday")
+
+        assert response.status == 400
+        assert response.json == {"message": ["since must be a sequence number"]}
+        self._service.subscribe_changes.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_changes_of_a_not_existent_name_returns_404(self):
+        request, response = await self.request_api("/not-existent-name/_changes")
+
+        assert response.status == 404
+        self._service.subscribe_changes.assert_not_called()
+
+
+class TestAcceptanceSanicAppWithGenericRoutes(TestAcceptanceSanicApp):
+
+    generic_routes = True
+
+    @pytest.mark.asyncio
+    async def test_should_openapi_document_be_expanded_by_slug(self):
+        Extend(self._sanic_app)
+
+        request, response = await self.request_api("/docs/openapi.json")
+
+        paths = response.json["paths"]
+
+        assert response.status == 200
+        assert set(paths["/mock/{id}"]) == {"get", "post", "put", "patch", "delete"}
+        assert set(paths["/second/{id}"]) == {"get"}
+        assert "/second" not in paths
+        assert not [path for path in paths if "{slug}" in path]
+        assert paths["/mock/{id}"]["get"]["tags"] == ["Mock"]
+        assert [parameter["name"] for parameter in paths["/mock/{id}"]["get"]["parameters"]] == ["id"]
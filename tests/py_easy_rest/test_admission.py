@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+
+from aiounittest import AsyncTestCase
+
+from py_easy_rest.admission import PYRAdmissionControl
+from py_easy_rest.exceptions import PYRServiceUnavailableError
+
+
+class TestPYRAdmissionControl(AsyncTestCase):
+
+    def setUp(self):
+        self._admission_control = PYRAdmissionControl(
+            limits={
+                "mock": {"list": {"max_concurrency": 1, "max_queue": 1}},
+                "*": {"*": {"max_concurrency": 2}},
+            },
+            retry_after_seconds=5,
+        )
+
+    @pytest.mark.asyncio
+    async def test_should_admit_without_limit_when_not_configured(self):
+        admission_control = PYRAdmissionControl()
+
+        async with admission_control.admit("mock", "list"):
+            async with admission_control.admit("mock", "list"):
+                pass
+
+        assert admission_control.metrics() == {}
+
+    @pytest.mark.asyncio
+    async def test_should_queue_and_shed_operations_over_the_limit(self):
+        release = asyncio.Event()
+
+        async def hold_slot():
+            async with self._admission_control.admit("mock", "list"):
+                await release.wait()
+
+        first = asyncio.ensure_future(hold_slot())
+        queued = asyncio.ensure_future(hold_slot())
+        await asyncio.sleep(0)
+
+        with pytest.raises(PYRServiceUnavailableError) as error:
+            async with self._admission_control.admit("mock", "list"):
+                pass
+
+        assert error.value.retry_after_seconds == 5
+
+        metrics = self._admission_control.metrics()["mock"]["list"]
+
+        assert metrics["in_flight"] == 1
+        assert metrics["queue_size"] == 1
+        assert metrics["shed"] == 1
+
+        release.set()
+        await asyncio.gather(first, queued)
+
+        metrics = self._admission_control.metrics()["mock"]["list"]
+
+        assert metrics["in_flight"] == 0
+        assert metrics["admitted"] == 2
+        assert metrics["queued"] == 1
+
+    @pytest.mark.asyncio
+    async def test_should_keep_separated_counters_per_slug_for_default_limits(self):
+        async with self._admission_control.admit("first", "get"):
+            async with self._admission_control.admit("first", "get"):
+                async with self._admission_control.admit("second", "get"):
+                    with pytest.raises(PYRServiceUnavailableError):
+                        async with self._admission_control.admit("first", "get"):
+                            pass
+
+        metrics = self._admission_control.metrics()
+
+        assert metrics["first"]["get"]["admitted"] == 2
+        assert metrics["first"]["get"]["shed"] == 1
+        assert metrics["second"]["get"]["admitted"] == 1
+
+    @pytest.mark.asyncio
+    async def test_should_release_the_slot_when_a_queued_operation_is_cancelled(self):
+        release = asyncio.Event()
+
+        async def hold_slot():
+            async with self._admission_control.admit("mock", "list"):
+                await release.wait()
+
+        first = asyncio.ensure_future(hold_slot())
+        queued = asyncio.ensure_future(hold_slot())
+        await asyncio.sleep(0)
+
+        queued.cancel()
+        release.set()
+        await first
+
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+        metrics = self._admission_control.metrics()["mock"]["list"]
+
+        assert metrics["in_flight"] == 0
+        assert metrics["queue_size"] == 0
@@ -0,0 +1,37 @@
+import pytest
+
+from aiounittest import AsyncTestCase
+
+from py_easy_rest.benchmarking import benchmark_cache, benchmark_repo, format_results
+from py_easy_rest.caches import PYRDummyCache
+from py_easy_rest.repos import PYRMemoryRepo
+
+
+class TestBenchmarking(AsyncTestCase):
+
+    @pytest.mark.asyncio
+    async def test_should_benchmark_each_repo_operation_at_each_concurrency(self):
+        repo = PYRMemoryRepo()
+
+        results = await benchmark_repo(repo, requests=20, concurrencies=(1, 4), page_size=5)
+
+        assert [(result["operation"], result["concurrency"]) for result in results] == [
+            (operation, concurrency)
+            for concurrency in (1, 4)
+            for operation in ("create", "get", "list", "replace", "delete")
+        ]
+        assert all(result["requests"] == 20 and result["throughput_per_second"] > 0 for result in results)
+        assert all(result["p50_ms"] <= result["p99_ms"] <= result["max_ms"] for result in results)
+
+        assert (await repo.list("benchmark", 0, 30))["totalCount"] == 0
+
+    @pytest.mark.asyncio
+    async def test_should_benchmark_each_cache_operation_and_format_the_results(self):
+        results = await benchmark_cache(PYRDummyCache(), requests=10, concurrencies=(2,))
+
+        assert [result["operation"] for result in results] == ["set", "get", "set_many", "get_many", "delete"]
+
+        lines = format_results(results).splitlines()
+
+        assert len(lines) == 6
+        assert lines[1].split()[:2] == ["set", "2"]
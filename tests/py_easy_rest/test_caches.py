@@ -2,7 +2,7 @@ import pytest
 
 from aiounittest import AsyncTestCase
 
-from py_easy_rest.caches import PYRDummyCache
+from py_easy_rest.caches import Cache, PYRDummyCache
 
 
 class TestPYRDummyCache(AsyncTestCase):
@@ -27,3 +27,37 @@ class TestPYRDummyCache(AsyncTestCase):
         result = await self._cache.set("mock_key", "mock_value")
 
         assert result is None
+
+    @pytest.mark.asyncio
+    async def test_should_get_many_return_a_None_per_key(self):
+        result = await self._cache.get_many(["mock_key", "other_key"])
+
+        assert result == [None, None]
+
+
+class DictCache(Cache):
+
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+    async def set(self, key, value, ttl=None):
+        self.values[key] = value
+
+
+class TestCache(AsyncTestCase):
+
+    @pytest.mark.asyncio
+    async def test_should_get_many_and_set_many_fallback_to_get_and_set(self):
+        cache = DictCache()
+
+        await cache.set_many({"first": "1", "second": "2"}, ttl=10)
+
+        result = await cache.get_many(["second", "missing", "first"])
+
+        assert result == ["2", None, "1"]
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+
+from aiounittest import AsyncTestCase
+
+from py_easy_rest.changes import PYRChangeFeed
+
+
+class TestPYRChangeFeed(AsyncTestCase):
+
+    def setUp(self):
+        self._change_feed = PYRChangeFeed(buffer_size=2, history_size=3)
+
+    async def _consume(self, subscription):
+        return [(change["sequence"], change["operation"]) async for change in subscription]
+
+    @pytest.mark.asyncio
+    async def test_should_broadcast_changes_of_the_slug_to_its_subscribers(self):
+        first = self._change_feed.subscribe("mock")
+        second = self._change_feed.subscribe("mock")
+        other = self._change_feed.subscribe("other")
+
+        self._change_feed.publish("mock", "create", "1", {"name": "Jean"})
+        self._change_feed.close()
+
+        assert await self._consume(first) == [(1, "create")]
+        assert await self._consume(second) == [(1, "create")]
+        assert await self._consume(other) == []
+        assert self._change_feed.metrics() == {"last_sequence": 1, "subscribers": {}}
+
+    @pytest.mark.asyncio
+    async def test_should_retain_a_copy_of_the_written_data(self):
+        data = {"name": "Jean", "tags": ["a"]}
+
+        self._change_feed.publish("mock", "create", "1", data)
+        data["tags"].append("b")
+
+        subscription = self._change_feed.subscribe("mock", since=0)
+        self._change_feed.close()
+
+        assert [change["data"] async for change in subscription] == [{"name": "Jean", "tags": ["a"]}]
+
+    @pytest.mark.asyncio
+    async def test_should_wait_for_changes_published_later(self):
+        subscription = self._change_feed.subscribe("mock")
+
+        consumed = asyncio.ensure_future(subscription.__anext__())
+        await asyncio.sleep(0)
+
+        assert not consumed.done()
+
+        change = self._change_feed.publish("mock", "delete", "1")
+
+        assert await consumed == change
+
+    @pytest.mark.asyncio
+    async def test_should_resume_after_the_since_sequence(self):
+        self._change_feed.publish("mock", "create", "1")
+        self._change_feed.publish("other", "create", "1")
+        self._change_feed.publish("mock", "replace", "1")
+
+        subscription = self._change_feed.subscribe("mock", since=1)
+        self._change_feed.close()
+
+        assert await self._consume(subscription) == [(3, "replace")]
+
+    @pytest.mark.asyncio
+    async def test_should_reset_when_changes_after_since_are_not_retained(self):
+        for id in ["1", "2", "3", "4"]:
+            self._change_feed.publish("mock", "create", id)
+
+        lost = self._change_feed.subscribe("mock", since=0)
+        from_the_future = self._change_feed.subscribe("mock", since=10)
+        retained = self._change_feed.subscribe("mock", since=1)
+        self._change_feed.close()
+
+        assert await self._consume(lost) == [(4, "reset")]
+        assert await self._consume(from_the_future) == [(4, "reset")]
+        assert await self._consume(retained) == [(2, "create"), (3, "create"), (4, "create")]
+
+    @pytest.mark.asyncio
+    async def test_should_close_subscribers_falling_behind_the_buffer(self):
+        subscription = self._change_feed.subscribe("mock")
+
+        for id in ["1", "2", "3"]:
+            self._change_feed.publish("mock", "create", id)
+
+        assert await self._consume(subscription) == [(1, "create"), (2, "create")]
+        assert subscription.overflowed
+        assert self._change_feed.metrics()["subscribers"] == {}
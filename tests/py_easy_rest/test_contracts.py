@@ -0,0 +1,70 @@
+import time
+
+from unittest import IsolatedAsyncioTestCase
+
+from py_easy_rest.caches import Cache, PYRDummyCache
+from py_easy_rest.contracts import CacheContract, RepoContract
+from py_easy_rest.repos import PYRMemoryRepo
+
+
+class ExpiringDictCache(Cache):
+    """
+    Local stand-in of a cache with expiration, like Redis.
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        value, expires_at = self.values.get(key, (None, None))
+
+        if expires_at is not None and expires_at <= time.monotonic():
+            return None
+
+        return value
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+    async def set(self, key, value, ttl=None):
+        self.values[key] = (value, None if ttl is None else time.monotonic() + ttl)
+
+
+class TestPYRMemoryRepoContract(RepoContract, IsolatedAsyncioTestCase):
+
+    async def build_repo(self, schemas):
+        return PYRMemoryRepo(schemas=schemas)
+
+
+class TestPYRMemoryRepoCompactContract(RepoContract, IsolatedAsyncioTestCase):
+
+    async def build_repo(self, schemas):
+        return PYRMemoryRepo(compact=True, schemas=schemas)
+
+
+class TestPYRMemoryRepoColumnarContract(RepoContract, IsolatedAsyncioTestCase):
+
+    async def build_repo(self, schemas):
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            self.skipTest("numpy is not installed")
+
+        return PYRMemoryRepo(columnar=True, schemas=schemas)
+
+
+class TestPYRDummyCacheContract(CacheContract, IsolatedAsyncioTestCase):
+
+    stores_values = False
+
+    async def build_cache(self):
+        return PYRDummyCache()
+
+
+class TestExpiringDictCacheContract(CacheContract, IsolatedAsyncioTestCase):
+
+    ttl_seconds = 0.05
+    ttl_tolerance_seconds = 0.05
+
+    async def build_cache(self):
+        return ExpiringDictCache()
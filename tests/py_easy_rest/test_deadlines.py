@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+
+from aiounittest import AsyncTestCase
+
+from py_easy_rest.deadlines import deadline, is_exhausted, remaining_seconds, within_deadline
+from py_easy_rest.exceptions import PYRDeadlineExceededError
+
+
+class TestDeadlines(AsyncTestCase):
+
+    @pytest.mark.asyncio
+    async def test_should_await_without_deadline(self):
+        result = await within_deadline(asyncio.sleep(0, result="done"))
+
+        assert result == "done"
+        assert remaining_seconds() is None
+
+    @pytest.mark.asyncio
+    async def test_should_raise_PYRDeadlineExceededError_when_it_can_not_finish_in_time(self):
+        with deadline(0.01):
+            with pytest.raises(PYRDeadlineExceededError):
+                await within_deadline(asyncio.sleep(1))
+
+            assert is_exhausted()
+
+    @pytest.mark.asyncio
+    async def test_should_raise_PYRDeadlineExceededError_when_deadline_is_exhausted(self):
+        coroutine = asyncio.sleep(0)
+
+        with deadline(0):
+            with pytest.raises(PYRDeadlineExceededError):
+                await within_deadline(coroutine)
+
+    @pytest.mark.asyncio
+    async def test_should_keep_the_deadline_already_set(self):
+        with deadline(10):
+            with deadline(100):
+                assert remaining_seconds() <= 10
+
+        assert remaining_seconds() is None
@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from py_easy_rest.dictionary_utils import merge
+from py_easy_rest.dictionary_utils import exceeds_size, merge
 
 
 class TestDictionaryUtils(TestCase):
@@ -14,3 +14,9 @@ class TestDictionaryUtils(TestCase):
         result = merge(dict_b, dict_a)
 
         assert result == expected_dict
+
+    def test_should_exceeds_size_approximate_the_json_size(self):
+        data = {"name": "karl", "tags": ["a" * 100, "b" * 100]}
+
+        assert exceeds_size(data, 200)
+        assert not exceeds_size(data, 1024)
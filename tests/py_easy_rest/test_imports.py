@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+
+from unittest import TestCase
+
+
+HEAVY_MODULES = ["sanic", "sanic_ext", "jsonschema"]
+
+
+def import_in_subprocess(statement):
+    """
+    Runs <statement> in a fresh interpreter, returning the heavy modules loaded by it.
+    """
+    code = (
+        "import json, sys\n"
+        f"{statement}\n"
+        f"print(json.dumps([module for module in {HEAVY_MODULES!r} if module in sys.modules]))\n"
+    )
+
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, check=True, text=True).stdout
+
+    return json.loads(output)
+
+
+class TestImports(TestCase):
+
+    def test_should_import_repos_caches_and_service_without_the_web_stack(self):
+        loaded = import_in_subprocess(
+            "import py_easy_rest.repos, py_easy_rest.caches, py_easy_rest.service\n"
+            "from py_easy_rest.service import PYRService\n"
+            "PYRService({'name': 'mock', 'schemas': []})"
+        )
+
+        assert loaded == []
+
+    def test_should_import_the_web_stack_on_first_access_to_the_builder(self):
+        loaded = import_in_subprocess("from py_easy_rest import PYRSanicAppBuilder")
+
+        assert "sanic" in loaded
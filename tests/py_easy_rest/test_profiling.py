@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+import time
+
+from aiounittest import AsyncTestCase
+
+from py_easy_rest.exceptions import PYRServiceUnavailableError
+from py_easy_rest.profiling import PYRProfiler
+
+
+def busy_function():
+    time.sleep(0.02)
+
+
+async def keep_busy(seconds):
+    finish = time.monotonic() + seconds
+
+    while time.monotonic() < finish:
+        busy_function()
+        await asyncio.sleep(0)
+
+
+class TestPYRProfiler(AsyncTestCase):
+
+    def setUp(self):
+        self._profiler = PYRProfiler(sampling_interval_seconds=0.001)
+
+    @pytest.mark.asyncio
+    async def test_should_profile_the_event_loop_as_pstats(self):
+        report, _ = await asyncio.gather(self._profiler.profile(0.1), keep_busy(0.1))
+
+        assert "Ordered by: cumulative time" in report
+        assert "busy_function" in report
+
+    @pytest.mark.asyncio
+    async def test_should_sample_the_event_loop_stacks_as_collapsed(self):
+        report, _ = await asyncio.gather(self._profiler.profile(0.1, format="collapsed"), keep_busy(0.1))
+
+        busy_stacks = [line for line in report.splitlines() if "busy_function (test_profiling.py" in line]
+
+        assert busy_stacks
+        assert "keep_busy (test_profiling.py" in busy_stacks[0]
+        assert int(busy_stacks[0].rsplit(" ", 1)[1]) > 0
+
+    @pytest.mark.asyncio
+    async def test_should_raises_PYRServiceUnavailableError_when_a_session_is_running(self):
+        running = asyncio.ensure_future(self._profiler.profile(0.05))
+        await asyncio.sleep(0)
+
+        with pytest.raises(PYRServiceUnavailableError) as error:
+            await self._profiler.profile(0.05)
+
+        assert error.value.retry_after_seconds == 1
+
+        await running
+
+        assert await self._profiler.profile(0.01)
+
+    @pytest.mark.asyncio
+    async def test_should_retry_after_the_time_left_in_the_running_session(self):
+        running = asyncio.ensure_future(self._profiler.profile(2.5))
+        await asyncio.sleep(0)
+
+        with pytest.raises(PYRServiceUnavailableError) as error:
+            await self._profiler.profile(0.05)
+
+        assert error.value.retry_after_seconds == 3
+
+        running.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await running
+
+        assert await self._profiler.profile(0.01)
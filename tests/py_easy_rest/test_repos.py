@@ -2,6 +2,7 @@ import pytest
 
 from aiounittest import AsyncTestCase
 
+from py_easy_rest.exceptions import PYRCapacityExceededError
 from py_easy_rest.repos import PYRMemoryRepo
 
 
@@ -20,6 +21,19 @@ class TestPYRMemoryRepo(AsyncTestCase):
 
         assert result == {"name": "Jean", "id": "id-2"}
 
+    @pytest.mark.asyncio
+    async def test_should_get_many_return_the_documents_found_by_id(self):
+        repo = PYRMemoryRepo(initial_data={
+            "mock": {
+                "id-1": {"name": "Alycio", "id": "id-1"},
+                "id-2": {"name": "Jean", "id": "id-2"},
+            }
+        })
+
+        result = await repo.get_many("mock", ["id-2", "id-3"])
+
+        assert result == {"id-2": {"name": "Jean", "id": "id-2"}}
+
     @pytest.mark.asyncio
     async def test_should_list_return_correct_list_of_documents(self):
         repo = PYRMemoryRepo(initial_data={
@@ -133,3 +147,416 @@ class TestPYRMemoryRepo(AsyncTestCase):
         document = await repo.get("mock", "id-1")
 
         assert document is None
+
+    @pytest.mark.asyncio
+    async def test_should_list_without_count(self):
+        repo = PYRMemoryRepo(initial_data={
+            "mock": {
+                "id-1": {"name": "Alycio", "id": "id-1"},
+            }
+        })
+
+        response = await repo.list("mock", page=0, size=2, count=False)
+
+        assert "totalCount" not in response
+        assert response["result"] == [{"name": "Alycio", "id": "id-1"}]
+
+    @pytest.mark.asyncio
+    async def test_should_count_documents(self):
+        repo = PYRMemoryRepo(initial_data={
+            "mock": {
+                "id-1": {"name": "Alycio", "id": "id-1"},
+                "id-2": {"name": "Jean", "id": "id-2"},
+            }
+        })
+
+        assert await repo.count("mock") == 2
+        assert await repo.count("mock", estimate=True) == 2
+
+    @pytest.mark.asyncio
+    async def test_should_compare_and_swap_only_the_expected_version(self):
+        repo = PYRMemoryRepo(initial_data={
+            "mock": {
+                "id-1": {"name": "Alycio", "id": "id-1", "_version": 2},
+                "id-2": {"name": "Jean", "id": "id-2"},
+            }
+        })
+
+        assert not await repo.compare_and_swap("mock", "id-1", 1, {"name": "Karl", "_version": 2})
+        assert await repo.compare_and_swap("mock", "id-1", 2, {"name": "Karl", "_version": 3})
+        assert not await repo.compare_and_swap("mock", "id-2", 1, None)
+        assert await repo.compare_and_swap("mock", "id-2", 0, None)
+        assert not await repo.compare_and_swap("mock", "id-3", 0, {"name": "Karl", "_version": 1})
+
+        result = await repo.list("mock", 0, 10)
+
+        assert result["result"] == [{"name": "Karl", "id": "id-1", "_version": 3}]
+
+
+class TestPYRMemoryRepoSearch(AsyncTestCase):
+
+    def setUp(self):
+        self._repo = PYRMemoryRepo(
+            initial_data={
+                "city": {
+                    "1": {"name": "Porto Alegre", "state": "RS", "id": "1"},
+                    "2": {"name": "Porto", "state": "Portugal", "id": "2"},
+                    "3": {"name": "Alegrete", "state": "RS", "id": "3"},
+                },
+            },
+            schemas=[{
+                "slug": "city",
+                "properties": {
+                    "name": {"type": "string", "searchable": True},
+                    "state": {"type": "string", "searchable": True},
+                },
+            }],
+        )
+
+    async def _search_ids(self, query, page=0, size=30):
+        result = await self._repo.search("city", query, page, size)
+        return [doc["id"] for doc in result["result"]]
+
+    @pytest.mark.asyncio
+    async def test_should_search_rank_exact_words_before_prefixes(self):
+        assert await self._search_ids("port") == ["1", "2"]
+        assert await self._search_ids("porto") == ["1", "2"]
+        assert await self._search_ids("PORTUGAL") == ["2"]
+        assert await self._search_ids("aleg") == ["1", "3"]
+        assert await self._search_ids("rs alegre") == ["1", "3"]
+        assert await self._search_ids("rs alegrete") == ["3"]
+        assert await self._search_ids("lisboa") == []
+
+    @pytest.mark.asyncio
+    async def test_should_search_page_the_ranked_results(self):
+        result = await self._repo.search("city", "rs", 1, 1)
+
+        assert result == {
+            "result": [{"name": "Alegrete", "state": "RS", "id": "3"}],
+            "page": 1,
+            "size": 1,
+            "totalCount": 2,
+        }
+
+    @pytest.mark.asyncio
+    async def test_should_search_index_be_maintained_on_writes(self):
+        await self._repo.create("city", {"name": "Portão", "state": "RS"}, "4")
+        await self._repo.replace("city", "2", {"name": "Lisboa", "state": "Portugal"})
+        await self._repo.delete("city", "1")
+
+        assert await self._search_ids("port") == ["2", "4"]
+        assert await self._search_ids("porto") == []
+        assert await self._search_ids("lisb") == ["2"]
+
+    @pytest.mark.asyncio
+    async def test_should_search_raises_NotImplementedError_without_searchable_properties(self):
+        with pytest.raises(NotImplementedError):
+            await self._repo.search("other", "port")
+
+
+class TestPYRMemoryRepoAggregate(AsyncTestCase):
+
+    def setUp(self):
+        self._repo = PYRMemoryRepo(
+            initial_data={
+                "product": {
+                    "1": {"category": "books", "price": 10, "id": "1"},
+                    "2": {"category": "books", "price": 30, "id": "2"},
+                    "3": {"category": "games", "price": 50.5, "id": "3"},
+                },
+            },
+            schemas=[{
+                "slug": "product",
+                "aggregates": {"category": ["count", "sum:price", "min:price", "max:price"]},
+            }],
+        )
+
+    async def _aggregate(self, metric):
+        result = await self._repo.aggregate("product", "category", metric)
+        return {group["group"]: group["value"] for group in result["result"]}
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_the_declared_metrics_by_group(self):
+        assert await self._aggregate("count") == {"books": 2, "games": 1}
+        assert await self._aggregate("sum:price") == {"books": 40, "games": 50.5}
+        assert await self._aggregate("min:price") == {"books": 10, "games": 50.5}
+        assert await self._aggregate("max:price") == {"books": 30, "games": 50.5}
+
+    @pytest.mark.asyncio
+    async def test_should_aggregates_be_maintained_on_writes(self):
+        await self._repo.create("product", {"category": "books", "price": 5}, "4")
+        await self._repo.create("product", {"price": 7}, "5")
+        await self._repo.replace("product", "2", {"category": "games", "price": "free"})
+        await self._repo.delete("product", "3")
+
+        assert await self._repo.aggregate("product", "category", "count") == {
+            "result": [{"group": "books", "value": 2}, {"group": "games", "value": 1}, {"group": None, "value": 1}],
+        }
+        assert await self._aggregate("sum:price") == {"books": 15, "games": 0, None: 7}
+        assert await self._aggregate("min:price") == {"books": 5, "games": None, None: 7}
+        assert await self._aggregate("max:price") == {"books": 10, "games": None, None: 7}
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_booleans_apart_from_numbers(self):
+        for id, category in enumerate([True, 1, 1.0, False, 0, True]):
+            await self._repo.create("product", {"category": category, "price": 1}, f"mixed-{id}")
+
+        result = await self._repo.aggregate("product", "category", "count")
+
+        assert [(type(group["group"]), group["group"], group["value"]) for group in result["result"][:4]] == [
+            (int, 0, 1), (bool, False, 1), (int, 1, 2), (bool, True, 2),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_raises_NotImplementedError_when_not_declared(self):
+        with pytest.raises(NotImplementedError):
+            await self._repo.aggregate("product", "category", "sum:weight")
+
+        with pytest.raises(NotImplementedError):
+            await self._repo.aggregate("product", "price", "count")
+
+
+class TestPYRMemoryRepoFilter(AsyncTestCase):
+
+    schemas = [{
+        "slug": "product",
+        "properties": {
+            "category": {"type": "string"},
+            "price": {"type": "number"},
+            "stock": {"type": "integer"},
+            "active": {"type": "boolean"},
+        },
+    }]
+
+    def _build_repo(self, columnar):
+        if columnar:
+            pytest.importorskip("numpy")
+
+        return PYRMemoryRepo(
+            initial_data={
+                "product": {
+                    "1": {"category": "books", "price": 10, "stock": 3, "active": True, "id": "1"},
+                    "2": {"category": "books", "price": 30.5, "stock": 0, "active": False, "id": "2"},
+                    "3": {"category": "games", "price": "free", "stock": 7, "active": True, "id": "3"},
+                    "4": {"category": "games", "price": 50, "active": 1, "id": "4"},
+                },
+            },
+            schemas=self.schemas,
+            columnar=columnar,
+        )
+
+    async def _list_ids(self, repo, filters, page=0, size=30):
+        result = await repo.list("product", page, size, filters=filters)
+        return [doc["id"] for doc in result["result"]], result["totalCount"]
+
+    @pytest.mark.asyncio
+    async def test_should_list_the_documents_matching_all_filters(self):
+        for columnar in (False, True):
+            repo = self._build_repo(columnar)
+
+            assert await self._list_ids(repo, [("price", "gte", 10.0)]) == (["1", "2", "4"], 3)
+            assert await self._list_ids(repo, [("price", "gt", 10.0), ("price", "lt", 50.0)]) == (["2"], 1)
+            assert await self._list_ids(repo, [("price", "ne", 10.0)]) == (["2", "4"], 2)
+            assert await self._list_ids(repo, [("stock", "eq", 0.0)]) == (["2"], 1)
+            assert await self._list_ids(repo, [("active", "eq", True)]) == (["1", "3"], 2)
+            assert await self._list_ids(repo, [("active", "ne", True), ("price", "lte", 100.0)]) == (["2"], 1)
+            assert await self._list_ids(repo, [("price", "gte", 0.0)], page=1, size=2) == (["4"], 3)
+
+    @pytest.mark.asyncio
+    async def test_should_columns_be_maintained_on_writes_in_insertion_order(self):
+        repo = self._build_repo(columnar=True)
+
+        for i in range(5, 45):
+            await repo.create("product", {"price": i}, str(i))
+
+        for i in range(5, 40):
+            await repo.delete("product", str(i))
+
+        await repo.replace("product", "1", {"price": 42})
+        await repo.delete("product", "2")
+        await repo.create("product", {"price": 41}, "2")
+
+        ids, total_count = await self._list_ids(repo, [("price", "gte", 40.0)])
+
+        assert ids == ["1", "4", "40", "41", "42", "43", "44", "2"]
+        assert total_count == 8
+        assert await self._list_ids(repo, [("active", "eq", True)]) == (["3"], 1)
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_the_columns_vectorized(self):
+        repo = self._build_repo(columnar=True)
+
+        assert await repo.aggregate("product", "active", "count") == {
+            "result": [{"group": False, "value": 1}, {"group": True, "value": 2}, {"group": None, "value": 1}],
+        }
+        assert (await repo.aggregate("product", "active", "sum:price"))["result"] == [
+            {"group": False, "value": 30.5}, {"group": True, "value": 10.0}, {"group": None, "value": 50.0},
+        ]
+        assert (await repo.aggregate("product", "active", "min:stock"))["result"] == [
+            {"group": False, "value": 0}, {"group": True, "value": 3}, {"group": None, "value": None},
+        ]
+        assert (await repo.aggregate("product", "stock", "max:price"))["result"] == [
+            {"group": 0, "value": 30.5}, {"group": 3, "value": 10.0}, {"group": 7, "value": None},
+            {"group": None, "value": 50.0},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_raises_NotImplementedError_when_not_columnar(self):
+        repo = self._build_repo(columnar=True)
+
+        with pytest.raises(NotImplementedError):
+            await repo.aggregate("product", "category", "count")
+
+        with pytest.raises(NotImplementedError):
+            await self._build_repo(columnar=False).aggregate("product", "active", "count")
+
+
+class TestPYRMemoryRepoCompact(AsyncTestCase):
+
+    schemas = [{
+        "name": "Mock",
+        "slug": "mock",
+        "properties": {
+            "name": {"type": "string"},
+            "age": {"type": "integer"},
+        },
+    }]
+
+    @pytest.mark.asyncio
+    async def test_should_store_documents_encoded_and_decode_them_on_read(self):
+        repo = PYRMemoryRepo(compact=True, schemas=self.schemas)
+
+        await repo.create("mock", {"name": "Jean", "age": 30, "0": "zero"}, "id-1")
+
+        assert isinstance(repo._data["mock"]["id-1"], bytes)
+        assert b"name" not in repo._data["mock"]["id-1"]
+
+        assert await repo.get("mock", "id-1") == {"name": "Jean", "age": 30, "0": "zero", "id": "id-1"}
+
+    @pytest.mark.asyncio
+    async def test_should_encode_initial_data_and_list_decoded_documents(self):
+        repo = PYRMemoryRepo(
+            initial_data={"other": {"id-1": {"name": "Alycio", "id": "id-1"}}},
+            compact=True,
+        )
+
+        response = await repo.list("other", page=0, size=2)
+
+        assert response["result"] == [{"name": "Alycio", "id": "id-1"}]
+
+    @pytest.mark.asyncio
+    async def test_should_replace_encoded_document(self):
+        repo = PYRMemoryRepo(compact=True, schemas=self.schemas)
+
+        await repo.create("mock", {"name": "Jean"}, "id-1")
+        await repo.replace("mock", "id-1", {"name": "Ronaldo"})
+
+        assert await repo.get("mock", "id-1") == {"name": "Ronaldo", "id": "id-1"}
+
+    @pytest.mark.asyncio
+    async def test_should_store_documents_with_msgpack(self):
+        pytest.importorskip("msgpack")
+
+        repo = PYRMemoryRepo(compact=True, encoding="msgpack", schemas=self.schemas)
+
+        await repo.create("mock", {"name": "Jean", "age": 30}, "id-1")
+
+        assert await repo.get("mock", "id-1") == {"name": "Jean", "age": 30, "id": "id-1"}
+
+
+class TestPYRMemoryRepoCapacity(AsyncTestCase):
+
+    @pytest.mark.asyncio
+    async def test_should_account_memory_incrementally(self):
+        repo = PYRMemoryRepo(initial_data={"mock": {"id-1": {"name": "Alycio", "id": "id-1"}}})
+
+        initial_bytes = repo.memory_usage()["total_bytes"]
+
+        assert initial_bytes > 0
+
+        await repo.create("mock", {"name": "Jean"}, "id-2")
+        await repo.create("other", {"name": "Ronaldo"}, "id-1")
+
+        usage = repo.memory_usage()
+
+        assert usage["slugs"]["mock"]["documents"] == 2
+        assert usage["slugs"]["other"]["documents"] == 1
+        assert usage["total_bytes"] == usage["slugs"]["mock"]["bytes"] + usage["slugs"]["other"]["bytes"]
+
+        await repo.replace("mock", "id-2", {"name": "Jean" * 100})
+
+        assert repo.memory_usage()["slugs"]["mock"]["bytes"] > usage["slugs"]["mock"]["bytes"]
+
+        await repo.delete("mock", "id-2")
+        await repo.delete("other", "id-1")
+
+        assert repo.memory_usage()["total_bytes"] == initial_bytes
+
+    @pytest.mark.asyncio
+    async def test_should_reject_writes_over_the_capacity(self):
+        repo = PYRMemoryRepo(compact=True, max_bytes_per_slug=400)
+
+        await repo.create("mock", {"name": "Jean"}, "id-1")
+
+        with pytest.raises(PYRCapacityExceededError):
+            await repo.create("mock", {"name": "Alycio"}, "id-2")
+
+        assert await repo.get("mock", "id-2") is None
+        assert repo.memory_usage()["slugs"]["mock"]["documents"] == 1
+
+    @pytest.mark.asyncio
+    async def test_should_evict_the_oldest_documents_of_the_slug_with_fifo(self):
+        repo = PYRMemoryRepo(compact=True, max_bytes_per_slug=400, eviction_policy="fifo")
+
+        await repo.create("mock", {"name": "Jean"}, "id-1")
+        await repo.create("other", {"name": "Ronaldo"}, "id-1")
+        await repo.create("mock", {"name": "Alycio"}, "id-2")
+
+        assert await repo.get("mock", "id-1") is None
+        assert await repo.get("mock", "id-2") == {"name": "Alycio", "id": "id-2"}
+        assert await repo.get("other", "id-1") == {"name": "Ronaldo", "id": "id-1"}
+        assert repo.memory_usage()["evicted_documents"] == 1
+
+        response = await repo.list("mock", page=0, size=10)
+
+        assert response["result"] == [{"name": "Alycio", "id": "id-2"}]
+
+    @pytest.mark.asyncio
+    async def test_should_evict_the_least_recently_used_documents_with_lru(self):
+        repo = PYRMemoryRepo(compact=True, max_bytes=700, eviction_policy="lru")
+
+        await repo.create("mock", {"name": "Jean"}, "id-1")
+        await repo.create("other", {"name": "Ronaldo"}, "id-1")
+        await repo.get("mock", "id-1")
+        await repo.create("mock", {"name": "Alycio"}, "id-2")
+
+        assert await repo.get("other", "id-1") is None
+        assert await repo.get("mock", "id-1") == {"name": "Jean", "id": "id-1"}
+
+    @pytest.mark.asyncio
+    async def test_should_reject_documents_larger_than_the_capacity_without_evicting(self):
+        for eviction_policy in ["fifo", "lru"]:
+            repo = PYRMemoryRepo(compact=True, max_bytes=3000, eviction_policy=eviction_policy)
+
+            for i in range(4):
+                await repo.create("mock", {"name": f"Jean {i}"}, f"id-{i}")
+
+            with pytest.raises(PYRCapacityExceededError):
+                await repo.create("mock", {"name": "x" * 10000}, "id-large")
+
+            assert await repo.get("mock", "id-large") is None
+            assert repo.memory_usage()["slugs"]["mock"]["documents"] == 4
+            assert repo.memory_usage()["evicted_documents"] == 0
+
+        repo = PYRMemoryRepo(compact=True, max_bytes_per_slug=3000, eviction_policy="fifo")
+
+        await repo.create("mock", {"name": "Jean"}, "id-1")
+
+        with pytest.raises(PYRCapacityExceededError):
+            await repo.replace("mock", "id-1", {"name": "x" * 10000})
+
+        assert await repo.get("mock", "id-1") == {"name": "Jean", "id": "id-1"}
+
+    def test_should_raise_ValueError_for_unknown_eviction_policy(self):
+        with pytest.raises(ValueError):
+            PYRMemoryRepo(eviction_policy="random")
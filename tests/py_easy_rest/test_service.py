@@ -1,13 +1,25 @@
+import asyncio
 import pytest
 import json
+import time
 
 from unittest.mock import Mock
 from aiounittest import AsyncTestCase
 
-from py_easy_rest.exceptions import PYRInputNotValidError, PYRNotFoundError
-from py_easy_rest.service import PYRService
-from py_easy_rest.repos import PYRMemoryRepo
+from py_easy_rest.admission import PYRAdmissionControl
+from py_easy_rest.changes import PYRChangeFeed
+from py_easy_rest.deadlines import deadline
+from py_easy_rest.exceptions import (
+    PYRDeadlineExceededError,
+    PYRInputNotValidError,
+    PYRNotFoundError,
+    PYRPreconditionFailedError,
+    PYRServiceUnavailableError,
+)
+from py_easy_rest.service import WRITE_MAX_ATTEMPTS, PYRService
+from py_easy_rest.repos import PYRMemoryRepo, Repo
 from py_easy_rest.caches import PYRDummyCache
+from py_easy_rest.warmup import PYRHotIds
 
 
 api_config_mock = {
@@ -174,9 +186,13 @@ class TestPYRService(AsyncTestCase):
         resource = {"name": "karl"}
         resource_id = "mock-id"
 
-        await self._service.replace("mock", resource, resource_id)
+        self._repo.get.return_value = {"name": "jean", "_version": 3}
 
-        self._repo.replace.assert_called_once_with("mock", resource_id, resource)
+        version = await self._service.replace("mock", resource, resource_id)
+
+        assert version == 4
+
+        self._repo.compare_and_swap.assert_called_once_with("mock", resource_id, 3, {"name": "karl", "_version": 4})
 
     @pytest.mark.asyncio
     async def test_should_replace_raises_PYRNotFoundError_if_resource_not_found(self):
@@ -195,10 +211,13 @@ class TestPYRService(AsyncTestCase):
         resource = {"name": "karl", "age": "twenty eight"}
         resource_id = "mock-id"
 
+        self._repo.get.return_value = {"name": "jean"}
+
         with pytest.raises(PYRInputNotValidError):
             await self._service.replace("mock", resource, resource_id)
 
         self._repo.replace.assert_not_called()
+        self._repo.compare_and_swap.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_should_partial_update_runs_correctly(self):
@@ -207,9 +226,11 @@ class TestPYRService(AsyncTestCase):
 
         self._repo.get.return_value = {"name": "jean"}
 
-        await self._service.partial_update("mock", resource, resource_id)
+        version = await self._service.partial_update("mock", resource, resource_id)
+
+        assert version == 1
 
-        self._repo.replace.assert_called_once_with("mock", resource_id, resource)
+        self._repo.compare_and_swap.assert_called_once_with("mock", resource_id, 0, {"name": "karl", "_version": 1})
 
     @pytest.mark.asyncio
     async def test_should_partial_update_raises_PYRNotFoundError_if_resource_not_found(self):
@@ -239,9 +260,11 @@ class TestPYRService(AsyncTestCase):
     async def test_should_delete_runs_correctly(self):
         resource_id = "mock-id"
 
+        self._repo.get.return_value = {"name": "jean", "_version": 2}
+
         await self._service.delete("mock", resource_id)
 
-        self._repo.delete.assert_called_once_with("mock", resource_id)
+        self._repo.compare_and_swap.assert_called_once_with("mock", resource_id, 2, None)
 
     @pytest.mark.asyncio
     async def test_should_delete_raises_PYRNotFoundError_if_resource_not_found(self):
@@ -253,3 +276,861 @@ class TestPYRService(AsyncTestCase):
             await self._service.delete("mock", resource_id)
 
         self._repo.replace.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_validate_large_payloads_in_process_pool(self):
+        service = PYRService(
+            api_config_mock,
+            repo=self._repo,
+            cache=self._cache,
+            validation_process_pool_min_bytes=0,
+            validation_process_pool_workers=1,
+        )
+
+        with pytest.raises(PYRInputNotValidError) as error:
+            await service.create("mock", {"name": "karl", "age": "twenty eight"})
+
+        assert error.value.message == ["'twenty eight' is not of type 'integer'"]
+        assert service._validation_process_pool is not None
+
+        self._repo.create.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_validate_small_payloads_inline(self):
+        service = PYRService(
+            api_config_mock,
+            repo=self._repo,
+            cache=self._cache,
+            validation_process_pool_min_bytes=1024,
+        )
+
+        self._repo.create.return_value = "mock-id"
+
+        result = await service.create("mock", {"name": "karl"})
+
+        assert result == "mock-id"
+        assert service._validation_process_pool is None
+
+    @pytest.mark.asyncio
+    async def test_should_shed_operations_over_the_admission_limit(self):
+        service = PYRService(
+            api_config_mock,
+            repo=self._repo,
+            cache=self._cache,
+            admission_control=PYRAdmissionControl(limits={"mock": {"get": {"max_concurrency": 0}}}),
+        )
+
+        with pytest.raises(PYRServiceUnavailableError):
+            await service.get("mock", "1")
+
+        self._repo.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_raise_PYRDeadlineExceededError_when_repo_is_slower_than_the_deadline(self):
+        service = PYRService(
+            api_config_mock,
+            repo=self._repo,
+            cache=self._cache,
+            deadlines_seconds={"mock": {"get": 0.01}},
+        )
+
+        async def slow_get(slug, id):
+            await asyncio.sleep(1)
+
+        self._repo.get.side_effect = slow_get
+
+        with pytest.raises(PYRDeadlineExceededError):
+            await service.get("mock", "1")
+
+    @pytest.mark.asyncio
+    async def test_should_skip_cache_set_when_deadline_is_exhausted(self):
+        service = PYRService(
+            api_config_mock,
+            repo=self._repo,
+            cache=self._cache,
+            deadlines_seconds={"*": {"*": 0.01}},
+        )
+
+        async def slow_get(slug, id):
+            time.sleep(0.02)
+            return {"name": "Jean Pinzon"}
+
+        self._repo.get = slow_get
+
+        result = await service.get("mock", "1")
+
+        assert result == {"name": "Jean Pinzon"}
+
+        self._cache.set.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_invalidate_the_cache_after_a_write_when_the_deadline_is_exceeded(self):
+        service = PYRService(
+            api_config_mock,
+            repo=self._repo,
+            cache=self._cache,
+            deadlines_seconds={"*": {"*": 0.1}},
+        )
+        deleted = []
+
+        async def slow_compare_and_swap(slug, id, version, data):
+            await asyncio.sleep(0.05)
+            return True
+
+        async def slow_delete(key):
+            await asyncio.sleep(0.1)
+            deleted.append(key)
+
+        self._repo.get.return_value = {"name": "old", "_version": 1}
+        self._repo.compare_and_swap.side_effect = slow_compare_and_swap
+        self._cache.delete.side_effect = slow_delete
+
+        assert await service.replace("mock", {"name": "new"}, "1") == 2
+        assert deleted == ["mock.get.id-1"]
+
+    @pytest.mark.asyncio
+    async def test_should_get_read_cached_entries_with_and_without_expiration(self):
+        service = PYRService(api_config_mock, repo=self._repo, cache=self._cache, stale_while_revalidate_seconds=60)
+
+        self._cache.get.return_value = json.dumps({"name": "Jean", "id": "1"})
+
+        assert await service.get("mock", "1") == {"name": "Jean", "id": "1"}
+
+        self._cache.get.return_value = json.dumps({"result": {"name": "Karl"}, "expires_at": time.time() + 10})
+
+        assert await self._service.get("mock", "1") == {"name": "Karl"}
+
+        self._repo.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_get_returns_fresh_cached_entry_without_revalidating(self):
+        service = PYRService(api_config_mock, repo=self._repo, cache=self._cache, stale_while_revalidate_seconds=60)
+
+        self._cache.get.return_value = json.dumps({"result": {"name": "Jean"}, "expires_at": time.time() + 10})
+
+        result = await service.get("mock", "1")
+
+        assert result == {"name": "Jean"}
+
+        self._repo.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_get_returns_stale_entry_while_revalidating_in_background(self):
+        service = PYRService(api_config_mock, repo=self._repo, cache=self._cache, stale_while_revalidate_seconds=60)
+
+        self._cache.get.return_value = json.dumps({"result": {"name": "Jean"}, "expires_at": time.time() - 10})
+        self._repo.get.return_value = {"name": "Karl"}
+
+        result = await service.get("mock", "1")
+
+        assert result == {"name": "Jean"}
+
+        await asyncio.gather(*service._revalidations.values())
+
+        self._repo.get.assert_called_once_with("mock", "1")
+
+        key, value = self._cache.set.call_args.args
+        assert key == "mock.get.id-1"
+        assert json.loads(value)["result"] == {"name": "Karl"}
+        assert self._cache.set.call_args.kwargs["ttl"] == 60 * 30 + 60
+
+    @pytest.mark.asyncio
+    async def test_should_get_returns_stale_entry_when_repo_raises(self):
+        service = PYRService(api_config_mock, repo=self._repo, cache=self._cache, stale_if_error_seconds=60)
+
+        self._cache.get.return_value = json.dumps({"result": {"name": "Jean"}, "expires_at": time.time() - 10})
+        self._repo.get.side_effect = ConnectionError()
+
+        result = await service.get("mock", "1")
+
+        assert result == {"name": "Jean"}
+
+    @pytest.mark.asyncio
+    async def test_should_list_raises_when_repo_raises_and_entry_is_too_stale(self):
+        service = PYRService(api_config_mock, repo=self._repo, cache=self._cache, stale_if_error_seconds=60)
+
+        self._cache.get.return_value = json.dumps({"result": {"result": []}, "expires_at": time.time() - 120})
+        self._repo.list.side_effect = ConnectionError()
+
+        with pytest.raises(ConnectionError):
+            await service.list("mock", None, None)
+
+    def _build_service_with_cache_policy(self, cache_policy):
+        api_config = {
+            "name": "ProjectName",
+            "schemas": [{
+                "name": "Mock",
+                "slug": "mock",
+                "properties": {"name": {"type": "string"}},
+                "cache": cache_policy,
+            }]
+        }
+
+        return PYRService(api_config, repo=self._repo, cache=self._cache)
+
+    @pytest.mark.asyncio
+    async def test_should_not_use_cache_when_it_is_disabled_by_the_schema(self):
+        service = self._build_service_with_cache_policy({"enabled": False})
+
+        self._repo.get.return_value = {"name": "Jean"}
+
+        result = await service.get("mock", "1")
+        await service.delete("mock", "1")
+
+        assert result == {"name": "Jean"}
+
+        self._cache.get.assert_not_called()
+        self._cache.set.assert_not_called()
+        self._cache.delete.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_use_ttls_declared_by_the_schema(self):
+        service = self._build_service_with_cache_policy({"get_seconds_ttl": 5, "list_seconds_ttl": 2})
+
+        self._repo.get.return_value = {"name": "Jean"}
+        self._repo.list.return_value = {"result": [{"name": "Jean"}]}
+
+        await service.get("mock", "1")
+        assert self._cache.set.call_args.kwargs["ttl"] == 5
+
+        await service.list("mock", None, None)
+        assert self._cache.set.call_args.kwargs["ttl"] == 2
+
+    @pytest.mark.asyncio
+    async def test_should_cache_not_found_results_with_the_negative_ttl(self):
+        service = self._build_service_with_cache_policy({"negative_seconds_ttl": 3})
+
+        self._repo.get.return_value = None
+
+        with pytest.raises(PYRNotFoundError):
+            await service.get("mock", "1")
+
+        self._cache.set.assert_called_once_with("mock.get.id-1", "null", ttl=3)
+
+        self._cache.get.return_value = "null"
+        self._repo.get.reset_mock()
+
+        with pytest.raises(PYRNotFoundError):
+            await service.get("mock", "1")
+
+        self._repo.get.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_not_cache_lists_bigger_than_the_max_list_size(self):
+        service = self._build_service_with_cache_policy({"max_list_size": 1})
+
+        self._repo.list.return_value = {"result": [{"name": "Jean"}, {"name": "Karl"}]}
+
+        await service.list("mock", None, None)
+
+        self._cache.set.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_write_through_the_cache_after_replace(self):
+        service = PYRService(api_config_mock, repo=self._repo, cache=self._cache, cache_write_through=True)
+
+        self._repo.get.return_value = {"name": "jean", "_version": 1}
+
+        await service.replace("mock", {"name": "karl"}, "mock-id")
+
+        self._cache.set.assert_called_once_with(
+            "mock.get.id-mock-id",
+            json.dumps({"name": "karl", "_version": 2}),
+            ttl=60 * 30,
+        )
+        self._cache.delete.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_write_through_the_cache_after_create(self):
+        service = self._build_service_with_cache_policy({"write_through": True})
+
+        self._repo.create.return_value = "mock-id"
+
+        await service.create("mock", {"name": "karl"})
+
+        self._cache.set.assert_called_once_with(
+            "mock.get.id-mock-id",
+            json.dumps({"name": "karl", "_version": 1}),
+            ttl=60 * 30,
+        )
+
+    @pytest.mark.asyncio
+    async def test_should_delete_the_cache_after_write_through_when_gets_are_not_cached(self):
+        service = self._build_service_with_cache_policy({"write_through": True, "get_seconds_ttl": None})
+
+        self._repo.create.return_value = "mock-id"
+
+        assert await service.create("mock", {"name": "karl"}) == "mock-id"
+
+        self._cache.set.assert_not_called()
+        self._cache.delete.assert_called_once_with("mock.get.id-mock-id")
+
+    @pytest.mark.asyncio
+    async def test_should_delete_the_cache_when_a_write_is_overtaken_by_a_newer_one(self):
+        service = PYRService(api_config_mock, repo=self._repo, cache=self._cache, cache_write_through=True)
+
+        first_write_started = asyncio.Event()
+        release_first_write = asyncio.Event()
+
+        async def compare_and_swap(slug, id, version, data):
+            if data["name"] == "first":
+                first_write_started.set()
+                await release_first_write.wait()
+
+            return True
+
+        self._repo.get.return_value = {"name": "old", "_version": 1}
+        self._repo.compare_and_swap.side_effect = compare_and_swap
+
+        first = asyncio.ensure_future(service.replace("mock", {"name": "first"}, "mock-id"))
+        await first_write_started.wait()
+
+        await service.replace("mock", {"name": "second"}, "mock-id")
+
+        release_first_write.set()
+        await first
+
+        self._cache.set.assert_called_once_with(
+            "mock.get.id-mock-id",
+            json.dumps({"name": "second", "_version": 2}),
+            ttl=60 * 30,
+        )
+        self._cache.delete.assert_called_once_with("mock.get.id-mock-id")
+        assert service._latest_writes == {}
+
+    @pytest.mark.asyncio
+    async def test_should_list_without_count(self):
+        self._repo.list.return_value = {"result": [], "page": 0, "size": 30}
+
+        result = await self._service.list("mock", None, None, count="none")
+
+        assert result == {"result": [], "page": 0, "size": 30}
+
+        self._repo.list.assert_called_once_with("mock", None, None, count=False)
+        self._cache.get.assert_called_once_with("mock.list.page-None.size-None.count-none")
+
+    @pytest.mark.asyncio
+    async def test_should_list_without_count_with_a_repo_not_accepting_it(self):
+        class BaselineRepo(Repo):
+            async def list(self, slug, page=0, size=30):
+                return {"result": [], "page": 0, "size": 30, "totalCount": 3}
+
+        service = PYRService(api_config_mock, repo=BaselineRepo())
+
+        assert await service.list("mock", None, None, count="none") == {"result": [], "page": 0, "size": 30}
+        assert (await service.list("mock", None, None, count="estimate"))["totalCount"] == 3
+
+    @pytest.mark.asyncio
+    async def test_should_list_raises_PYRInputNotValidError_when_repo_does_not_accept_filters(self):
+        class BaselineRepo(Repo):
+            async def list(self, slug, page=0, size=30):
+                return {"result": [], "page": 0, "size": 30, "totalCount": 0}
+
+        service = PYRService(api_config_mock, repo=BaselineRepo())
+
+        with pytest.raises(PYRInputNotValidError):
+            await service.list("mock", None, None, filters=["age:gte:18"])
+
+    @pytest.mark.asyncio
+    async def test_should_list_with_estimated_count(self):
+        self._repo.list.return_value = {"result": [], "page": 0, "size": 30}
+        self._repo.count.return_value = 1000
+
+        result = await self._service.list("mock", None, None, count="estimate")
+
+        assert result["totalCount"] == 1000
+
+        self._repo.count.assert_called_once_with("mock", estimate=True)
+
+    @pytest.mark.asyncio
+    async def test_should_list_raises_PYRInputNotValidError_when_count_is_not_valid(self):
+        with pytest.raises(PYRInputNotValidError):
+            await self._service.list("mock", None, None, count="maybe")
+
+    @pytest.mark.asyncio
+    async def test_should_list_with_cached_count(self):
+        service = self._build_service_with_cache_policy({"count_seconds_ttl": 60})
+
+        self._repo.list.return_value = {"result": [], "page": 0, "size": 30}
+        self._cache.get.side_effect = lambda key: "42" if key == "mock.count" else None
+
+        result = await service.list("mock", None, None)
+
+        assert result["totalCount"] == 42
+
+        self._repo.list.assert_called_once_with("mock", None, None, count=False)
+        self._repo.count.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_count_fallback_to_list_when_repo_has_no_count(self):
+        service = self._build_service_with_cache_policy({"count_seconds_ttl": 60})
+
+        self._repo.list.side_effect = [{"result": [], "page": 0, "size": 30}, {"result": [], "totalCount": 7}]
+        self._repo.count.side_effect = NotImplementedError()
+
+        result = await service.list("mock", None, None)
+
+        assert result["totalCount"] == 7
+
+        self._cache.set.assert_any_call("mock.count", "7", ttl=60)
+
+    @pytest.mark.asyncio
+    async def test_should_delete_cached_count_after_create(self):
+        service = self._build_service_with_cache_policy({"count_seconds_ttl": 60})
+
+        self._repo.create.return_value = "mock-id"
+
+        await service.create("mock", {"name": "karl"})
+
+        self._cache.delete.assert_any_call("mock.count")
+        self._cache.delete.assert_any_call("mock.count.estimate")
+
+    @pytest.mark.asyncio
+    async def test_should_get_many_fetch_only_cache_misses_from_repo(self):
+        self._cache.get_many.return_value = [None, json.dumps({"name": "Jean", "id": "2"}), None]
+        self._repo.get_many.return_value = {"1": {"name": "Karl", "id": "1"}}
+
+        result = await self._service.get_many("mock", ["1", "2", "3", "1"])
+
+        assert result == {
+            "result": [{"name": "Karl", "id": "1"}, {"name": "Jean", "id": "2"}],
+            "missing": ["3"],
+        }
+
+        self._cache.get_many.assert_called_once_with(["mock.get.id-1", "mock.get.id-2", "mock.get.id-3"])
+        self._repo.get_many.assert_called_once_with("mock", ["1", "3"])
+        self._cache.set_many.assert_called_once_with(
+            {"mock.get.id-1": json.dumps({"name": "Karl", "id": "1"})},
+            ttl=60 * 30,
+        )
+
+    @pytest.mark.asyncio
+    async def test_should_get_many_not_call_repo_when_all_ids_are_cached(self):
+        service = self._build_service_with_cache_policy({"negative_seconds_ttl": 5})
+
+        self._cache.get_many.return_value = [json.dumps({"name": "Jean", "id": "1"}), "null"]
+
+        result = await service.get_many("mock", ["1", "2"])
+
+        assert result == {"result": [{"name": "Jean", "id": "1"}], "missing": ["2"]}
+
+        self._repo.get_many.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_get_many_raises_PYRInputNotValidError_when_there_are_too_many_ids(self):
+        service = PYRService(api_config_mock, repo=self._repo, cache=self._cache, get_many_max_ids=2)
+
+        with pytest.raises(PYRInputNotValidError):
+            await service.get_many("mock", ["1", "2", "3"])
+
+    @pytest.mark.asyncio
+    async def test_should_normalized_list_cache_ids_of_the_page_and_the_documents(self):
+        service = self._build_service_with_cache_policy({"normalized_lists": True})
+
+        self._cache.get.return_value = None
+        self._repo.list.return_value = {
+            "result": [{"name": "Jean", "id": "1"}, {"name": "Karl", "id": "2"}],
+            "page": 0,
+            "size": 2,
+            "totalCount": 2,
+        }
+
+        result = await service.list("mock", 0, 2)
+
+        assert result == self._repo.list.return_value
+
+        self._cache.set_many.assert_called_once_with(
+            {
+                "mock.get.id-1": json.dumps({"name": "Jean", "id": "1"}),
+                "mock.get.id-2": json.dumps({"name": "Karl", "id": "2"}),
+            },
+            ttl=60 * 30,
+        )
+        self._cache.set.assert_called_once_with(
+            "mock.list.page-0.size-2",
+            json.dumps({"result": ["1", "2"], "page": 0, "size": 2, "totalCount": 2}),
+            ttl=10,
+        )
+        self._cache.get_many.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_normalized_list_assemble_cached_page_from_the_documents(self):
+        service = self._build_service_with_cache_policy({"normalized_lists": True})
+
+        self._cache.get.return_value = json.dumps({"result": ["1", "2", "3"], "page": 0, "size": 3})
+        self._cache.get_many.return_value = [json.dumps({"name": "Jean", "id": "1"}), None, None]
+        self._repo.get_many.return_value = {"3": {"name": "Karl", "id": "3"}}
+
+        result = await service.list("mock", 0, 3)
+
+        assert result == {
+            "result": [{"name": "Jean", "id": "1"}, {"name": "Karl", "id": "3"}],
+            "page": 0,
+            "size": 3,
+        }
+
+        self._cache.get_many.assert_called_once_with(["mock.get.id-1", "mock.get.id-2", "mock.get.id-3"])
+        self._repo.get_many.assert_called_once_with("mock", ["2", "3"])
+        self._repo.list.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_publish_changes_of_the_writes(self):
+        change_feed = PYRChangeFeed()
+        service = PYRService(api_config_mock, repo=self._repo, cache=self._cache, change_feed=change_feed)
+        subscription = service.subscribe_changes("mock")
+
+        self._repo.create.return_value = "1"
+        self._repo.get.return_value = {"name": "Jean", "id": "1"}
+
+        await service.create("mock", {"name": "Jean"})
+        await service.partial_update("mock", {"name": "Karl"}, "1")
+        await service.delete("mock", "1")
+        change_feed.close()
+
+        changes = [change async for change in subscription]
+
+        assert [(change["operation"], change["id"], change["data"]) for change in changes] == [
+            ("create", "1", {"name": "Jean", "_version": 1}),
+            ("partial_update", "1", {"name": "Karl", "id": "1", "_version": 1}),
+            ("delete", "1", None),
+        ]
+
+    def test_should_subscribe_changes_raises_PYRNotFoundError_without_change_feed(self):
+        with pytest.raises(PYRNotFoundError):
+            self._service.subscribe_changes("mock")
+
+    @pytest.mark.asyncio
+    async def test_should_create_with_idempotency_key_replay_the_cached_id(self):
+        cached = {}
+
+        async def set_cache(key, value, ttl=None):
+            cached[key] = value
+
+        self._cache.set.side_effect = set_cache
+        self._repo.create.return_value = "1"
+
+        first_id = await self._service.create("mock", {"name": "karl"}, idempotency_key="retry-1")
+
+        self._cache.get.return_value = cached["mock.create.idempotency-retry-1"]
+
+        second_id = await self._service.create("mock", {"name": "karl"}, idempotency_key="retry-1")
+
+        assert first_id == second_id == "1"
+
+        self._repo.create.assert_called_once_with("mock", {"name": "karl", "_version": 1}, None)
+        self._cache.set.assert_any_call("mock.create.idempotency-retry-1", cached["mock.create.idempotency-retry-1"],
+                                        ttl=60 * 60 * 24)
+
+    @pytest.mark.asyncio
+    async def test_should_create_with_idempotency_key_wait_for_the_in_flight_create(self):
+        release = asyncio.Event()
+
+        async def create(slug, data, id):
+            await release.wait()
+            return "1"
+
+        self._repo.create.side_effect = create
+
+        first = asyncio.ensure_future(self._service.create("mock", {"name": "karl"}, idempotency_key="retry-1"))
+        second = asyncio.ensure_future(self._service.create("mock", {"name": "karl"}, idempotency_key="retry-1"))
+        await asyncio.sleep(0.01)
+
+        release.set()
+
+        assert await first == await second == "1"
+        assert self._repo.create.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_should_create_raises_PYRInputNotValidError_when_idempotency_key_is_reused_with_other_data(self):
+        self._repo.create.return_value = "1"
+
+        await self._service.create("mock", {"name": "karl"}, idempotency_key="retry-1")
+
+        self._cache.get.return_value = self._cache.set.call_args_list[-1].args[1]
+
+        with pytest.raises(PYRInputNotValidError):
+            await self._service.create("mock", {"name": "jean"}, idempotency_key="retry-1")
+
+        assert self._repo.create.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_should_create_with_idempotency_key_finish_after_the_request_deadline(self):
+        async def create(slug, data, id):
+            await asyncio.sleep(0.05)
+            return "1"
+
+        self._repo.create.side_effect = create
+
+        with deadline(0.01):
+            with pytest.raises(PYRDeadlineExceededError):
+                await self._service.create("mock", {"name": "karl"}, idempotency_key="retry-1")
+
+        await asyncio.sleep(0.1)
+
+        remembered = [call.args for call in self._cache.set.call_args_list if "idempotency" in call.args[0]]
+
+        assert json.loads(remembered[0][1])["id"] == "1"
+
+    @pytest.mark.asyncio
+    async def test_should_create_with_idempotency_key_warn_once_without_a_cache(self):
+        service = PYRService(api_config_mock, repo=self._repo, cache=PYRDummyCache())
+        self._repo.create.return_value = "1"
+
+        with self.assertLogs("py_easy_rest.service", level="WARNING") as logs:
+            await service.create("mock", {"name": "karl"}, idempotency_key="retry-1")
+            await service.create("mock", {"name": "jean"}, idempotency_key="retry-2")
+
+        assert len(logs.records) == 1
+
+    @pytest.mark.asyncio
+    async def test_should_list_raises_PYRInputNotValidError_when_size_exceeds_the_max_page_size(self):
+        api_config = {
+            "name": "ProjectName",
+            "schemas": [
+                {"name": "Mock", "slug": "mock", "properties": {}, "max_page_size": 500},
+                {"name": "Other", "slug": "other", "properties": {}},
+            ]
+        }
+        service = PYRService(api_config, repo=self._repo, cache=self._cache, max_page_size=100)
+
+        self._repo.list.return_value = {"result": [], "page": 0, "size": 500}
+
+        await service.list("mock", 0, "500")
+
+        with pytest.raises(PYRInputNotValidError):
+            await service.list("mock", 0, "501")
+
+        with pytest.raises(PYRInputNotValidError):
+            await service.list("other", 0, "101")
+
+        self._repo.list.assert_called_once_with("mock", 0, 500)
+
+    @pytest.mark.asyncio
+    async def test_should_list_without_size_limit_the_default_size_to_the_max_page_size(self):
+        api_config = {
+            "name": "ProjectName",
+            "schemas": [
+                {"name": "Mock", "slug": "mock", "properties": {}, "max_page_size": 10},
+                {"name": "Other", "slug": "other", "properties": {}},
+            ]
+        }
+        service = PYRService(api_config, repo=self._repo, cache=self._cache)
+
+        self._repo.list.return_value = {"result": [], "page": 0, "size": 10}
+
+        await service.list("mock", None, None)
+        await service.list("other", None, None)
+
+        assert self._repo.list.call_args_list[0].args == ("mock", None, 10)
+        assert self._repo.list.call_args_list[1].args == ("other", None, None)
+
+    @pytest.mark.asyncio
+    async def test_should_search_return_the_repo_search_result(self):
+        self._repo.search.return_value = {"result": [{"name": "karl"}], "page": 0, "size": 10, "totalCount": 1}
+
+        result = await self._service.search("mock", "ka", "0", "10")
+
+        assert result == self._repo.search.return_value
+
+        self._repo.search.assert_called_once_with("mock", "ka", 0, 10)
+
+    @pytest.mark.asyncio
+    async def test_should_search_raises_PYRInputNotValidError_when_query_is_empty(self):
+        with pytest.raises(PYRInputNotValidError):
+            await self._service.search("mock", " ")
+
+        self._repo.search.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_search_raises_PYRNotFoundError_when_repo_can_not_search(self):
+        self._repo.search.side_effect = NotImplementedError
+
+        with pytest.raises(PYRNotFoundError):
+            await self._service.search("mock", "ka")
+
+    @pytest.mark.asyncio
+    async def test_should_list_with_filters_parsed_by_property_type(self):
+        api_config = {
+            "name": "Filters",
+            "schemas": [{
+                "slug": "product",
+                "properties": {"price": {"type": "number"}, "active": {"type": "boolean"}},
+            }],
+        }
+        service = PYRService(api_config, repo=self._repo, cache=self._cache)
+
+        self._repo.list.return_value = {"result": [], "page": 0, "size": 30, "totalCount": 0}
+
+        await service.list("product", None, None, filters=["price:gte:10", "active:eq:true"])
+
+        self._repo.list.assert_called_once_with(
+            "product", None, None, filters=[("price", "gte", 10.0), ("active", "eq", True)],
+        )
+        self._cache.get.assert_called_once_with("product.list.page-None.size-None.filter-price:gte:10,active:eq:true")
+
+        for filters in ["name:eq:karl", "price:between:10", "price:gte:ten", "price", "active:eq:1"]:
+            with pytest.raises(PYRInputNotValidError):
+                await service.list("product", None, None, filters=filters)
+
+        self._repo.list.side_effect = NotImplementedError
+
+        with pytest.raises(PYRInputNotValidError):
+            await service.list("product", None, None, count="none", filters="price:lt:10")
+
+    @pytest.mark.asyncio
+    async def test_should_get_record_the_hot_ids(self):
+        hot_ids = PYRHotIds()
+        service = PYRService(api_config_mock, repo=self._repo, cache=self._cache, hot_ids=hot_ids)
+
+        self._repo.get.return_value = {"name": "karl"}
+
+        await service.get("mock", "1")
+        await service.get("mock", "2")
+        await service.get("mock", "2")
+
+        assert hot_ids.most_common() == {"mock": ["2", "1"]}
+
+    def test_should_is_cached_follow_the_cache_policy(self):
+        api_config = {
+            "name": "Cached",
+            "schemas": [{"slug": "cached"}, {"slug": "uncached", "cache": {"enabled": False}}],
+        }
+        service = PYRService(api_config, repo=self._repo, cache=self._cache)
+
+        assert service.is_cached("cached")
+        assert not service.is_cached("uncached")
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_caching_the_repo_result(self):
+        expected_result = {"result": [{"group": "books", "value": 30}]}
+
+        self._repo.aggregate.return_value = expected_result
+
+        result = await self._service.aggregate("mock", "category", "sum:price")
+
+        assert result == expected_result
+
+        self._repo.aggregate.assert_called_once_with("mock", "category", "sum:price")
+        self._cache.get.assert_called_once_with("mock.aggregate.group_by-category.metric-sum:price")
+        self._cache.set.assert_called_once_with(
+            "mock.aggregate.group_by-category.metric-sum:price",
+            json.dumps(expected_result),
+            ttl=10,
+        )
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_return_the_cached_result(self):
+        self._cache.get.return_value = json.dumps({"result": [{"group": "books", "value": 3}]})
+
+        result = await self._service.aggregate("mock", "category", None)
+
+        assert result == {"result": [{"group": "books", "value": 3}]}
+
+        self._cache.get.assert_called_once_with("mock.aggregate.group_by-category.metric-count")
+        self._repo.aggregate.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_raises_PYRInputNotValidError_when_metric_is_not_valid(self):
+        for group_by, metric in [
+            (None, "count"),
+            ("category", "avg:price"),
+            ("category", "sum"),
+            ("category", "count:price"),
+            ("category", ["count", "sum:price"]),
+        ]:
+            with pytest.raises(PYRInputNotValidError):
+                await self._service.aggregate("mock", group_by, metric)
+
+        self._repo.aggregate.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_aggregate_raises_PYRNotFoundError_when_repo_can_not_aggregate(self):
+        self._repo.aggregate.side_effect = NotImplementedError
+
+        with pytest.raises(PYRNotFoundError):
+            await self._service.aggregate("mock", "category", "max:price")
+
+    @pytest.mark.asyncio
+    async def test_should_write_raises_PYRPreconditionFailedError_when_version_is_not_expected(self):
+        self._repo.get.return_value = {"name": "jean", "_version": 2}
+
+        with pytest.raises(PYRPreconditionFailedError):
+            await self._service.replace("mock", {"name": "karl"}, "mock-id", expected_versions={1})
+
+        with pytest.raises(PYRPreconditionFailedError):
+            await self._service.partial_update("mock", {"name": "karl"}, "mock-id", expected_versions={1})
+
+        with pytest.raises(PYRPreconditionFailedError):
+            await self._service.delete("mock", "mock-id", expected_versions={1})
+
+        self._repo.compare_and_swap.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_should_write_raises_PYRPreconditionFailedError_when_expected_version_is_changed_concurrently(self):
+        self._repo.get.return_value = {"name": "jean", "_version": 2}
+        self._repo.compare_and_swap.return_value = False
+
+        with pytest.raises(PYRPreconditionFailedError):
+            await self._service.replace("mock", {"name": "karl"}, "mock-id", expected_versions={2})
+
+        self._repo.compare_and_swap.assert_called_once_with("mock", "mock-id", 2, {"name": "karl", "_version": 3})
+
+    @pytest.mark.asyncio
+    async def test_should_partial_update_merge_again_when_changed_concurrently(self):
+        self._repo.get.side_effect = [{"name": "jean", "_version": 2}, {"name": "jean", "age": 30, "_version": 3}]
+        self._repo.compare_and_swap.side_effect = [False, True]
+
+        version = await self._service.partial_update("mock", {"name": "karl"}, "mock-id")
+
+        assert version == 4
+
+        self._repo.compare_and_swap.assert_called_with(
+            "mock", "mock-id", 3, {"name": "karl", "age": 30, "_version": 4}
+        )
+
+    @pytest.mark.asyncio
+    async def test_should_write_raises_PYRPreconditionFailedError_when_changed_concurrently_too_many_times(self):
+        self._repo.get.return_value = {"name": "jean", "_version": 2}
+        self._repo.compare_and_swap.return_value = False
+
+        with pytest.raises(PYRPreconditionFailedError):
+            await self._service.partial_update("mock", {"name": "karl"}, "mock-id")
+
+        assert self._repo.compare_and_swap.call_count == WRITE_MAX_ATTEMPTS
+
+    @pytest.mark.asyncio
+    async def test_should_write_with_the_memory_repo(self):
+        change_feed = PYRChangeFeed()
+        service = PYRService(api_config_mock, repo=PYRMemoryRepo(), cache=self._cache, change_feed=change_feed)
+
+        id = await asyncio.wait_for(service.create("mock", {"name": "jean", "age": 30}), 1)
+
+        assert await asyncio.wait_for(service.partial_update("mock", {"age": 31}, id), 1) == 2
+        assert await asyncio.wait_for(service.replace("mock", {"name": "karl"}, id, expected_versions={2}), 1) == 3
+        assert await service.get("mock", id) == {"name": "karl", "id": id, "_version": 3}
+
+        await asyncio.wait_for(service.delete("mock", id), 1)
+
+        with pytest.raises(PYRNotFoundError):
+            await service.get("mock", id)
+
+        subscription = change_feed.subscribe("mock", since=0)
+        change_feed.close()
+
+        history = [change["data"] async for change in subscription]
+
+        assert history[:2] == [
+            {"name": "jean", "age": 30, "id": id, "_version": 1},
+            {"name": "jean", "age": 31, "id": id, "_version": 2},
+        ]
+
+    @pytest.mark.asyncio
+    async def test_should_write_without_version_check_when_repo_has_no_compare_and_swap(self):
+        self._repo.get.return_value = {"name": "jean", "_version": 2}
+        self._repo.compare_and_swap.side_effect = NotImplementedError
+
+        await self._service.replace("mock", {"name": "karl"}, "mock-id")
+        await self._service.delete("mock", "mock-id")
+
+        self._repo.replace.assert_called_once_with("mock", "mock-id", {"name": "karl", "_version": 3})
+        self._repo.delete.assert_called_once_with("mock", "mock-id")
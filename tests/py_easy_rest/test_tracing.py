@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+
+from aiounittest import AsyncTestCase
+
+from py_easy_rest.tracing import SpanHook, clear_trace, current_trace, span, start_trace
+
+
+class RecordingSpanHook(SpanHook):
+
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name):
+        return name
+
+    def end_span(self, span, duration_seconds):
+        self.spans.append(span)
+
+
+class TestTracing(AsyncTestCase):
+
+    def tearDown(self):
+        clear_trace()
+
+    @pytest.mark.asyncio
+    async def test_should_span_do_nothing_without_trace(self):
+        with span("repo"):
+            await asyncio.sleep(0)
+
+        assert current_trace() is None
+
+    @pytest.mark.asyncio
+    async def test_should_sum_the_durations_by_phase_and_report_them_to_the_hooks(self):
+        hook = RecordingSpanHook()
+        trace = start_trace([hook])
+
+        with span("cache"):
+            await asyncio.sleep(0.01)
+
+        with span("repo"):
+            await asyncio.sleep(0.01)
+
+        with span("cache"):
+            await asyncio.sleep(0.01)
+
+        durations = trace.durations()
+
+        assert list(durations) == ["cache", "repo"]
+        assert durations["cache"] >= 0.02
+        assert hook.spans == ["cache", "repo", "cache"]
+
+    @pytest.mark.asyncio
+    async def test_should_format_the_server_timing_header_in_milliseconds(self):
+        trace = start_trace()
+        trace.add("repo", 0.0123)
+
+        server_timing = trace.server_timing()
+
+        assert server_timing.startswith("repo;dur=12.30, total;dur=")
+
+    @pytest.mark.asyncio
+    async def test_should_propagate_the_trace_to_tasks(self):
+        trace = start_trace()
+
+        async def fetch():
+            with span("repo"):
+                await asyncio.sleep(0)
+
+        await asyncio.ensure_future(fetch())
+
+        assert list(trace.durations()) == ["repo"]
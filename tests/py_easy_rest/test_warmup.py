@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+import pytest
+import tempfile
+
+from aiounittest import AsyncTestCase
+from unittest.mock import Mock
+
+from py_easy_rest.exceptions import PYRNotFoundError
+from py_easy_rest.repos import PYRMemoryRepo
+from py_easy_rest.service import PYRService
+from py_easy_rest.warmup import PYRHotIds, PYRWarmup
+
+
+class TestPYRWarmup(AsyncTestCase):
+
+    def setUp(self):
+        self._service = Mock(PYRService)
+        self._service.is_cached.side_effect = lambda slug: slug != "uncached"
+        self._running = 0
+        self._max_running = 0
+
+    async def _operation(self, *args, **kwargs):
+        self._running += 1
+        self._max_running = max(self._max_running, self._running)
+        await asyncio.sleep(0.01)
+        self._running -= 1
+
+    @pytest.mark.asyncio
+    async def test_should_warm_the_first_pages_and_hot_ids_with_bounded_concurrency(self):
+        self._service.list.side_effect = self._operation
+        self._service.get.side_effect = self._operation
+
+        warmup = PYRWarmup(list_pages=2, list_size=50, hot_ids={"mock": ["1", "2", "3"]}, concurrency=2)
+
+        assert not warmup.ready
+
+        await warmup.run(self._service, {
+            "mock": ["list", "get"],
+            "no-get": ["list"],
+            "uncached": ["list", "get"],
+        })
+
+        assert warmup.ready
+        assert self._max_running == 2
+
+        assert self._service.list.call_args_list == [
+            (("mock", None, 50),),
+            (("mock", 1, 50),),
+            (("no-get", None, 50),),
+            (("no-get", 1, 50),),
+        ]
+        assert self._service.get.call_args_list == [
+            (("mock", "1"), {"record_hot_id": False}),
+            (("mock", "2"), {"record_hot_id": False}),
+            (("mock", "3"), {"record_hot_id": False}),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_should_be_ready_when_operations_fail(self):
+        self._service.list.side_effect = Exception("repo is down")
+        self._service.get.side_effect = PYRNotFoundError("mock 1 not found")
+
+        warmup = PYRWarmup(hot_ids={"mock": ["1"]})
+
+        await warmup.run(self._service, {"mock": ["list", "get"]})
+
+        assert warmup.ready
+
+
+class TestPYRHotIds(AsyncTestCase):
+
+    def test_should_save_and_load_the_most_read_ids(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "hot-ids.json")
+            hot_ids = PYRHotIds(path, max_ids_per_slug=2)
+
+            assert hot_ids.load() == {}
+
+            for slug, id in [("mock", "1"), ("mock", "2"), ("mock", "2"), ("mock", "3"), ("mock", "3"), ("other", "a")]:
+                hot_ids.record(slug, id)
+
+            hot_ids.save()
+
+            with open(path) as file:
+                assert json.load(file) == {"mock": ["2", "3"], "other": ["a"]}
+
+            assert PYRHotIds(path).load() == {"mock": ["2", "3"], "other": ["a"]}
+
+    def test_should_drop_the_least_read_ids(self):
+        hot_ids = PYRHotIds(max_ids_per_slug=1)
+
+        for id in ["1", "1"] + [str(id) for id in range(2, 12)]:
+            hot_ids.record("mock", id)
+
+        assert hot_ids.most_common() == {"mock": ["1"]}
+        assert len(hot_ids._counts["mock"]) <= 10
+
+    @pytest.mark.asyncio
+    async def test_should_warm_up_loading_the_saved_hot_ids(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "hot-ids.json")
+
+            with open(path, "w") as file:
+                json.dump({"mock": ["1"]}, file)
+
+            service = Mock(PYRService)
+            service.is_cached.return_value = True
+
+            await PYRWarmup(list_pages=0, hot_ids=PYRHotIds(path)).run(service, {"mock": ["get"]})
+
+            service.get.assert_called_once_with("mock", "1", record_hot_id=False)
+
+    @pytest.mark.asyncio
+    async def test_should_not_record_the_warmed_ids_as_hot(self):
+        hot_ids = PYRHotIds()
+        service = PYRService(
+            {"name": "Warmup", "schemas": [{"name": "Mock", "slug": "mock", "properties": {}}]},
+            repo=PYRMemoryRepo({"mock": {"1": {"id": "1"}}}),
+            hot_ids=hot_ids,
+        )
+
+        await PYRWarmup(list_pages=0, hot_ids={"mock": ["1"]}).run(service, {"mock": ["get"]})
+
+        assert hot_ids.most_common() == {}